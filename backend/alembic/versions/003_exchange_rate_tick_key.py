@@ -0,0 +1,40 @@
+"""Add unique tick key to exchange rates
+
+Revision ID: 003
+Revises: 002
+Create Date: 2025-03-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Remove duplicate ticks, keeping the first stored row of each
+    op.execute(
+        """
+        DELETE FROM exchange_rates
+        WHERE id NOT IN (
+            SELECT MIN(id)
+            FROM exchange_rates
+            GROUP BY base_currency_id, quote_currency_id, timestamp, source
+        )
+        """
+    )
+    
+    op.create_unique_constraint(
+        'uq_exchange_rates_tick',
+        'exchange_rates',
+        ['base_currency_id', 'quote_currency_id', 'timestamp', 'source']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_exchange_rates_tick', 'exchange_rates', type_='unique')
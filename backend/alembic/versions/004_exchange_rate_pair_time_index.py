@@ -0,0 +1,32 @@
+"""Add composite pair/time index to exchange rates
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-03-20
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serves every "pair filter + ORDER BY timestamp DESC" lookup. On PostgreSQL the
+    # rate is included in the index so latest-rate and history reads are index-only.
+    op.create_index(
+        'ix_exchange_rates_pair_timestamp',
+        'exchange_rates',
+        ['base_currency_id', 'quote_currency_id', sa.text('timestamp DESC')],
+        unique=False,
+        postgresql_include=['rate']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_exchange_rates_pair_timestamp', table_name='exchange_rates')
@@ -0,0 +1,47 @@
+"""Add current rates snapshot table
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-03-24
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create current_rates table, one row per currency pair
+    op.create_table(
+        'current_rates',
+        sa.Column('base_currency_id', sa.Integer(), nullable=False),
+        sa.Column('quote_currency_id', sa.Integer(), nullable=False),
+        sa.Column('rate', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('base_currency_id', 'quote_currency_id'),
+        sa.ForeignKeyConstraint(['base_currency_id'], ['currencies.id'], ),
+        sa.ForeignKeyConstraint(['quote_currency_id'], ['currencies.id'], )
+    )
+
+    # Seed the snapshot with the latest stored tick of each pair
+    op.execute(
+        """
+        INSERT INTO current_rates (base_currency_id, quote_currency_id, rate, source, timestamp, updated_at)
+        SELECT DISTINCT ON (base_currency_id, quote_currency_id)
+            base_currency_id, quote_currency_id, rate, source, timestamp, now()
+        FROM exchange_rates
+        ORDER BY base_currency_id, quote_currency_id, timestamp DESC, id DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('current_rates')
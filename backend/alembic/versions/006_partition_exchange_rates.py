@@ -0,0 +1,124 @@
+"""Partition exchange rates by month
+
+Revision ID: 006
+Revises: 005
+Create Date: 2025-03-27
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+# Months of partitions created ahead of the current one (the maintenance job keeps extending this)
+PREMAKE_MONTHS = 3
+
+COLUMNS = 'id, base_currency_id, quote_currency_id, rate, source, "timestamp", created_at'
+
+
+def upgrade() -> None:
+    # Move the existing table aside, freeing its constraint and index names
+    op.execute("ALTER TABLE exchange_rates RENAME TO exchange_rates_unpartitioned")
+    op.execute("ALTER TABLE exchange_rates_unpartitioned RENAME CONSTRAINT exchange_rates_pkey TO exchange_rates_unpartitioned_pkey")
+    op.execute("ALTER TABLE exchange_rates_unpartitioned RENAME CONSTRAINT uq_exchange_rates_tick TO uq_exchange_rates_unpartitioned_tick")
+    op.execute("ALTER INDEX ix_exchange_rates_pair_timestamp RENAME TO ix_exchange_rates_unpartitioned_pair_timestamp")
+
+    # Unique constraints on a partitioned table must include the partition key,
+    # so the primary key becomes (id, timestamp); ids still come from the same sequence
+    op.execute(
+        """
+        CREATE TABLE exchange_rates (
+            id integer NOT NULL DEFAULT nextval('exchange_rates_id_seq'),
+            base_currency_id integer NOT NULL REFERENCES currencies (id),
+            quote_currency_id integer NOT NULL REFERENCES currencies (id),
+            rate numeric(18, 6) NOT NULL,
+            source varchar NOT NULL,
+            "timestamp" timestamp NOT NULL,
+            created_at timestamp NOT NULL,
+            CONSTRAINT exchange_rates_pkey PRIMARY KEY (id, "timestamp"),
+            CONSTRAINT uq_exchange_rates_tick UNIQUE (base_currency_id, quote_currency_id, "timestamp", source)
+        ) PARTITION BY RANGE ("timestamp")
+        """
+    )
+    op.execute("ALTER SEQUENCE exchange_rates_id_seq OWNED BY exchange_rates.id")
+    op.create_index(
+        'ix_exchange_rates_pair_timestamp',
+        'exchange_rates',
+        ['base_currency_id', 'quote_currency_id', sa.text('timestamp DESC')],
+        unique=False,
+        postgresql_include=['rate']
+    )
+
+    # One partition per month from the oldest stored tick to PREMAKE_MONTHS ahead
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month date;
+            last_month date;
+        BEGIN
+            SELECT
+                date_trunc('month', coalesce(min("timestamp"), now()))::date,
+                date_trunc('month', greatest(max("timestamp"), now() + interval '{PREMAKE_MONTHS} months'))::date
+            INTO month, last_month
+            FROM exchange_rates_unpartitioned;
+
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF exchange_rates FOR VALUES FROM (%L) TO (%L)',
+                    'exchange_rates_' || to_char(month, '"y"YYYY"m"MM'),
+                    month,
+                    (month + interval '1 month')::date
+                );
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$
+        """
+    )
+
+    op.execute(
+        f"INSERT INTO exchange_rates ({COLUMNS}) SELECT {COLUMNS} FROM exchange_rates_unpartitioned"
+    )
+    op.execute("DROP TABLE exchange_rates_unpartitioned")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE exchange_rates RENAME TO exchange_rates_partitioned")
+    op.execute("ALTER TABLE exchange_rates_partitioned RENAME CONSTRAINT exchange_rates_pkey TO exchange_rates_partitioned_pkey")
+    op.execute("ALTER TABLE exchange_rates_partitioned RENAME CONSTRAINT uq_exchange_rates_tick TO uq_exchange_rates_partitioned_tick")
+    op.execute("ALTER INDEX ix_exchange_rates_pair_timestamp RENAME TO ix_exchange_rates_partitioned_pair_timestamp")
+
+    op.execute(
+        """
+        CREATE TABLE exchange_rates (
+            id integer NOT NULL DEFAULT nextval('exchange_rates_id_seq'),
+            base_currency_id integer NOT NULL REFERENCES currencies (id),
+            quote_currency_id integer NOT NULL REFERENCES currencies (id),
+            rate numeric(18, 6) NOT NULL,
+            source varchar NOT NULL,
+            "timestamp" timestamp NOT NULL,
+            created_at timestamp NOT NULL,
+            CONSTRAINT exchange_rates_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_exchange_rates_tick UNIQUE (base_currency_id, quote_currency_id, "timestamp", source)
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE exchange_rates_id_seq OWNED BY exchange_rates.id")
+    op.create_index(
+        'ix_exchange_rates_pair_timestamp',
+        'exchange_rates',
+        ['base_currency_id', 'quote_currency_id', sa.text('timestamp DESC')],
+        unique=False,
+        postgresql_include=['rate']
+    )
+
+    op.execute(
+        f"INSERT INTO exchange_rates ({COLUMNS}) SELECT {COLUMNS} FROM exchange_rates_partitioned"
+    )
+    # Drops the attached monthly partitions with it
+    op.execute("DROP TABLE exchange_rates_partitioned")
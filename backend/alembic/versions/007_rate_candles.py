@@ -0,0 +1,71 @@
+"""Add exchange rate candle rollups
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-03-31
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+# Candle resolution -> date_trunc field
+RESOLUTIONS = {'1h': 'hour', '1d': 'day'}
+
+
+def upgrade() -> None:
+    # Create rate_candles table
+    op.create_table(
+        'rate_candles',
+        sa.Column('base_currency_id', sa.Integer(), nullable=False),
+        sa.Column('quote_currency_id', sa.Integer(), nullable=False),
+        sa.Column('resolution', sa.String(3), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('open', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('high', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('low', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('close', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('open_time', sa.DateTime(), nullable=False),
+        sa.Column('close_time', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('base_currency_id', 'quote_currency_id', 'resolution', 'bucket_start'),
+        sa.ForeignKeyConstraint(['base_currency_id'], ['currencies.id'], ),
+        sa.ForeignKeyConstraint(['quote_currency_id'], ['currencies.id'], )
+    )
+
+    # Roll up the ticks stored so far; ingest keeps the candles current from here on
+    for resolution, field in RESOLUTIONS.items():
+        op.execute(
+            f"""
+            INSERT INTO rate_candles (
+                base_currency_id, quote_currency_id, resolution, bucket_start,
+                open, high, low, close, count, open_time, close_time, updated_at
+            )
+            SELECT
+                base_currency_id,
+                quote_currency_id,
+                '{resolution}',
+                date_trunc('{field}', "timestamp"),
+                (array_agg(rate ORDER BY "timestamp", id))[1],
+                max(rate),
+                min(rate),
+                (array_agg(rate ORDER BY "timestamp" DESC, id DESC))[1],
+                count(*),
+                min("timestamp"),
+                max("timestamp"),
+                now()
+            FROM exchange_rates
+            GROUP BY base_currency_id, quote_currency_id, date_trunc('{field}', "timestamp")
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_candles')
@@ -0,0 +1,42 @@
+"""Add id to the pair/time index for keyset pagination
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-04-03
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (timestamp, id) is the keyset of paginated history reads; with id in the index a
+    # page starts with an index seek at the cursor and needs no sort for timestamp ties.
+    # The index keeps its (base, quote, timestamp DESC) prefix and covering rate, so
+    # latest-rate and history lookups are served exactly as before.
+    op.drop_index('ix_exchange_rates_pair_timestamp', table_name='exchange_rates')
+    op.create_index(
+        'ix_exchange_rates_pair_timestamp',
+        'exchange_rates',
+        ['base_currency_id', 'quote_currency_id', sa.text('timestamp DESC'), sa.text('id DESC')],
+        unique=False,
+        postgresql_include=['rate']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_exchange_rates_pair_timestamp', table_name='exchange_rates')
+    op.create_index(
+        'ix_exchange_rates_pair_timestamp',
+        'exchange_rates',
+        ['base_currency_id', 'quote_currency_id', sa.text('timestamp DESC')],
+        unique=False,
+        postgresql_include=['rate']
+    )
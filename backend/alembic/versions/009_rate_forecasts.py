@@ -0,0 +1,42 @@
+"""Add stored rate forecasts
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-04-07
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create rate_forecasts table; the prediction job fills it, so nothing to backfill
+    op.create_table(
+        'rate_forecasts',
+        sa.Column('base_currency_id', sa.Integer(), nullable=False),
+        sa.Column('quote_currency_id', sa.Integer(), nullable=False),
+        sa.Column('model', sa.String(32), nullable=False),
+        sa.Column('horizon_days', sa.Integer(), nullable=False),
+        sa.Column('watermark', sa.DateTime(), nullable=False),
+        sa.Column('target_date', sa.DateTime(), nullable=False),
+        sa.Column('predicted_rate', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('lower_bound', sa.Numeric(precision=18, scale=6), nullable=True),
+        sa.Column('upper_bound', sa.Numeric(precision=18, scale=6), nullable=True),
+        sa.Column('confidence', sa.Numeric(precision=4, scale=3), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('base_currency_id', 'quote_currency_id', 'model', 'horizon_days'),
+        sa.ForeignKeyConstraint(['base_currency_id'], ['currencies.id'], ),
+        sa.ForeignKeyConstraint(['quote_currency_id'], ['currencies.id'], )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_forecasts')
@@ -0,0 +1,39 @@
+"""Add persisted prediction model state
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-04-10
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create prediction_model_states table; the first prediction run fits every pair from scratch
+    op.create_table(
+        'prediction_model_states',
+        sa.Column('base_currency_id', sa.Integer(), nullable=False),
+        sa.Column('quote_currency_id', sa.Integer(), nullable=False),
+        sa.Column('watermark', sa.DateTime(), nullable=False),
+        sa.Column('ar_coefficient', sa.Float(), nullable=False),
+        sa.Column('residual_variance', sa.Float(), nullable=True),
+        sa.Column('ewma', sa.Float(), nullable=False),
+        sa.Column('state', sa.JSON(), nullable=False),
+        sa.Column('refitted_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('base_currency_id', 'quote_currency_id'),
+        sa.ForeignKeyConstraint(['base_currency_id'], ['currencies.id'], ),
+        sa.ForeignKeyConstraint(['quote_currency_id'], ['currencies.id'], )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('prediction_model_states')
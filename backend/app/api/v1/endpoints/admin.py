@@ -2,7 +2,7 @@
 Admin API endpoints.
 This module contains endpoints for admin operations.
 """
-from typing import Any, List
+from typing import Any, Dict, List
 
 from fastapi import APIRouter, HTTPException, status
 
@@ -12,6 +12,12 @@ from app.schemas.user import UserCreate, UserResponse, UserUpdate
 from app.services.auth import create_user_with_email_password
 from app.db.firebase import create_user, update_user, get_user
 from app.utils.audit import log_admin_action
+from app.utils.exchange_apis import provider_fetch_stats
+from app.utils.forecast_cache import forecast_cache
+from app.utils.provider_clients import provider_clients
+from app.utils.provider_registry import provider_registry
+from app.utils.rate_cache import latest_rates
+from app.utils.rate_repository import rate_repository
 
 router = APIRouter()
 
@@ -264,4 +270,100 @@ async def get_audit_logs(
     result = await db.execute(query)
     audit_logs = result.mappings().all()
     
-    return list(audit_logs)
\ No newline at end of file
+    return list(audit_logs)
+
+
+@router.get("/providers/http-stats", response_model=Dict[str, Dict[str, Any]])
+async def get_provider_http_stats(
+    current_user: AdminUser
+) -> Any:
+    """
+    Get connection reuse statistics for the exchange rate provider HTTP clients.
+
+    Args:
+        current_user: Current admin user
+
+    Returns:
+        Request, TCP connect and TLS handshake counts per provider
+    """
+    return provider_clients.get_stats()
+
+
+@router.get("/providers/fetch-stats", response_model=Dict[str, Dict[str, Any]])
+async def get_provider_fetch_stats(
+    current_user: AdminUser
+) -> Any:
+    """
+    Get latency and outcome statistics for exchange rate provider fetches.
+
+    Args:
+        current_user: Current admin user
+
+    Returns:
+        Outcome counts and most recent latency per provider
+    """
+    return provider_fetch_stats
+
+
+@router.get("/providers/health", response_model=Dict[str, Dict[str, Any]])
+async def get_provider_health(
+    current_user: AdminUser
+) -> Any:
+    """
+    Get rolling health statistics for exchange rate providers.
+
+    Args:
+        current_user: Current admin user
+
+    Returns:
+        Circuit state, error rate, latency and ranking score per provider
+    """
+    return provider_registry.get_stats()
+
+
+@router.get("/rates/cache-stats", response_model=Dict[str, Any])
+async def get_rate_cache_stats(
+    current_user: AdminUser
+) -> Any:
+    """
+    Get statistics for the process-local latest-rate cache.
+
+    Args:
+        current_user: Current admin user
+
+    Returns:
+        Hit/miss counters, reload and notification counts and listener state
+    """
+    return latest_rates.get_stats()
+
+
+@router.get("/rates/series-stats", response_model=Dict[str, Any])
+async def get_rate_series_stats(
+    current_user: AdminUser
+) -> Any:
+    """
+    Get statistics for the rate repository's in-memory series cache.
+
+    Args:
+        current_user: Current admin user
+
+    Returns:
+        Series count, cached ranges, points and bytes, and hit/miss/catch-up/query counters
+    """
+    return rate_repository.get_stats()
+
+
+@router.get("/rates/forecast-stats", response_model=Dict[str, Any])
+async def get_rate_forecast_stats(
+    current_user: AdminUser
+) -> Any:
+    """
+    Get statistics for the process-local forecast cache.
+
+    Args:
+        current_user: Current admin user
+
+    Returns:
+        Entry count and hit/miss/load counters
+    """
+    return forecast_cache.get_stats()
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.schemas.user import UserInDB
@@ -28,18 +29,20 @@ async def read_transaction_statistics(
 @router.get("/currency-performance", response_model=Dict[str, Any])
 async def read_currency_performance(
     days: int = Query(90, ge=1, le=365),
+    db: AsyncSession = Depends(deps.get_db),
     current_user: UserInDB = Depends(deps.get_current_active_user)
 ):
     """
     Analyze the performance of different currencies over time.
     """
-    return await get_currency_performance(current_user.id, days)
+    return await get_currency_performance(db, current_user.id, days)
 
 @router.get("/opportunities", response_model=Dict[str, Any])
 async def read_opportunities(
+    db: AsyncSession = Depends(deps.get_db),
     current_user: UserInDB = Depends(deps.get_current_active_user)
 ):
     """
     Find the best currency exchange opportunities based on trends and thresholds.
     """
-    return await find_best_opportunities(current_user.id)
\ No newline at end of file
+    return await find_best_opportunities(db, current_user.id)
\ No newline at end of file
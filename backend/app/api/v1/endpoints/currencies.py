@@ -1,40 +1,147 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.schemas.user import UserInDB
-from app.schemas.currency import ExchangeRate, CurrencyTrend
-from app.services.currency import get_current_rates, get_historical_rates, get_currency_trend_analysis
+from app.schemas.currency import CrossRate, ExchangeRate, ExchangeRatePage, CurrencyTrend, RateCandle, RateForecast
+from app.services.currency import (
+    get_current_rates,
+    get_cross_rate,
+    get_historical_rate_series,
+    get_historical_rates_page,
+    export_rate_history,
+    get_rate_candles,
+    get_currency_trend_analysis,
+    get_rate_forecasts,
+)
 
 router = APIRouter()
 
+RESOLUTION_PATTERN = "^(auto|raw|1h|1d)$"
+CANDLE_RESOLUTION_PATTERN = "^(auto|1h|1d)$"
+EXPORT_FORMAT_PATTERN = "^(arrow|parquet)$"
+
 @router.get("/rates/current", response_model=List[ExchangeRate])
 async def read_current_rates(
+    db: AsyncSession = Depends(deps.get_db),
     current_user: UserInDB = Depends(deps.get_current_active_user)
 ):
     """
     Get current exchange rates for all tracked currencies.
     """
-    return await get_current_rates()
+    return await get_current_rates(db)
+
+@router.get("/rates/cross", response_model=CrossRate)
+async def read_cross_rate(
+    base: str = Query(..., min_length=3, max_length=3),
+    quote: str = Query(..., min_length=3, max_length=3),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: UserInDB = Depends(deps.get_current_active_user)
+):
+    """
+    Get the current exchange rate for any pair of active currencies.
+    """
+    return await get_cross_rate(db, base, quote)
 
 @router.get("/rates/historical", response_model=List[ExchangeRate])
 async def read_historical_rates(
+    response: Response,
     currency_code: str,
     days: int = Query(30, ge=1, le=365),
+    resolution: str = Query("auto", pattern=RESOLUTION_PATTERN),
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
+    db: AsyncSession = Depends(deps.get_db),
     current_user: UserInDB = Depends(deps.get_current_active_user)
 ):
     """
     Get historical exchange rates for a specific currency.
+    
+    "raw" returns every stored tick, "1h"/"1d" return candle closes and "auto"
+    picks the finest candles that keep the response to a few hundred points.
+    With max_points the series is downsampled (LTTB) for charting; the number
+    of points before downsampling is returned in the X-Original-Point-Count header.
+    """
+    rates, original_count = await get_historical_rate_series(db, currency_code, days, resolution, max_points)
+    response.headers["X-Original-Point-Count"] = str(original_count)
+    return rates
+
+@router.get("/rates/historical/page", response_model=ExchangeRatePage)
+async def read_historical_rates_page(
+    currency_code: str,
+    days: int = Query(30, ge=1, le=3650),
+    cursor: Optional[str] = None,
+    page_size: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: UserInDB = Depends(deps.get_current_active_user)
+):
+    """
+    Page through the stored exchange rate ticks of a specific currency, oldest first.
+    
+    Pass the returned next_cursor to get the following page; it is null on the last page.
     """
-    return await get_historical_rates(currency_code, days)
+    return await get_historical_rates_page(db, currency_code, days, cursor, page_size)
+
+@router.get("/rates/export")
+async def export_rates(
+    currency_code: str,
+    base_currency: str = Query("NGN", min_length=3, max_length=3),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    export_format: str = Query("arrow", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: UserInDB = Depends(deps.get_current_active_user)
+):
+    """
+    Export stored exchange rate ticks of a currency pair as Arrow IPC or Parquet.
+    
+    Rows in [start, end) are streamed from a server-side cursor one record batch
+    at a time, so server memory stays flat however long the range is.
+    """
+    stream, media_type, filename = await export_rate_history(
+        db, base_currency, currency_code, start, end, export_format
+    )
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/rates/candles", response_model=List[RateCandle])
+async def read_rate_candles(
+    currency_code: str,
+    days: int = Query(30, ge=1, le=365),
+    resolution: str = Query("auto", pattern=CANDLE_RESOLUTION_PATTERN),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: UserInDB = Depends(deps.get_current_active_user)
+):
+    """
+    Get open/high/low/close candles for a specific currency.
+    """
+    return await get_rate_candles(db, currency_code, days, resolution)
 
 @router.get("/trends", response_model=CurrencyTrend)
 async def read_currency_trends(
     currency_code: str,
     days: int = Query(30, ge=1, le=365),
+    resolution: str = Query("auto", pattern=RESOLUTION_PATTERN),
+    db: AsyncSession = Depends(deps.get_db),
     current_user: UserInDB = Depends(deps.get_current_active_user)
 ):
     """
     Get trend analysis for a specific currency.
     """
-    return await get_currency_trend_analysis(currency_code, days)
\ No newline at end of file
+    return await get_currency_trend_analysis(db, currency_code, days, resolution)
+
+@router.get("/forecasts", response_model=List[RateForecast])
+async def read_rate_forecasts(
+    currency_code: str,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: UserInDB = Depends(deps.get_current_active_user)
+):
+    """
+    Get the daily rate forecasts of the prediction models for a specific currency.
+    """
+    return await get_rate_forecasts(db, currency_code)
@@ -0,0 +1,385 @@
+"""
+Historical exchange rate backfill command.
+This module streams historical rates from CSV/Parquet files or a provider's
+historical endpoint into the exchange_rates table in checkpointed chunks.
+
+Usage:
+    python -m app.cli.backfill_rates --file rates.csv
+    python -m app.cli.backfill_rates --file rates.parquet --chunk-size 20000
+    python -m app.cli.backfill_rates --provider openexchangerates --start 2024-01-01 --end 2024-12-31
+
+Files need base, quote, rate and timestamp (ISO 8601) columns and may have a
+source column. Progress is checkpointed after every committed chunk, so re-running
+the same command after an interruption resumes where it stopped. Already stored
+ticks are skipped, so a chunk replayed after a crash is harmless.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.currency import Currency
+from app.utils.cross_rates import CrossRateMatrix
+from app.utils.exchange_apis import OPENEXCHANGERATES_API_KEY, OPENEXCHANGERATES_NAME
+from app.utils.provider_clients import provider_clients
+from app.utils.rate_segments import flush_segment_rows
+from app.utils.rate_storage import bulk_insert_exchange_rates
+
+logger = logging.getLogger(__name__)
+
+OPENEXCHANGERATES_HISTORICAL_URL = "https://openexchangerates.org/api/historical/{day}.json"
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    """
+    Load backfill progress from a checkpoint file.
+
+    Args:
+        path: Checkpoint file path
+
+    Returns:
+        Checkpoint data, empty if no checkpoint exists
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    """
+    Atomically write backfill progress to a checkpoint file.
+
+    Args:
+        path: Checkpoint file path
+        checkpoint: Checkpoint data
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def iter_csv_records(path: str, skip: int) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from a CSV file.
+
+    Args:
+        path: CSV file path
+        skip: Number of leading records already backfilled
+
+    Yields:
+        Records keyed by column name
+    """
+    with open(path, newline="") as f:
+        for i, record in enumerate(csv.DictReader(f)):
+            if i >= skip:
+                yield record
+
+
+def iter_parquet_records(path: str, skip: int, batch_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from a Parquet file one record batch at a time.
+
+    Args:
+        path: Parquet file path
+        skip: Number of leading records already backfilled
+        batch_size: Records read per batch
+
+    Yields:
+        Records keyed by column name
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet backfill requires the pyarrow package")
+
+    parquet_file = pq.ParquetFile(path)
+    seen = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        if seen + batch.num_rows <= skip:
+            seen += batch.num_rows
+            continue
+        for record in batch.to_pylist()[max(0, skip - seen):]:
+            yield record
+        seen += batch.num_rows
+
+
+def parse_timestamp(value: Any) -> datetime:
+    """
+    Parse a record timestamp into a naive UTC datetime.
+
+    Args:
+        value: ISO 8601 string or datetime
+
+    Returns:
+        Naive UTC datetime
+    """
+    if isinstance(value, datetime):
+        timestamp = value
+    else:
+        timestamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if timestamp.tzinfo is not None:
+        timestamp = datetime.utcfromtimestamp(timestamp.timestamp())
+    return timestamp
+
+
+async def iter_openexchangerates_days(
+    start: date,
+    end: date,
+    base_codes: List[str],
+    currency_codes: List[str]
+) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Fetch one day at a time from the openexchangerates.org historical endpoint.
+
+    Args:
+        start: First day to fetch
+        end: Last day to fetch (inclusive)
+        base_codes: Base currencies to produce records for
+        currency_codes: Currency codes known to the database
+
+    Yields:
+        Tuple of (ISO day, records for that day)
+    """
+    matrix = CrossRateMatrix()
+    day = start
+    while day <= end:
+        response = await provider_clients.request(
+            OPENEXCHANGERATES_NAME,
+            OPENEXCHANGERATES_HISTORICAL_URL.format(day=day.isoformat()),
+            params={"app_id": OPENEXCHANGERATES_API_KEY}
+        )
+        if response.status_code != 200:
+            raise SystemExit(
+                f"OpenExchangeRates request for {day} failed with status {response.status_code}: {response.text}"
+            )
+
+        data = response.json()
+        timestamp = datetime.utcfromtimestamp(data["timestamp"])
+        matrix.update("USD", data.get("rates", {}), currency_codes, OPENEXCHANGERATES_NAME, timestamp)
+
+        records = []
+        for base_code in base_codes:
+            for quote_code, rate in matrix.get_row(base_code).items():
+                records.append({
+                    "base": base_code,
+                    "quote": quote_code,
+                    "rate": rate,
+                    "timestamp": timestamp,
+                    "source": OPENEXCHANGERATES_NAME,
+                })
+        yield day.isoformat(), records
+        day += timedelta(days=1)
+
+
+class BackfillWriter:
+    """
+    Buffers backfill records and writes them in committed, checkpointed chunks.
+    """
+
+    def __init__(
+        self,
+        currency_map: Dict[str, int],
+        checkpoint_path: str,
+        checkpoint: Dict[str, Any],
+        chunk_size: int,
+        default_source: str
+    ) -> None:
+        self.currency_map = currency_map
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size
+        self.default_source = default_source
+        self.rows: List[Dict[str, Any]] = []
+        self.records_seen = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.started = time.perf_counter()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """
+        Convert a record to an exchange rate row and buffer it.
+
+        Args:
+            record: Record with base, quote, rate, timestamp and optional source
+        """
+        self.records_seen += 1
+        base_id = self.currency_map.get(str(record["base"]).upper())
+        quote_id = self.currency_map.get(str(record["quote"]).upper())
+        rate = float(record["rate"]) if record.get("rate") not in (None, "") else 0.0
+        if base_id is None or quote_id is None or rate <= 0:
+            self.rows_skipped += 1
+            return
+
+        self.rows.append({
+            "base_currency_id": base_id,
+            "quote_currency_id": quote_id,
+            "rate": rate,
+            "source": record.get("source") or self.default_source,
+            "timestamp": parse_timestamp(record["timestamp"]),
+            "created_at": datetime.utcnow(),
+        })
+
+    @property
+    def is_full(self) -> bool:
+        """True once a full chunk is buffered."""
+        return len(self.rows) >= self.chunk_size
+
+    async def flush(self, **progress: Any) -> None:
+        """
+        Write buffered rows in one transaction, then checkpoint progress.
+
+        Args:
+            **progress: Checkpoint fields describing how far the input has been consumed
+        """
+        if self.rows:
+            async with AsyncSessionLocal() as db:
+                self.rows_written += await bulk_insert_exchange_rates(db, self.rows)
+                await db.commit()
+                await flush_segment_rows(db)
+            self.rows = []
+
+        self.checkpoint.update(progress)
+        save_checkpoint(self.checkpoint_path, self.checkpoint)
+
+        elapsed = time.perf_counter() - self.started
+        logger.info(
+            f"Backfill progress: {self.records_seen} records read, {self.rows_written} rows written, "
+            f"{self.rows_skipped} skipped, {self.records_seen / elapsed if elapsed else 0:.0f} rows/s"
+        )
+
+
+async def backfill_file(path: str, writer: BackfillWriter, chunk_size: int) -> None:
+    """
+    Backfill rates from a CSV or Parquet file.
+
+    Args:
+        path: Input file path
+        writer: Backfill writer
+        chunk_size: Rows per committed chunk
+    """
+    done = writer.checkpoint.get("records_done", 0)
+    if done:
+        logger.info(f"Resuming {path} after {done} records")
+
+    if path.endswith(".parquet"):
+        records = iter_parquet_records(path, done, chunk_size)
+    else:
+        records = iter_csv_records(path, done)
+
+    for record in records:
+        writer.add(record)
+        if writer.is_full:
+            await writer.flush(records_done=done + writer.records_seen)
+    await writer.flush(records_done=done + writer.records_seen)
+
+
+async def backfill_provider(start: date, end: date, writer: BackfillWriter) -> None:
+    """
+    Backfill rates from the openexchangerates.org historical endpoint.
+
+    Args:
+        start: First day to backfill
+        end: Last day to backfill (inclusive)
+        writer: Backfill writer
+    """
+    last_day = writer.checkpoint.get("last_day")
+    if last_day:
+        start = date.fromisoformat(last_day) + timedelta(days=1)
+        logger.info(f"Resuming provider backfill from {start}")
+
+    base_codes = json.loads(settings.EXCHANGE_RATE_BASE_CURRENCIES)
+    if "*" in base_codes:
+        base_codes = list(writer.currency_map)
+
+    try:
+        days = iter_openexchangerates_days(start, end, base_codes, list(writer.currency_map))
+        async for last_day, records in days:
+            for record in records:
+                writer.add(record)
+            if writer.is_full:
+                await writer.flush(last_day=last_day)
+        await writer.flush(last_day=last_day)
+    finally:
+        await provider_clients.close()
+
+
+async def run_backfill(args: argparse.Namespace) -> None:
+    """
+    Run a backfill from parsed command line arguments.
+
+    Args:
+        args: Parsed arguments
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Currency.code, Currency.id))
+        currency_map = {code: currency_id for code, currency_id in result.all()}
+
+    if args.file:
+        checkpoint_path = args.checkpoint or f"{args.file}.checkpoint.json"
+        default_source = args.source or f"backfill:{os.path.basename(args.file)}"
+    else:
+        checkpoint_path = args.checkpoint or f".backfill-{args.provider}.checkpoint.json"
+        default_source = args.source or OPENEXCHANGERATES_NAME
+
+    writer = BackfillWriter(
+        currency_map=currency_map,
+        checkpoint_path=checkpoint_path,
+        checkpoint=load_checkpoint(checkpoint_path),
+        chunk_size=args.chunk_size,
+        default_source=default_source
+    )
+
+    if args.file:
+        await backfill_file(args.file, writer, args.chunk_size)
+    else:
+        await backfill_provider(args.start, args.end, writer)
+
+    elapsed = time.perf_counter() - writer.started
+    logger.info(
+        f"Backfill complete: {writer.rows_written} rows written in {elapsed:.1f} seconds "
+        f"({writer.rows_written / elapsed if elapsed else 0:.0f} rows/s)"
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Args:
+        argv: Argument list, defaults to sys.argv
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Backfill historical exchange rates")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="CSV or Parquet file with base, quote, rate, timestamp columns")
+    source.add_argument("--provider", choices=["openexchangerates"], help="Provider historical endpoint")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day to backfill (provider mode)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day to backfill (provider mode)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per committed chunk")
+    parser.add_argument("--checkpoint", help="Checkpoint file path")
+    parser.add_argument("--source", help="Source recorded for rows that do not name one")
+    args = parser.parse_args(argv)
+
+    if args.provider and not args.start:
+        parser.error("--start is required with --provider")
+    if args.provider and not args.end:
+        args.end = datetime.utcnow().date() - timedelta(days=1)
+    return args
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(run_backfill(parse_args()))
@@ -0,0 +1,76 @@
+"""
+Rate segment rebuild command.
+This module regenerates the memory-mapped per-pair rate segment files from the
+exchange_rates table. Run it once after enabling RATE_SEGMENTS_ENABLED, for pairs
+added since, or whenever a segment has fallen out of step with the database.
+
+Usage:
+    python -m app.cli.rebuild_segments
+    python -m app.cli.rebuild_segments --pair NGN/USD --pair NGN/EUR
+
+Rows committed while a pair is being rebuilt may be missing from its new segment;
+pause ingest for a full rebuild, or rebuild the affected pairs again afterwards.
+"""
+import argparse
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.currency import Currency
+from app.utils.rate_segments import rebuild_segments
+
+logger = logging.getLogger(__name__)
+
+
+async def run_rebuild(args: argparse.Namespace) -> None:
+    """
+    Rebuild segments from parsed command line arguments.
+
+    Args:
+        args: Parsed arguments
+    """
+    async with AsyncSessionLocal() as db:
+        pairs = None
+        if args.pair:
+            result = await db.execute(select(Currency.code, Currency.id))
+            currency_map = {code: currency_id for code, currency_id in result.all()}
+            pairs = []
+            for pair in args.pair:
+                base_code, _, quote_code = pair.upper().partition("/")
+                if base_code not in currency_map or quote_code not in currency_map:
+                    raise SystemExit(f"Unknown currency pair {pair}")
+                pairs.append((currency_map[base_code], currency_map[quote_code]))
+
+        stats = await rebuild_segments(db, pairs, args.chunk_size)
+
+    logger.info(
+        f"Rebuilt {stats['pairs']} rate segments in {settings.RATE_SEGMENT_DIR}: "
+        f"{stats['records']} records, {stats['bytes']} bytes in {stats['seconds']} seconds"
+    )
+    if not settings.RATE_SEGMENTS_ENABLED:
+        logger.warning("RATE_SEGMENTS_ENABLED is off, so the segments are neither read nor extended")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Args:
+        argv: Argument list, defaults to sys.argv
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Rebuild memory-mapped rate segment files")
+    parser.add_argument("--pair", action="append", help="Pair to rebuild as BASE/QUOTE, repeatable (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows fetched per round trip")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(run_rebuild(parse_args()))
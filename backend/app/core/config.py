@@ -49,6 +49,52 @@ class Settings(BaseSettings):
 
     # Exchange rate update settings
     EXCHANGE_RATE_UPDATE_INTERVAL: int = 3600  # Update exchange rates every hour (in seconds)
+    EXCHANGE_RATE_FETCH_MODE: str = "hedged"  # Options: "sequential", "hedged", or "parallel"
+    EXCHANGE_RATE_HEDGE_DELAY: float = 1.5  # Wait before starting the next provider in hedged mode (in seconds)
+    EXCHANGE_RATE_CONSENSUS_ENABLED: bool = True  # Combine all providers when keys for all of them are set
+    EXCHANGE_RATE_CONSENSUS_METHOD: str = "median"  # Options: "median" or "trimmed_mean"
+    EXCHANGE_RATE_CONSENSUS_MAD_TOLERANCE: float = 3.0  # Scaled MADs a provider value may deviate before it is dropped
+    EXCHANGE_RATE_BASE_CURRENCIES: str = '["NGN"]'  # Base currencies stored on each update as JSON string, "*" for all
+    RATE_INSERT_BATCH_SIZE: int = 1000  # Rows per multi-row INSERT statement
+    RATE_COPY_THRESHOLD: int = 500  # Use COPY instead of INSERT for batches at least this large (PostgreSQL only)
+    CANDLE_MAX_POINTS: int = 500  # Automatic resolution picks the finest candles that stay within this many rows
+    RATE_EXPORT_BATCH_SIZE: int = 50000  # Rows per cursor fetch and per Arrow record batch in rate exports
+
+    # Exchange rate partitioning settings (PostgreSQL only)
+    PARTITION_MAINTENANCE_INTERVAL: int = 24 * 3600  # Run partition maintenance once per day (in seconds)
+    PARTITION_PREMAKE_MONTHS: int = 3  # Monthly partitions created ahead of the current month
+    RATE_RETENTION_MONTHS: int = 0  # Remove partitions entirely older than this many months, 0 keeps everything
+    RATE_RETENTION_MODE: str = "detach"  # Options: "detach" (keep as standalone table) or "drop"
+
+    # Exchange rate compaction settings
+    RATE_COMPACTION_AGE_DAYS: int = 0  # Fold raw ticks older than this many days into daily candles, 0 disables
+    RATE_COMPACTION_BATCH_SIZE: int = 5000  # Rows compacted and deleted per transaction
+    RATE_COMPACTION_INTERVAL: int = 24 * 3600  # Run compaction once per day (in seconds)
+
+    # Exchange rate provider HTTP client settings
+    PROVIDER_HTTP_TIMEOUT: float = 10.0  # Overall request timeout (in seconds)
+    PROVIDER_HTTP_CONNECT_TIMEOUT: float = 5.0  # Connection establishment timeout (in seconds)
+    PROVIDER_HTTP_MAX_CONNECTIONS: int = 10  # Maximum open connections per provider
+    PROVIDER_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 5  # Idle connections kept alive per provider
+    PROVIDER_HTTP_KEEPALIVE_EXPIRY: float = 2 * 3600.0  # Keep idle connections across hourly updates (in seconds)
+    PROVIDER_HTTP2_ENABLED: bool = True  # Use HTTP/2 when the h2 package is installed
+
+    # Exchange rate provider health settings
+    PROVIDER_HEALTH_WINDOW: int = 20  # Number of recent fetches used for rolling latency and error rate
+    PROVIDER_HEALTH_STALE_AFTER: int = 6 * 3600  # Discard a provider's samples when it has not been used for this long (in seconds)
+    PROVIDER_CIRCUIT_FAILURE_THRESHOLD: int = 3  # Consecutive failures before a provider's circuit opens
+    PROVIDER_CIRCUIT_COOLDOWN: int = 600  # Wait before probing a failed provider again (in seconds)
+    PROVIDER_QUOTA_COOLDOWN: int = 6 * 3600  # Skip a provider with exhausted quota when no reset time is given (in seconds)
+
+    # Latest-rate cache settings
+    RATE_CACHE_ENABLED: bool = True  # Serve latest rates from a process-local cache
+    RATE_CACHE_NOTIFY_CHANNEL: str = "current_rates"  # PostgreSQL LISTEN/NOTIFY channel announcing new rates
+    RATE_CACHE_RECONNECT_DELAY: float = 5.0  # Wait before reopening a lost LISTEN connection (in seconds)
+
+    # On-disk rate segment settings
+    RATE_SEGMENTS_ENABLED: bool = False  # Serve raw rate history from memory-mapped per-pair segment files
+    RATE_SEGMENT_DIR: str = "data/rate_segments"  # Directory holding the segment files
+    RATE_SERIES_MAX_BYTES: int = 256 * 1024 * 1024  # Evict least recently used in-memory rate series beyond this size, 0 for no limit
 
     # Alert settings
     ALERT_CHECK_INTERVAL: int = 300  # Check alerts every 5 minutes (in seconds)
@@ -56,6 +102,12 @@ class Settings(BaseSettings):
     # Prediction settings
     PREDICTION_WINDOW_DAYS: int = 30  # Number of days of historical data to use for predictions
     PREDICTION_HORIZON_DAYS: int = 7  # Number of days to predict into the future
+    PREDICTION_WORKERS: int = 0  # Worker processes fitting prediction models, 0 for one per CPU core
+    PREDICTION_ARIMA_BACKEND: str = "native"  # "native" (batched least squares) or "statsmodels" (reference)
+    PREDICTION_FULL_REFIT_INTERVAL: int = 7 * 24 * 3600  # Refit model state from the whole window at least this often (in seconds)
+    PREDICTION_DRIFT_THRESHOLD: float = 4.0  # One-step ARIMA error, in residual standard deviations, that forces a full refit
+    FORECAST_CACHE_TTL: int = 6 * 3600  # Longest a forecast is served while its data watermark still matches (in seconds)
+    FORECAST_TREND_WINDOWS: List[int] = [30, 90]  # Trend analysis windows (days) the prediction job precomputes
 
     # User currency preferences
     DEFAULT_BASE_CURRENCY: str = "USD"  # Default base currency
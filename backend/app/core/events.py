@@ -9,6 +9,10 @@ from fastapi import FastAPI
 
 from app.db.init_db import init_db
 from app.core.scheduler import start_scheduler, stop_scheduler
+from app.utils.exchange_apis import PROVIDER_NAMES
+from app.utils.prediction import shutdown_prediction_pool
+from app.utils.provider_clients import provider_clients
+from app.utils.rate_cache import latest_rates
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +35,13 @@ def create_start_app_handler(app: FastAPI) -> Callable:
         
         # Initialize database with default data
         await init_db()
-        
+
+        # Open pooled HTTP clients for exchange rate providers
+        await provider_clients.start(PROVIDER_NAMES)
+
+        # Listen for latest-rate changes published by ingest
+        await latest_rates.start()
+
         # Start background tasks
         await start_scheduler()
         
@@ -58,7 +68,16 @@ def create_stop_app_handler(app: FastAPI) -> Callable:
         
         # Stop background tasks
         await stop_scheduler()
-        
+
+        # Close pooled provider HTTP clients
+        await provider_clients.close()
+
+        # Stop listening for latest-rate changes
+        await latest_rates.stop()
+
+        # Stop prediction worker processes
+        shutdown_prediction_pool()
+
         logger.info("Shutdown cleanup complete")
     
     return stop_app
\ No newline at end of file
@@ -10,6 +10,8 @@ from typing import Callable, Dict, Set
 from app.core.config import settings
 from app.utils.exchange_apis import update_exchange_rates
 from app.utils.prediction import run_prediction_analysis, check_alerts
+from app.utils.rate_compaction import compact_rates
+from app.utils.rate_partitions import maintain_partitions
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +65,8 @@ async def start_scheduler() -> None:
         "exchange_rate_update": (update_exchange_rates, settings.EXCHANGE_RATE_UPDATE_INTERVAL),
         "prediction_analysis": (run_prediction_analysis, 24 * 3600),  # Run once per day
         "alert_check": (check_alerts, settings.ALERT_CHECK_INTERVAL),
+        "partition_maintenance": (maintain_partitions, settings.PARTITION_MAINTENANCE_INTERVAL),
+        "rate_compaction": (compact_rates, settings.RATE_COMPACTION_INTERVAL),
     }
     
     # Create and start tasks
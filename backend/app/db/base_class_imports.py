@@ -8,7 +8,7 @@ This module imports all models to ensure they are registered with SQLAlchemy.
 
 # Import all models
 from app.models.user import User  # noqa
-from app.models.currency import Currency, ExchangeRate  # noqa
+from app.models.currency import Currency, CurrentRate, ExchangeRate, RateCandle, RateForecast, PredictionModelState  # noqa
 from app.models.transaction import Transaction  # noqa
 from app.models.wallet import Wallet  # noqa
 from app.models.alert import Alert  # noqa
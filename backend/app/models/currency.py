@@ -4,7 +4,7 @@ This module defines the Currency model for storing currency information.
 """
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, JSON, Numeric, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -58,18 +58,28 @@ class Currency(Base):
     )
 
 
+# Columns identifying one stored rate tick; ingestion skips rows that repeat a key
+EXCHANGE_RATE_TICK_KEY = ["base_currency_id", "quote_currency_id", "timestamp", "source"]
+
+
 class ExchangeRate(Base):
     """
     Exchange Rate model for storing currency exchange rates.
+    
+    On PostgreSQL the table is range partitioned by month on timestamp (see
+    app.utils.rate_partitions).
     """
     __tablename__ = "exchange_rates"
+    __table_args__ = (
+        UniqueConstraint(*EXCHANGE_RATE_TICK_KEY, name="uq_exchange_rates_tick"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    base_currency_id = Column(Integer, nullable=False, index=True)
-    quote_currency_id = Column(Integer, nullable=False, index=True)
-    rate = Column("rate", nullable=False)
+    base_currency_id = Column(Integer, ForeignKey("currencies.id"), nullable=False, index=True)
+    quote_currency_id = Column(Integer, ForeignKey("currencies.id"), nullable=False, index=True)
+    rate = Column(Numeric(precision=18, scale=6), nullable=False)
     source = Column(String, nullable=False)  # Source of the exchange rate data
-    timestamp = Column(DateTime, nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # Provider-reported time the rate was last updated
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
@@ -82,4 +92,90 @@ class ExchangeRate(Base):
         "Currency",
         foreign_keys=[quote_currency_id],
         back_populates="quote_rates"
-    )
\ No newline at end of file
+    )
+
+
+# Serves pair lookups ordered by time and (timestamp, id) keyset pagination;
+# covering on PostgreSQL for index-only scans
+Index(
+    "ix_exchange_rates_pair_timestamp",
+    ExchangeRate.base_currency_id,
+    ExchangeRate.quote_currency_id,
+    ExchangeRate.timestamp.desc(),
+    ExchangeRate.id.desc(),
+    postgresql_include=["rate"],
+)
+
+
+class CurrentRate(Base):
+    """
+    Latest exchange rate per currency pair, maintained on every ingest.
+    """
+    __tablename__ = "current_rates"
+    
+    base_currency_id = Column(Integer, ForeignKey("currencies.id"), primary_key=True)
+    quote_currency_id = Column(Integer, ForeignKey("currencies.id"), primary_key=True)
+    rate = Column(Numeric(precision=18, scale=6), nullable=False)
+    source = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # Provider-reported time of the latest tick
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class RateCandle(Base):
+    """
+    Open/high/low/close rollup of the exchange rate ticks of a pair in one time bucket.
+    """
+    __tablename__ = "rate_candles"
+    
+    base_currency_id = Column(Integer, ForeignKey("currencies.id"), primary_key=True)
+    quote_currency_id = Column(Integer, ForeignKey("currencies.id"), primary_key=True)
+    resolution = Column(String(3), primary_key=True)  # "1h" or "1d"
+    bucket_start = Column(DateTime, primary_key=True)
+    open = Column(Numeric(precision=18, scale=6), nullable=False)
+    high = Column(Numeric(precision=18, scale=6), nullable=False)
+    low = Column(Numeric(precision=18, scale=6), nullable=False)
+    close = Column(Numeric(precision=18, scale=6), nullable=False)
+    count = Column(Integer, nullable=False)  # Number of ticks in the bucket
+    open_time = Column(DateTime, nullable=False)  # Timestamp of the tick that set the open
+    close_time = Column(DateTime, nullable=False)  # Timestamp of the tick that set the close
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class RateForecast(Base):
+    """
+    Stored forecast of a pair's rate some days ahead, one row per model and horizon.
+    
+    watermark is the timestamp of the newest point the model was fitted on; the
+    forecast only applies while the pair's data still ends there.
+    """
+    __tablename__ = "rate_forecasts"
+    
+    base_currency_id = Column(Integer, ForeignKey("currencies.id"), primary_key=True)
+    quote_currency_id = Column(Integer, ForeignKey("currencies.id"), primary_key=True)
+    model = Column(String(32), primary_key=True)  # e.g. "ensemble" or "trend_1h_30d"
+    horizon_days = Column(Integer, primary_key=True)
+    watermark = Column(DateTime, nullable=False)
+    target_date = Column(DateTime, nullable=False)
+    predicted_rate = Column(Numeric(precision=18, scale=6), nullable=False)
+    lower_bound = Column(Numeric(precision=18, scale=6), nullable=True)
+    upper_bound = Column(Numeric(precision=18, scale=6), nullable=True)
+    confidence = Column(Numeric(precision=4, scale=3), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class PredictionModelState(Base):
+    """
+    Fitted prediction model state of a pair's daily window, updated incrementally between full refits.
+    """
+    __tablename__ = "prediction_model_states"
+    
+    base_currency_id = Column(Integer, ForeignKey("currencies.id"), primary_key=True)
+    quote_currency_id = Column(Integer, ForeignKey("currencies.id"), primary_key=True)
+    watermark = Column(DateTime, nullable=False)  # Newest daily close taken in
+    ar_coefficient = Column(Float, nullable=False)  # ARIMA(1,1,0) coefficient of the differences
+    residual_variance = Column(Float, nullable=True)  # ARIMA residual variance, null before any fit
+    ewma = Column(Float, nullable=False)
+    state = Column(JSON, nullable=False)  # Regression sufficient statistics and window bookkeeping
+    refitted_at = Column(DateTime, nullable=False)  # Last full refit
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -39,6 +39,44 @@ class ExchangeRate(ExchangeRateBase):
     timestamp: datetime
 
 
+class ExchangeRatePage(BaseModel):
+    items: List[ExchangeRate]
+    next_cursor: Optional[str] = None  # Opaque; pass back to get the following page, None on the last page
+
+
+class CrossRate(BaseModel):
+    base_currency: str
+    quote_currency: str
+    rate: float
+    source: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+
+class RateCandle(BaseModel):
+    base_currency: str
+    quote_currency: str
+    resolution: str  # "1h" or "1d"
+    bucket_start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    count: int
+
+
+class RateForecast(BaseModel):
+    base_currency: str
+    quote_currency: str
+    model: str
+    horizon_days: int
+    date: datetime
+    predicted_rate: float
+    lower_bound: Optional[float] = None
+    upper_bound: Optional[float] = None
+    confidence: Optional[float] = None
+    watermark: datetime  # Timestamp of the newest point the model was fitted on
+
+
 class CurrencyTrend(BaseModel):
     currency_code: str
     currency_name: str
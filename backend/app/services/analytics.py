@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
 import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.transaction import get_user_transactions
-from app.services.currency import get_historical_rates, get_currency_trend_analysis
+from app.services.currency import get_currency_trend_analyses
 from app.schemas.transaction import Transaction
 
 async def analyze_profit_loss(user_id: str) -> Dict[str, Any]:
@@ -145,13 +146,13 @@ async def get_transaction_statistics(user_id: str) -> Dict[str, Any]:
     
     return result
 
-async def get_currency_performance(user_id: str, days: int = 90) -> Dict[str, Any]:
+async def get_currency_performance(db: AsyncSession, user_id: str, days: int = 90) -> Dict[str, Any]:
     """Analyze the performance of different currencies over time"""
     result = {}
     
-    for currency_code in ["USD", "GBP", "EUR"]:
+    trends = await get_currency_trend_analyses(db, ["USD", "GBP", "EUR"], days)
+    for currency_code, trend in trends.items():
         try:
-            trend = await get_currency_trend_analysis(currency_code, days)
             performance = {
                 "current_rate": trend.current_rate,
                 "avg_rate": trend.avg_rate,
@@ -168,7 +169,7 @@ async def get_currency_performance(user_id: str, days: int = 90) -> Dict[str, An
     
     return result
 
-async def find_best_opportunities(user_id: str) -> Dict[str, Any]:
+async def find_best_opportunities(db: AsyncSession, user_id: str) -> Dict[str, Any]:
     """Find the best currency exchange opportunities based on trends and thresholds"""
     opportunities = {
         "buy": [],
@@ -176,10 +177,9 @@ async def find_best_opportunities(user_id: str) -> Dict[str, Any]:
         "hold": []
     }
     
-    for currency_code in ["USD", "GBP", "EUR"]:
+    trends = await get_currency_trend_analyses(db, ["USD", "GBP", "EUR"], 30)
+    for currency_code, trend in trends.items():
         try:
-            trend = await get_currency_trend_analysis(currency_code, 30)
-            
             # Calculate scores for different actions
             buy_score = 0
             sell_score = 0
@@ -1,13 +1,36 @@
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+import base64
+import binascii
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 import httpx
 from fastapi import HTTPException
 import numpy as np
-from sklearn.linear_model import LinearRegression
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.db.firebase import currencies_collection, exchange_rates_collection
-from app.schemas.currency import Currency, ExchangeRate, CurrencyTrend
+from app.models.currency import Currency as CurrencyModel, ExchangeRate as ExchangeRateModel, RateCandle as RateCandleModel
+from app.schemas.currency import Currency, CrossRate, ExchangeRate, ExchangeRatePage, CurrencyTrend, RateCandle, RateForecast
+from app.utils.cross_rates import cross_rates
+from app.utils.downsampling import lttb_indices
+from app.utils.exchange_apis import get_all_current_rates
+from app.utils.forecast_cache import forecast_cache
+from app.utils.prediction_models import (
+    ENSEMBLE_MODEL,
+    predict_future_rates,
+    predict_trend_rates_batch,
+    trend_model_name,
+)
+from app.utils.rate_candles import choose_resolution, get_candles
+from app.utils.rate_compaction import COMPACTED_RESOLUTION, compacted_rate_query, split_at_horizon
+from app.utils.rate_export import EXPORT_FORMATS, stream_rate_export
+from app.utils.rate_repository import rate_repository
+from app.utils.rate_window import RateWindow, from_epoch
+
+logger = logging.getLogger(__name__)
 
 async def fetch_exchange_rates_from_api() -> Dict[str, float]:
     """Fetch latest exchange rates from external API"""
@@ -100,90 +123,327 @@ def get_currency_symbol(currency_code: str) -> str:
     }
     return currency_symbols.get(currency_code, currency_code)
 
-async def get_current_rates() -> List[ExchangeRate]:
-    """Get the most recent exchange rates for all tracked currencies"""
-    result = []
-    
-    for currency_code in settings.TRACKED_CURRENCIES:
-        # Get the most recent rate for this currency
-        rates = exchange_rates_collection.where(
-            "currency_code", "==", currency_code
-        ).order_by(
-            "timestamp", direction="DESCENDING"
-        ).limit(1).get()
-        
-        for rate_doc in rates:
-            rate_data = rate_doc.to_dict()
-            rate_data["id"] = rate_doc.id
-            result.append(ExchangeRate(**rate_data))
-    
-    # If any rate is older than 1 hour, fetch new rates
-    should_update = False
-    if result:
-        oldest_rate = min(result, key=lambda r: r.timestamp)
-        if (datetime.utcnow() - oldest_rate.timestamp) > timedelta(hours=1):
-            should_update = True
-    else:
-        should_update = True
-        
-    if should_update:
-        await update_exchange_rates()
-        # Get fresh rates
-        return await get_current_rates()
-        
-    return result
-
-async def get_historical_rates(currency_code: str, days: int = 30) -> List[ExchangeRate]:
-    """Get historical exchange rates for a specific currency"""
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
-    
-    rates = exchange_rates_collection.where(
-        "currency_code", "==", currency_code
-    ).where(
-        "timestamp", ">=", start_date
-    ).where(
-        "timestamp", "<=", end_date
-    ).order_by(
-        "timestamp"
-    ).get()
-    
-    result = []
-    for rate_doc in rates:
-        rate_data = rate_doc.to_dict()
-        rate_data["id"] = rate_doc.id
-        result.append(ExchangeRate(**rate_data))
-    
-    return result
-
-async def get_currency_trend_analysis(currency_code: str, days: int = 30) -> CurrencyTrend:
-    """Analyze trends for a specific currency"""
-    rates = await get_historical_rates(currency_code, days)
+async def get_current_rates(db: AsyncSession) -> List[ExchangeRate]:
+    """Get the most recent NGN exchange rates for all tracked currencies from the latest-rate cache"""
+    tracked_currencies = json.loads(settings.TRACKED_CURRENCIES)
+    current_rates = await get_all_current_rates(db, "NGN")
+    
+    return [
+        ExchangeRate(
+            id=f"{r['base_currency']['code']}/{r['quote_currency']['code']}",
+            currency_code=r["quote_currency"]["code"],
+            base_currency=r["base_currency"]["code"],
+            rate=r["rate"],
+            source=r["source"],
+            timestamp=r["timestamp"]
+        )
+        for r in current_rates
+        if r["quote_currency"]["code"] in tracked_currencies
+    ]
+
+async def load_cross_rates(db: AsyncSession) -> None:
+    """Rebuild the cross-rate matrix from the latest stored NGN rates, keeping their source and timestamp"""
+    generation = cross_rates.generation
+    current_rates = await get_all_current_rates(db, "NGN")
+    if not current_rates:
+        return
+    
+    ngn_rates = {r["quote_currency"]["code"]: r["rate"] for r in current_rates}
+    newest = max(current_rates, key=lambda r: r["timestamp"])
+    cross_rates.update("NGN", ngn_rates, ["NGN", *ngn_rates], newest["source"], newest["timestamp"])
     
-    if not rates:
+    # Rates stored while the snapshot was read may not be in it
+    if cross_rates.generation != generation:
+        cross_rates.invalidate()
+
+async def get_cross_rate(db: AsyncSession, base_currency: str, quote_currency: str) -> CrossRate:
+    """Get the current rate for any currency pair from the cross-rate matrix"""
+    if not cross_rates.is_fresh:
+        await load_cross_rates(db)
+    
+    rate = cross_rates.get_rate(base_currency.upper(), quote_currency.upper())
+    if rate is None:
         raise HTTPException(
             status_code=404,
-            detail=f"No rate data found for {currency_code} in the last {days} days"
+            detail=f"No rate available for {base_currency}/{quote_currency}"
         )
     
-    # Extract rate values and timestamps
-    rate_values = [r.rate for r in rates]
-    timestamps = [(r.timestamp - rates[0].timestamp).total_seconds() / (24*3600) for r in rates]
+    return CrossRate(
+        base_currency=base_currency.upper(),
+        quote_currency=quote_currency.upper(),
+        rate=rate,
+        source=cross_rates.source,
+        timestamp=cross_rates.updated_at
+    )
+
+async def get_pair_ids(db: AsyncSession, base_currency: str, quote_currency: str) -> Tuple[int, int]:
+    """Look up the database IDs of a currency pair"""
+    result = await db.execute(
+        select(CurrencyModel.code, CurrencyModel.id).where(
+            CurrencyModel.code.in_([base_currency, quote_currency])
+        )
+    )
+    ids = dict(result.all())
     
-    # Calculate basic statistics
-    min_rate = min(rate_values)
-    max_rate = max(rate_values)
-    avg_rate = sum(rate_values) / len(rate_values)
-    current_rate = rate_values[-1]
+    if base_currency not in ids or quote_currency not in ids:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown currency pair {base_currency}/{quote_currency}"
+        )
     
-    # Calculate trend using linear regression
-    X = np.array(timestamps).reshape(-1, 1)
-    y = np.array(rate_values)
+    return ids[base_currency], ids[quote_currency]
+
+async def get_historical_rate_series(
+    db: AsyncSession,
+    currency_code: str,
+    days: int = 30,
+    resolution: str = "auto",
+    max_points: Optional[int] = None
+) -> Tuple[List[ExchangeRate], int]:
+    """
+    Get historical NGN exchange rates for a specific currency, as raw ticks or candle closes,
+    optionally downsampled with LTTB to at most max_points points.
     
-    model = LinearRegression()
-    model.fit(X, y)
+    Raw ticks keep their ids, sources and full-precision timestamps.
+    Returns the rates and the number of points before downsampling.
+    """
+    currency_code = currency_code.upper()
+    base_id, quote_id = await get_pair_ids(db, "NGN", currency_code)
+    
+    if resolution == "auto":
+        resolution = choose_resolution(days)
+    
+    if resolution == "raw":
+        ticks = await rate_repository.get_ticks(db, base_id, quote_id, days)
+        timestamps = np.array([tick[3] for tick in ticks], dtype="datetime64[us]").astype(np.float64)
+        values = np.fromiter((tick[1] for tick in ticks), dtype=np.float64, count=len(ticks))
+    else:
+        window = await rate_repository.get_window(db, base_id, quote_id, resolution, days)
+        timestamps, values = window.timestamps, window.rates
+    original_count = len(timestamps)
+    
+    # Downsample before building response models so dropped points cost nothing
+    if max_points is not None and original_count > max_points:
+        indices = lttb_indices(timestamps, values, max_points)
+    else:
+        indices = np.arange(original_count)
+    
+    rates = []
+    if resolution == "raw":
+        for i in indices.tolist():
+            rate_id, rate, source, timestamp = ticks[i]
+            rates.append(ExchangeRate(
+                id=f"{COMPACTED_RESOLUTION}:{timestamp.isoformat()}" if rate_id is None else str(rate_id),
+                currency_code=currency_code,
+                base_currency="NGN",
+                rate=rate,
+                source=source,
+                timestamp=timestamp
+            ))
+        return rates, original_count
+    
+    source = f"candles:{resolution}"
+    for epoch, rate in zip(timestamps[indices].tolist(), values[indices].tolist()):
+        timestamp = from_epoch(epoch)
+        rates.append(ExchangeRate(
+            id=f"{resolution}:{timestamp.isoformat()}",
+            currency_code=currency_code,
+            base_currency="NGN",
+            rate=rate,
+            source=source,
+            timestamp=timestamp
+        ))
+    return rates, original_count
+
+async def get_historical_rates(
+    db: AsyncSession,
+    currency_code: str,
+    days: int = 30,
+    resolution: str = "auto"
+) -> List[ExchangeRate]:
+    """Get historical NGN exchange rates for a specific currency, as raw ticks or candle closes"""
+    rates, _ = await get_historical_rate_series(db, currency_code, days, resolution)
+    return rates
+
+def encode_rate_cursor(timestamp: datetime, rate_id: int) -> str:
+    """Encode the (timestamp, id) keyset position of a rate as an opaque cursor"""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{rate_id}".encode()).decode()
+
+def decode_rate_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_rate_cursor"""
+    try:
+        timestamp, rate_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(rate_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def get_historical_rates_page(
+    db: AsyncSession,
+    currency_code: str,
+    days: int = 30,
+    cursor: Optional[str] = None,
+    page_size: int = 1000
+) -> ExchangeRatePage:
+    """
+    Get one page of stored NGN exchange rate ticks for a specific currency, oldest first.
+    
+    Pages are keyset paginated on (timestamp, id): each page seeks straight to the
+    cursor on the pair/time index, so every page costs the same however deep it is.
+    Days before the compaction horizon come first as daily candle closes, with keyset
+    id 0 since there is one candle per day.
+    """
+    currency_code = currency_code.upper()
+    base_id, quote_id = await get_pair_ids(db, "NGN", currency_code)
+    start_date = datetime.utcnow() - timedelta(days=days)
+    after = decode_rate_cursor(cursor) if cursor else None
+    
+    # Rows of (item id, keyset id, rate, source, timestamp); one extra row tells whether another page follows
+    rows = []
+    compacted, recent = split_at_horizon(start_date, None)
+    if compacted is not None and (after is None or after[0] < compacted[1]):
+        query = compacted_rate_query(base_id, quote_id, *compacted)
+        if after:
+            query = query.where(RateCandleModel.bucket_start > after[0])
+        result = await db.execute(query.order_by(RateCandleModel.bucket_start).limit(page_size + 1))
+        rows = [
+            (f"{COMPACTED_RESOLUTION}:{timestamp.isoformat()}", 0, rate, source, timestamp)
+            for timestamp, rate, source in result.all()
+        ]
+    
+    if len(rows) <= page_size:
+        query = select(
+            ExchangeRateModel.id,
+            ExchangeRateModel.rate,
+            ExchangeRateModel.source,
+            ExchangeRateModel.timestamp
+        ).where(
+            ExchangeRateModel.base_currency_id == base_id,
+            ExchangeRateModel.quote_currency_id == quote_id,
+            ExchangeRateModel.timestamp >= recent[0]
+        )
+        if after:
+            query = query.where(
+                tuple_(ExchangeRateModel.timestamp, ExchangeRateModel.id) > tuple_(*after)
+            )
+        result = await db.execute(
+            query.order_by(ExchangeRateModel.timestamp, ExchangeRateModel.id).limit(page_size + 1 - len(rows))
+        )
+        rows.extend(
+            (str(rate_id), rate_id, rate, source, timestamp)
+            for rate_id, rate, source, timestamp in result.all()
+        )
     
-    slope = model.coef_[0]
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_rate_cursor(rows[-1][4], rows[-1][1])
+    
+    items = [
+        ExchangeRate(
+            id=item_id,
+            currency_code=currency_code,
+            base_currency="NGN",
+            rate=float(rate),
+            source=source,
+            timestamp=timestamp
+        )
+        for item_id, _, rate, source, timestamp in rows
+    ]
+    return ExchangeRatePage(items=items, next_cursor=next_cursor)
+
+async def get_rate_candles(
+    db: AsyncSession,
+    currency_code: str,
+    days: int = 30,
+    resolution: str = "auto"
+) -> List[RateCandle]:
+    """Get open/high/low/close candles of the NGN rate for a specific currency"""
+    currency_code = currency_code.upper()
+    base_id, quote_id = await get_pair_ids(db, "NGN", currency_code)
+    start_date = datetime.utcnow() - timedelta(days=days)
+    
+    if resolution == "auto":
+        resolution = choose_resolution(days)
+    
+    candles = await get_candles(db, base_id, quote_id, resolution, start_date)
+    return [
+        RateCandle(base_currency="NGN", quote_currency=currency_code, resolution=resolution, **c)
+        for c in candles
+    ]
+
+async def export_rate_history(
+    db: AsyncSession,
+    base_currency: str,
+    quote_currency: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    export_format: str = "arrow"
+) -> Tuple[AsyncIterator[bytes], str, str]:
+    """
+    Prepare a streamed Arrow IPC or Parquet export of a pair's stored ticks.
+    
+    The pair is validated up front so unknown pairs fail with 404 before streaming starts.
+    
+    Returns the byte stream, its media type and a download file name.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Rate export requires the pyarrow package")
+    
+    base_currency = base_currency.upper()
+    quote_currency = quote_currency.upper()
+    base_id, quote_id = await get_pair_ids(db, base_currency, quote_currency)
+    
+    # Timestamps are stored as naive UTC
+    start, end = [
+        t.astimezone(timezone.utc).replace(tzinfo=None) if t is not None and t.tzinfo else t
+        for t in (start, end)
+    ]
+    
+    export = EXPORT_FORMATS[export_format]
+    filename = f"rates_{base_currency}_{quote_currency}.{export['extension']}"
+    stream = stream_rate_export(base_id, quote_id, base_currency, quote_currency, start, end, export_format)
+    return stream, export["media_type"], filename
+
+async def get_trend_window(
+    db: AsyncSession,
+    currency_code: str,
+    days: int,
+    resolution: str
+) -> Tuple[int, int, RateWindow]:
+    """Get the pair IDs and the NGN rate window a currency's trend is fitted to"""
+    base_id, quote_id = await get_pair_ids(db, "NGN", currency_code)
+    
+    # Served from the repository's cached series, no per-request query once the pair is loaded;
+    # copied, as callers keep the window across awaits that may rewrite the series
+    window = (await rate_repository.get_window(db, base_id, quote_id, resolution, days)).copy()
+    
+    if not len(window):
+        raise HTTPException(
+            status_code=404,
+            detail=f"No rate data found for {currency_code} in the last {days} days"
+        )
+    return base_id, quote_id, window
+
+def build_currency_trend(
+    currency_code: str,
+    window: RateWindow,
+    forecasts: List[Dict[str, Any]]
+) -> CurrencyTrend:
+    """Build a currency's trend analysis from its window and trend line forecasts"""
+    # Extract rate values
+    rate_values = window.rates
+    
+    # Calculate basic statistics
+    min_rate = float(rate_values.min())
+    max_rate = float(rate_values.max())
+    avg_rate = float(rate_values.mean())
+    current_rate = float(rate_values[-1])
+    
+    # Slope of the trend line between the first and last forecast
+    first, last = forecasts[0], forecasts[-1]
+    slope = (last["predicted_rate"] - first["predicted_rate"]) / (last["horizon_days"] - first["horizon_days"])
     
     # Determine trend direction
     if abs(slope) < 0.01:  # Very small slope
@@ -194,16 +454,12 @@ async def get_currency_trend_analysis(currency_code: str, days: int = 30) -> Cur
         trend_direction = "falling"
     
     # Calculate volatility (standard deviation / average)
-    volatility = np.std(rate_values) / avg_rate
+    volatility = float(np.std(rate_values)) / avg_rate
     
-    # Make predictions for future days
-    future_days = [7, 14, 30]
-    predictions = {}
-    
-    for day in future_days:
-        future_x = np.array([[timestamps[-1] + day]])
-        predicted_rate = model.predict(future_x)[0]
-        predictions[f"{day}_day"] = max(0, predicted_rate)  # Ensure rate is positive
+    predictions = {
+        f"{forecast['horizon_days']}_day": max(0, forecast["predicted_rate"])  # Ensure rate is positive
+        for forecast in forecasts
+    }
     
     return CurrencyTrend(
         currency_code=currency_code,
@@ -215,5 +471,93 @@ async def get_currency_trend_analysis(currency_code: str, days: int = 30) -> Cur
         trend_direction=trend_direction,
         volatility=volatility,
         predictions=predictions,
-        data_points=len(rates)
-    )
\ No newline at end of file
+        data_points=len(window)
+    )
+
+async def get_currency_trend_analysis(
+    db: AsyncSession,
+    currency_code: str,
+    days: int = 30,
+    resolution: str = "auto"
+) -> CurrencyTrend:
+    """Analyze trends for a specific currency"""
+    currency_code = currency_code.upper()
+    trends = await get_currency_trend_analyses(db, [currency_code], days, resolution, raise_errors=True)
+    return trends[currency_code]
+
+async def get_currency_trend_analyses(
+    db: AsyncSession,
+    currency_codes: List[str],
+    days: int = 30,
+    resolution: str = "auto",
+    raise_errors: bool = False
+) -> Dict[str, CurrencyTrend]:
+    """
+    Analyze trends for several currencies at once.
+    
+    Trend line forecasts come from the forecast cache while the data they were fitted
+    on is current; the others are fitted in one batched regression and cached.
+    Currencies without rate data are left out unless raise_errors is set.
+    """
+    if resolution == "auto":
+        resolution = choose_resolution(days)
+    model = trend_model_name(resolution, days)
+    
+    windows = {}
+    forecasts = {}
+    for currency_code in currency_codes:
+        currency_code = currency_code.upper()
+        try:
+            base_id, quote_id, window = await get_trend_window(db, currency_code, days, resolution)
+        except HTTPException as e:
+            if raise_errors:
+                raise
+            logger.warning(f"Error analyzing {currency_code}: {e.detail}")
+            continue
+        
+        windows[currency_code] = (base_id, quote_id, window)
+        cached = await forecast_cache.get(
+            db, base_id, quote_id, model, from_epoch(window.timestamps[-1]),
+            resolution, from_epoch(window.timestamps[0])
+        )
+        if cached is not None:
+            forecasts[currency_code] = cached
+    
+    # Fit the trend lines of the currencies without current forecasts in one pass
+    missing = [code for code in windows if code not in forecasts]
+    if missing:
+        fitted = predict_trend_rates_batch([windows[code][2] for code in missing])
+        for currency_code, currency_forecasts in zip(missing, fitted):
+            base_id, quote_id, window = windows[currency_code]
+            forecast_cache.put(base_id, quote_id, model, from_epoch(window.timestamps[-1]), currency_forecasts)
+            forecasts[currency_code] = currency_forecasts
+    
+    return {
+        currency_code: build_currency_trend(currency_code, window, forecasts[currency_code])
+        for currency_code, (_, _, window) in windows.items()
+    }
+
+async def get_rate_forecasts(db: AsyncSession, currency_code: str) -> List[RateForecast]:
+    """Get the daily rate forecasts of the prediction models for a specific currency"""
+    currency_code = currency_code.upper()
+    base_id, quote_id, window = await get_trend_window(db, currency_code, settings.PREDICTION_WINDOW_DAYS, "1d")
+    watermark = from_epoch(window.timestamps[-1])
+    
+    forecasts = await forecast_cache.get(
+        db, base_id, quote_id, ENSEMBLE_MODEL, watermark, "1d", from_epoch(window.timestamps[0])
+    )
+    if forecasts is None:
+        # Not stored by the prediction job for the current data yet
+        forecasts = predict_future_rates(window, settings.PREDICTION_HORIZON_DAYS)
+        forecast_cache.put(base_id, quote_id, ENSEMBLE_MODEL, watermark, forecasts)
+    
+    return [
+        RateForecast(
+            base_currency="NGN",
+            quote_currency=currency_code,
+            model=ENSEMBLE_MODEL,
+            watermark=watermark,
+            **forecast
+        )
+        for forecast in forecasts
+    ]
@@ -14,7 +14,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.session import get_db_session
+from app.db.session import AsyncSessionLocal
 from app.models.user import User
 from app.db.firebase import db as firebase_db
 
@@ -215,7 +215,7 @@ async def send_alert_notification(notification_data: Dict[str, Any]) -> bool:
     success = False
     
     # Get user's email
-    async for db in get_db_session():
+    async with AsyncSessionLocal() as db:
         try:
             # Store notification in database
             db_success = await store_notification_in_db(
@@ -0,0 +1,199 @@
+"""
+Batched ARIMA(1,1,0) forecaster.
+This module fits ARIMA(1,1,0), an AR(1) model of the first differences, to many
+series at once. The AR coefficient is estimated by conditional least squares over
+a padded (series x time) matrix, and forecasts and their prediction intervals are
+computed in closed form, so a whole batch costs a few array passes instead of one
+iterative maximum likelihood fit per series.
+
+The statsmodels implementation is kept as a reference backend, selected with
+PREDICTION_ARIMA_BACKEND = "statsmodels".
+"""
+import logging
+from statistics import NormalDist
+from typing import Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARIMA_BACKENDS = ("native", "statsmodels")
+
+# Fewest points a series needs for a fit; shorter series get NaN forecasts
+MIN_ARIMA_POINTS = 10
+
+# Keep the fitted coefficient inside the stationary region
+MAX_AR_COEFFICIENT = 0.999
+
+
+def pad_series(series: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Stack series of unequal length into one matrix, aligned on their last point.
+
+    Args:
+        series: One rate array per series, oldest first
+
+    Returns:
+        (series x time) float array, NaN-padded on the left
+    """
+    length = max((len(values) for values in series), default=0)
+    matrix = np.full((len(series), length), np.nan)
+    for row, values in enumerate(series):
+        if len(values):
+            matrix[row, length - len(values):] = values
+    return matrix
+
+
+def fit_arima_110(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fit d[t] = phi * d[t-1] + e[t] to the first differences d of every row.
+
+    Args:
+        matrix: (series x time) levels, NaN-padded on the left
+
+    Returns:
+        Tuple of (AR coefficients, residual variances, residual counts), one per row
+    """
+    diffs = np.diff(matrix, axis=1)
+    current, previous = diffs[:, 1:], diffs[:, :-1]
+    valid = ~(np.isnan(current) | np.isnan(previous))
+    current = np.where(valid, current, 0.0)
+    previous = np.where(valid, previous, 0.0)
+
+    cross = (current * previous).sum(axis=1)
+    energy = (previous * previous).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        phi = np.where(energy > 0, cross / energy, 0.0)
+    phi = np.clip(phi, -MAX_AR_COEFFICIENT, MAX_AR_COEFFICIENT)
+
+    nobs = valid.sum(axis=1)
+    residuals = np.where(valid, current - phi[:, None] * previous, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma2 = np.where(nobs > 0, (residuals * residuals).sum(axis=1) / nobs, np.nan)
+    return phi, sigma2, nobs
+
+
+def forecast_ar1_differences(
+    phi: np.ndarray,
+    sigma2: np.ndarray,
+    last_level: np.ndarray,
+    last_diff: np.ndarray,
+    steps: int,
+    alpha: float = 0.05
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Forecast fitted ARIMA(1,1,0) models steps ahead.
+
+    With c[k] = 1 + phi + ... + phi^k, the h-step forecast is
+    y[T] + d[T] * (c[h] - 1) and its error variance sigma2 * (c[0]^2 + ... + c[h-1]^2).
+
+    Args:
+        phi: AR coefficients of the differences
+        sigma2: Residual variances
+        last_level: Last level y[T] of every series
+        last_diff: Last difference d[T] of every series
+        steps: Number of steps to forecast
+        alpha: Significance level of the prediction intervals
+
+    Returns:
+        Tuple of (forecasts, lower bounds, upper bounds), each (series x steps)
+    """
+    # c[k] for k = 0..steps
+    cumulative = np.cumsum(phi[:, None] ** np.arange(steps + 1), axis=1)
+    forecasts = last_level[:, None] + last_diff[:, None] * (cumulative[:, 1:] - 1)
+    variances = sigma2[:, None] * np.cumsum(cumulative[:, :-1] ** 2, axis=1)
+    margins = NormalDist().inv_cdf(1 - alpha / 2) * np.sqrt(variances)
+    return forecasts, forecasts - margins, forecasts + margins
+
+
+def forecast_arima_110(
+    series: Sequence[np.ndarray],
+    steps: int,
+    alpha: float = 0.05
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Forecast every series steps ahead with ARIMA(1,1,0).
+
+    Args:
+        series: One rate array per series, oldest first
+        steps: Number of steps to forecast
+        alpha: Significance level of the prediction intervals
+
+    Returns:
+        Tuple of (forecasts, lower bounds, upper bounds), each (series x steps);
+        rows of series with fewer than MIN_ARIMA_POINTS points are NaN
+    """
+    matrix = pad_series(series)
+    if matrix.shape[1] < 2:
+        empty = np.full((len(series), steps), np.nan)
+        return empty, empty.copy(), empty.copy()
+
+    phi, sigma2, _ = fit_arima_110(matrix)
+    forecasts, lower, upper = forecast_ar1_differences(
+        phi, sigma2, matrix[:, -1], matrix[:, -1] - matrix[:, -2], steps, alpha
+    )
+
+    too_short = np.array([len(values) < MIN_ARIMA_POINTS for values in series], dtype=bool)
+    forecasts[too_short] = np.nan
+    lower[too_short] = np.nan
+    upper[too_short] = np.nan
+    return forecasts, lower, upper
+
+
+def forecast_arima_110_statsmodels(
+    series: Sequence[np.ndarray],
+    steps: int,
+    alpha: float = 0.05
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reference implementation of forecast_arima_110 fitting statsmodels ARIMA per series.
+
+    Args:
+        series: One rate array per series, oldest first
+        steps: Number of steps to forecast
+        alpha: Significance level of the prediction intervals
+
+    Returns:
+        Tuple of (forecasts, lower bounds, upper bounds), each (series x steps);
+        rows of series that are too short or fail to fit are NaN
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    forecasts = np.full((len(series), steps), np.nan)
+    lower = forecasts.copy()
+    upper = forecasts.copy()
+    for row, values in enumerate(series):
+        if len(values) < MIN_ARIMA_POINTS:
+            continue
+        try:
+            result = ARIMA(np.asarray(values, dtype=np.float64), order=(1, 1, 0)).fit()
+            forecast = result.get_forecast(steps=steps)
+            interval = np.asarray(forecast.conf_int(alpha=alpha))
+            forecasts[row] = forecast.predicted_mean
+            lower[row], upper[row] = interval[:, 0], interval[:, 1]
+        except Exception as e:
+            logger.warning(f"ARIMA model failed: {e}")
+    return forecasts, lower, upper
+
+
+def forecast_arima(
+    series: Sequence[np.ndarray],
+    steps: int,
+    alpha: float = 0.05,
+    backend: str = "native"
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Forecast every series steps ahead with ARIMA(1,1,0) on the given backend.
+
+    Args:
+        series: One rate array per series, oldest first
+        steps: Number of steps to forecast
+        alpha: Significance level of the prediction intervals
+        backend: "native" or "statsmodels"
+
+    Returns:
+        Tuple of (forecasts, lower bounds, upper bounds), each (series x steps)
+    """
+    if backend == "statsmodels":
+        return forecast_arima_110_statsmodels(series, steps, alpha)
+    return forecast_arima_110(series, steps, alpha)
@@ -0,0 +1,138 @@
+"""
+Cross-rate matrix engine.
+This module turns a single-base rate table into the full N x N cross-rate matrix
+so any currency pair can be read without a database query.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.utils.rate_cache import latest_rates
+
+logger = logging.getLogger(__name__)
+
+
+class CrossRateMatrix:
+    """
+    In-memory N x N cross-rate matrix for the active currencies.
+
+    matrix[i, j] is the rate from codes[i] to codes[j], i.e. the amount of
+    codes[j] that one unit of codes[i] buys. The matrix goes stale whenever the
+    latest-rate cache is invalidated, locally or by another process's ingest.
+    """
+
+    def __init__(self) -> None:
+        self.codes: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.matrix = np.empty((0, 0), dtype=np.float64)
+        self.source: Optional[str] = None
+        self.updated_at: Optional[datetime] = None
+        self.generation = 0
+        self._stale = False
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once the matrix has been built at least once."""
+        return bool(self.codes)
+
+    @property
+    def is_fresh(self) -> bool:
+        """True when the matrix is built and no newer rates have been stored since."""
+        return self.is_loaded and not self._stale
+
+    def invalidate(self, since: Optional[datetime] = None) -> None:
+        """
+        Mark the matrix stale so the next reader rebuilds it.
+
+        Args:
+            since: Timestamp of the oldest tick written, if known
+        """
+        self.generation += 1
+        self._stale = True
+
+    def update(
+        self,
+        base_currency: str,
+        base_rates: Dict[str, float],
+        codes: List[str],
+        source: str,
+        timestamp: datetime
+    ) -> int:
+        """
+        Rebuild the matrix from one provider response.
+
+        Args:
+            base_currency: Base currency of base_rates (e.g. "USD")
+            base_rates: Rates from base_currency to other currencies
+            codes: Currency codes to include (e.g. all active currencies)
+            source: Source of the rates
+            timestamp: Timestamp of the rates
+
+        Returns:
+            Number of currencies in the rebuilt matrix
+        """
+        rates = dict(base_rates)
+        rates[base_currency] = 1.0
+
+        usable = [code for code in codes if rates.get(code, 0) > 0]
+        vector = np.fromiter((rates[code] for code in usable), dtype=np.float64, count=len(usable))
+
+        # One unit of codes[i] is worth 1 / vector[i] base units, each buying vector[j] of codes[j]
+        matrix = vector[np.newaxis, :] / vector[:, np.newaxis]
+
+        # Assigned without awaiting in between, so coroutines never see a half-updated matrix
+        self.codes = usable
+        self.index = {code: i for i, code in enumerate(usable)}
+        self.matrix = matrix
+        self.source = source
+        self.updated_at = timestamp
+        self._stale = False
+
+        missing = set(codes) - set(usable)
+        if missing:
+            logger.warning(f"No rate available for {', '.join(sorted(missing))}, excluded from cross rates")
+        return len(usable)
+
+    def get_rate(self, base_currency: str, quote_currency: str) -> Optional[float]:
+        """
+        Look up the rate for a currency pair.
+
+        Args:
+            base_currency: Base currency code
+            quote_currency: Quote currency code
+
+        Returns:
+            Exchange rate, or None if either currency is not in the matrix
+        """
+        i = self.index.get(base_currency)
+        j = self.index.get(quote_currency)
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
+
+    def get_row(self, base_currency: str) -> Dict[str, float]:
+        """
+        Get the rates from one currency to every other currency in the matrix.
+
+        Args:
+            base_currency: Base currency code
+
+        Returns:
+            Dictionary of quote currency code to rate, empty if the base is unknown
+        """
+        i = self.index.get(base_currency)
+        if i is None:
+            return {}
+        return {
+            code: float(rate)
+            for code, rate in zip(self.codes, self.matrix[i])
+            if code != base_currency
+        }
+
+
+# Process-wide cross-rate matrix, rebuilt on every exchange rate update and
+# marked stale by latest-rate cache invalidations
+cross_rates = CrossRateMatrix()
+latest_rates.subscribe(cross_rates.invalidate)
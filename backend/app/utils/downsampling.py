@@ -0,0 +1,61 @@
+"""
+Time series downsampling.
+This module implements Largest-Triangle-Three-Buckets (LTTB) downsampling, which
+reduces a series to a fixed number of points while keeping its visual shape,
+including peaks and troughs.
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Select the points of a series to keep with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The points in between are split
+    into max_points - 2 equal buckets and from each bucket the point forming the
+    largest triangle with the point kept from the previous bucket and the average
+    of the next bucket is kept. Triangle areas of a whole bucket are computed in
+    one NumPy operation; only the walk over buckets is sequential, as each choice
+    depends on the previous one.
+
+    Args:
+        x: Point positions in ascending order (e.g. epoch seconds)
+        y: Point values
+        max_points: Number of points to keep (at least 3)
+
+    Returns:
+        Sorted indices of the points to keep
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket boundaries over the interior points 1 .. n - 2, floor(i * every) + 1 in
+    # integer arithmetic so no edge is off by one from float rounding
+    edges = np.arange(max_points - 1, dtype=np.int64) * (n - 2) // (max_points - 2) + 1
+    starts, ends = edges[:-1], edges[1:]
+
+    # Average of every bucket, used as the third triangle corner of the previous bucket
+    sums_x = np.add.reduceat(x[1:n - 1], starts - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], starts - 1)
+    sizes = ends - starts
+    avg_x = np.append(sums_x / sizes, x[-1])[1:]
+    avg_y = np.append(sums_y / sizes, y[-1])[1:]
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        bx = x[start:end]
+        by = y[start:end]
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs(
+            (x[a] - avg_x[i]) * (by - y[a]) - (x[a] - bx) * (avg_y[i] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
@@ -3,16 +3,29 @@ Exchange rate API integrations.
 This module handles fetching exchange rate data from various providers.
 """
 import asyncio
+import hashlib
+import json
 import logging
+import time
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import httpx
+import numpy as np
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.models.currency import Currency, ExchangeRate
-from app.db.session import get_db_session
+from app.models.currency import Currency
+from app.db.session import AsyncSessionLocal
+from app.utils.cross_rates import cross_rates
+from app.utils.provider_clients import provider_clients
+from app.utils.provider_registry import provider_registry
+from app.utils.rate_cache import latest_rates
+from app.utils.rate_consensus import MIN_CONSENSUS_VALUES, build_rate_matrix, consensus_rates
+from app.utils.rate_repository import rate_repository
+from app.utils.rate_segments import flush_segment_rows
+from app.utils.rate_storage import bulk_insert_exchange_rates
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +39,92 @@ EXCHANGERATE_API_URL = f"https://v6.exchangerate-api.com/v6/{EXCHANGERATE_API_KE
 FIXER_API_URL = f"http://data.fixer.io/api/latest?access_key={FIXER_API_KEY}"
 OPENEXCHANGERATES_API_URL = f"https://openexchangerates.org/api/latest.json?app_id={OPENEXCHANGERATES_API_KEY}"
 
+# Provider names, also used as the source recorded with each stored rate
+EXCHANGERATE_API_NAME = "exchangerate-api.com"
+FIXER_NAME = "fixer.io"
+OPENEXCHANGERATES_NAME = "openexchangerates.org"
+PROVIDER_NAMES = [EXCHANGERATE_API_NAME, FIXER_NAME, OPENEXCHANGERATES_NAME]
+
+# Source recorded with consensus rates, whichever providers contributed
+CONSENSUS_SOURCE = "consensus"
+
+
+# Provider-reported "last updated" time of the most recent successful fetch, per provider
+provider_timestamps: Dict[str, datetime] = {}
+
+# Latency and outcome counts of provider fetches, per provider
+provider_fetch_stats: Dict[str, Dict[str, Any]] = {}
+
+# Hash of the last stored payload, used to skip writes when the provider has not refreshed
+last_payload_hash: Optional[str] = None
+
+
+def record_provider_timestamp(provider: str, unix_timestamp: Optional[int]) -> None:
+    """
+    Record the time a provider says its rates were last updated.
+    
+    Args:
+        provider: Provider name
+        unix_timestamp: Provider's last update time as a Unix timestamp
+    """
+    if unix_timestamp:
+        provider_timestamps[provider] = datetime.utcfromtimestamp(int(unix_timestamp))
+    else:
+        provider_timestamps.pop(provider, None)
+
+
+def record_provider_fetch(provider: str, latency: float, outcome: str) -> None:
+    """
+    Record the latency and outcome of a provider fetch.
+    
+    Args:
+        provider: Provider name
+        latency: Time spent on the fetch in seconds
+        outcome: "success", "failure" or "cancelled"
+    """
+    stats = provider_fetch_stats.setdefault(provider, {
+        "success": 0,
+        "failure": 0,
+        "cancelled": 0,
+        "last_latency": None,
+        "last_outcome": None,
+        "last_fetched_at": None,
+    })
+    stats[outcome] += 1
+    stats["last_latency"] = latency
+    stats["last_outcome"] = outcome
+    stats["last_fetched_at"] = datetime.utcnow()
+
+
+def get_source_timestamp(source: str) -> Optional[datetime]:
+    """
+    Get the provider-reported update time for a rate source.
+    
+    Consensus rates have none: their value changes whenever any contributor
+    refreshes, which the newest contributor timestamp does not always reflect.
+    
+    Args:
+        source: Source string returned by get_exchange_rates or get_consensus_exchange_rates
+        
+    Returns:
+        Update time reported by the provider, or None if unknown or a consensus
+    """
+    return provider_timestamps.get(source)
+
+
+def report_quota_exhausted(provider: str, response: httpx.Response) -> None:
+    """
+    Report a provider's exhausted quota to the provider registry.
+    
+    Args:
+        provider: Provider name
+        response: Provider response signalling the exhausted quota
+    """
+    retry_after = response.headers.get("Retry-After", "")
+    provider_registry.record_quota_exhausted(
+        provider, float(retry_after) if retry_after.isdigit() else None
+    )
+
 
 async def fetch_from_exchangerate_api(base_currency: str) -> Optional[Dict[str, float]]:
     """
@@ -38,16 +137,22 @@ async def fetch_from_exchangerate_api(base_currency: str) -> Optional[Dict[str,
         Dictionary of currency codes to exchange rates, or None if request failed
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{EXCHANGERATE_API_URL}{base_currency}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('result') == 'success':
-                    return data.get('conversion_rates', {})
-            
-            logger.warning(f"ExchangeRate-API request failed with status {response.status_code}: {response.text}")
-            return None
+        response = await provider_clients.request(
+            EXCHANGERATE_API_NAME, f"{EXCHANGERATE_API_URL}{base_currency}"
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('result') == 'success':
+                record_provider_timestamp(EXCHANGERATE_API_NAME, data.get('time_last_update_unix'))
+                return data.get('conversion_rates', {})
+            if data.get('error-type') == 'quota-reached':
+                report_quota_exhausted(EXCHANGERATE_API_NAME, response)
+        elif response.status_code == 429:
+            report_quota_exhausted(EXCHANGERATE_API_NAME, response)
+        
+        logger.warning(f"ExchangeRate-API request failed with status {response.status_code}: {response.text}")
+        return None
     except Exception as e:
         logger.error(f"Error fetching from ExchangeRate-API: {e}")
         return None
@@ -65,24 +170,29 @@ async def fetch_from_fixer(base_currency: str) -> Optional[Dict[str, float]]:
         Dictionary of currency codes to exchange rates, or None if request failed
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Note: Free plan only supports EUR as base
-            response = await client.get(FIXER_API_URL)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success'):
-                    rates = data.get('rates', {})
-                    
-                    # If base_currency is not EUR, convert rates
-                    if base_currency != 'EUR' and base_currency in rates and rates[base_currency] > 0:
-                        eur_to_base = rates[base_currency]
-                        return {curr: rate / eur_to_base for curr, rate in rates.items()}
-                    
-                    return rates
-            
-            logger.warning(f"Fixer.io request failed with status {response.status_code}: {response.text}")
-            return None
+        # Note: Free plan only supports EUR as base
+        response = await provider_clients.request(FIXER_NAME, FIXER_API_URL)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('success'):
+                rates = data.get('rates', {})
+                record_provider_timestamp(FIXER_NAME, data.get('timestamp'))
+                
+                # If base_currency is not EUR, convert rates
+                if base_currency != 'EUR' and base_currency in rates and rates[base_currency] > 0:
+                    eur_to_base = rates[base_currency]
+                    return {curr: rate / eur_to_base for curr, rate in rates.items()}
+                
+                return rates
+            # Error code 104 means the monthly request allowance has been reached
+            if data.get('error', {}).get('code') == 104:
+                report_quota_exhausted(FIXER_NAME, response)
+        elif response.status_code == 429:
+            report_quota_exhausted(FIXER_NAME, response)
+        
+        logger.warning(f"Fixer.io request failed with status {response.status_code}: {response.text}")
+        return None
     except Exception as e:
         logger.error(f"Error fetching from Fixer.io: {e}")
         return None
@@ -100,137 +210,348 @@ async def fetch_from_openexchangerates(base_currency: str) -> Optional[Dict[str,
         Dictionary of currency codes to exchange rates, or None if request failed
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Note: Free plan only supports USD as base
-            response = await client.get(OPENEXCHANGERATES_API_URL)
+        # Note: Free plan only supports USD as base
+        response = await provider_clients.request(OPENEXCHANGERATES_NAME, OPENEXCHANGERATES_API_URL)
+        
+        if response.status_code == 200:
+            data = response.json()
+            rates = data.get('rates', {})
+            record_provider_timestamp(OPENEXCHANGERATES_NAME, data.get('timestamp'))
             
-            if response.status_code == 200:
-                data = response.json()
-                rates = data.get('rates', {})
-                
-                # If base_currency is not USD, convert rates
-                if base_currency != 'USD' and base_currency in rates and rates[base_currency] > 0:
-                    usd_to_base = rates[base_currency]
-                    return {curr: rate / usd_to_base for curr, rate in rates.items()}
-                
-                return rates
+            # If base_currency is not USD, convert rates
+            if base_currency != 'USD' and base_currency in rates and rates[base_currency] > 0:
+                usd_to_base = rates[base_currency]
+                return {curr: rate / usd_to_base for curr, rate in rates.items()}
             
-            logger.warning(f"OpenExchangeRates request failed with status {response.status_code}: {response.text}")
-            return None
+            return rates
+        if response.status_code == 429:
+            report_quota_exhausted(OPENEXCHANGERATES_NAME, response)
+        
+        logger.warning(f"OpenExchangeRates request failed with status {response.status_code}: {response.text}")
+        return None
     except Exception as e:
         logger.error(f"Error fetching from OpenExchangeRates: {e}")
         return None
 
 
+# Provider fetch functions in default priority order
+PROVIDER_FETCHERS: Dict[str, Callable[[str], Awaitable[Optional[Dict[str, float]]]]] = {
+    EXCHANGERATE_API_NAME: fetch_from_exchangerate_api,
+    FIXER_NAME: fetch_from_fixer,
+    OPENEXCHANGERATES_NAME: fetch_from_openexchangerates,
+}
+
+provider_registry.register(list(PROVIDER_FETCHERS.keys()))
+
+
+async def timed_provider_fetch(provider: str, base_currency: str) -> Optional[Dict[str, float]]:
+    """
+    Fetch rates from one provider, recording its latency and outcome in the registry
+    and in provider_fetch_stats.
+    
+    Args:
+        provider: Provider name
+        base_currency: ISO currency code for the base currency
+        
+    Returns:
+        Dictionary of currency codes to exchange rates, or None if request failed
+    """
+    provider_registry.record_attempt(provider)
+    start = time.perf_counter()
+    try:
+        rates = await PROVIDER_FETCHERS[provider](base_currency)
+    except asyncio.CancelledError:
+        provider_registry.record_cancelled(provider)
+        record_provider_fetch(provider, time.perf_counter() - start, "cancelled")
+        raise
+    
+    latency = time.perf_counter() - start
+    if rates:
+        provider_registry.record_success(provider, latency)
+    else:
+        provider_registry.record_failure(provider, latency)
+    record_provider_fetch(provider, latency, "success" if rates else "failure")
+    return rates
+
+
+async def fetch_sequential(
+    base_currency: str,
+    providers: List[str]
+) -> Optional[Tuple[Dict[str, float], str]]:
+    """
+    Try each provider in turn until one returns data.
+    
+    Args:
+        base_currency: ISO currency code for the base currency
+        providers: Provider names in priority order
+        
+    Returns:
+        Tuple of (rates_dict, source), or None if every provider failed
+    """
+    for provider in providers:
+        rates = await timed_provider_fetch(provider, base_currency)
+        if rates:
+            return rates, provider
+    return None
+
+
+async def fetch_hedged(
+    base_currency: str,
+    providers: List[str],
+    hedge_delay: float
+) -> Optional[Tuple[Dict[str, float], str]]:
+    """
+    Fetch from providers with hedging and return the first valid response.
+    
+    The first provider is started immediately. Each following provider is started
+    once hedge_delay seconds pass without a valid response, or as soon as every
+    in-flight provider has failed. A delay of 0 fires all providers at once.
+    Outstanding requests are cancelled once a valid response arrives.
+    
+    Args:
+        base_currency: ISO currency code for the base currency
+        providers: Provider names in priority order
+        hedge_delay: Seconds to wait before starting the next provider
+        
+    Returns:
+        Tuple of (rates_dict, source), or None if every provider failed
+    """
+    remaining = list(providers)
+    pending: Dict[asyncio.Task, str] = {}
+    
+    def launch_next() -> None:
+        provider = remaining.pop(0)
+        pending[asyncio.create_task(timed_provider_fetch(provider, base_currency))] = provider
+    
+    try:
+        while remaining or pending:
+            if remaining and (not pending or hedge_delay <= 0):
+                launch_next()
+                continue
+            
+            done, _ = await asyncio.wait(
+                pending.keys(),
+                timeout=hedge_delay if remaining else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            
+            if not done:
+                # Hedge delay elapsed without a response, start the next provider
+                launch_next()
+                continue
+            
+            for task in done:
+                provider = pending.pop(task)
+                rates = task.result()
+                if rates:
+                    return rates, provider
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending.keys(), return_exceptions=True)
+
+
 async def get_exchange_rates(base_currency: str) -> Tuple[Dict[str, float], str]:
     """
     Get exchange rates from multiple sources with fallback.
     
+    Providers are tried in the order ranked by the provider registry, healthiest
+    first, skipping providers with an open circuit or exhausted quota. The fetch
+    strategy is controlled by EXCHANGE_RATE_FETCH_MODE: "sequential" tries providers
+    one after another, "hedged" starts the next provider after
+    EXCHANGE_RATE_HEDGE_DELAY seconds, and "parallel" fires all providers at once.
+    
     Args:
         base_currency: ISO currency code for the base currency
         
     Returns:
         Tuple of (rates_dict, source) where rates_dict is exchange rates and source is the API used
     """
-    # Try each API in succession
-    exchangerate_data = await fetch_from_exchangerate_api(base_currency)
-    if exchangerate_data:
-        return exchangerate_data, "exchangerate-api.com"
+    providers = provider_registry.rank()
+    if not providers:
+        logger.error("No exchange rate providers available, all circuits are open")
+        return {}, "none"
     
-    fixer_data = await fetch_from_fixer(base_currency)
-    if fixer_data:
-        return fixer_data, "fixer.io"
+    mode = settings.EXCHANGE_RATE_FETCH_MODE
+    if mode == "hedged":
+        result = await fetch_hedged(base_currency, providers, settings.EXCHANGE_RATE_HEDGE_DELAY)
+    elif mode == "parallel":
+        result = await fetch_hedged(base_currency, providers, 0)
+    else:
+        result = await fetch_sequential(base_currency, providers)
     
-    openexchangerates_data = await fetch_from_openexchangerates(base_currency)
-    if openexchangerates_data:
-        return openexchangerates_data, "openexchangerates.org"
+    if result:
+        return result
     
     logger.error("All exchange rate APIs failed to return data")
     return {}, "none"
 
 
+def consensus_available() -> bool:
+    """
+    Check whether consensus rates can be used.
+    
+    Returns:
+        True if consensus is enabled and keys are configured for every provider
+    """
+    return settings.EXCHANGE_RATE_CONSENSUS_ENABLED and all(
+        [EXCHANGERATE_API_KEY, FIXER_API_KEY, OPENEXCHANGERATES_API_KEY]
+    )
+
+
+async def get_consensus_exchange_rates(base_currency: str) -> Tuple[Dict[str, float], str]:
+    """
+    Query all available providers at once and combine their rates into a consensus.
+    
+    Provider values outside the MAD-based tolerance are dropped, so one bad feed
+    cannot move the stored rate. Falls back to the highest-ranked provider's result
+    when fewer than MIN_CONSENSUS_VALUES providers respond, since outliers cannot
+    be told apart with fewer.
+    
+    Args:
+        base_currency: ISO currency code for the base currency
+        
+    Returns:
+        Tuple of (rates_dict, source) where source is CONSENSUS_SOURCE, or the
+        provider name on fallback
+    """
+    providers = provider_registry.rank()
+    results = await asyncio.gather(
+        *(timed_provider_fetch(provider, base_currency) for provider in providers)
+    )
+    responses = [(provider, rates) for provider, rates in zip(providers, results) if rates]
+    
+    if len(responses) < MIN_CONSENSUS_VALUES:
+        if responses:
+            return responses[0][1], responses[0][0]
+        logger.error("All exchange rate APIs failed to return data")
+        return {}, "none"
+    
+    sources = [provider for provider, _ in responses]
+    rate_sets = [rates for _, rates in responses]
+    codes = sorted(set().union(*rate_sets))
+    
+    matrix = build_rate_matrix(rate_sets, codes)
+    consensus, accepted = consensus_rates(
+        matrix,
+        method=settings.EXCHANGE_RATE_CONSENSUS_METHOD,
+        mad_tolerance=settings.EXCHANGE_RATE_CONSENSUS_MAD_TOLERANCE
+    )
+    
+    # Report provider values that were rejected as outliers, not those passed over on fallback
+    valid = ~np.isnan(matrix)
+    checked = valid.sum(axis=1) >= MIN_CONSENSUS_VALUES
+    rejected = (~accepted & valid & checked[:, None]).sum(axis=0)
+    for provider, count in zip(sources, rejected):
+        if count:
+            logger.warning(f"Rejected {count} outlier rates from {provider}")
+    
+    logger.info(f"Consensus rates from {', '.join(sources)}")
+    
+    rates = {code: float(rate) for code, rate in zip(codes, consensus) if not np.isnan(rate)}
+    return rates, CONSENSUS_SOURCE
+
+
 async def fetch_and_store_exchange_rates(db: AsyncSession) -> bool:
     """
     Fetch latest exchange rates and store them in the database.
     
+    Single-provider rows are stamped with the provider's own "last updated" time and
+    written with ON CONFLICT DO NOTHING on (base_currency_id, quote_currency_id,
+    timestamp, source), so re-fetching data the provider has not refreshed stores
+    nothing. Consensus rows are stamped with the ingest time instead, since any
+    contributor refreshing changes them; unchanged consensus payloads are caught by
+    the payload hash. The write is skipped entirely when the payload is identical to
+    the previous fetch.
+    
     Args:
         db: Database session
         
     Returns:
         True if successful, False otherwise
     """
+    global last_payload_hash
+    
     try:
         # Get all currencies from database
-        currencies_result = await db.execute(Currency.__table__.select().where(Currency.is_active == True))
+        currencies_result = await db.execute(select(Currency).where(Currency.is_active == True))
         currencies = currencies_result.scalars().all()
         
         if not currencies:
             logger.warning("No active currencies found in database")
             return False
         
-        # Find NGN currency (assumed to be our main currency)
-        ngn_currency = next((c for c in currencies if c.code == 'NGN'), None)
-        if not ngn_currency:
-            logger.warning("NGN currency not found in database")
+        # Create a mapping of currency codes to IDs for quick lookup
+        currency_map = {c.code: c.id for c in currencies}
+        
+        # Base currencies to store rates for ("*" stores every active currency as a base)
+        base_codes = json.loads(settings.EXCHANGE_RATE_BASE_CURRENCIES)
+        if "*" in base_codes:
+            base_codes = list(currency_map)
+        base_codes = [code for code in base_codes if code in currency_map]
+        if not base_codes:
+            logger.warning("None of the configured base currencies were found in database")
             return False
         
         # Fetch USD rates as most APIs support USD as base
-        usd_rates, source = await get_exchange_rates('USD')
+        if consensus_available():
+            usd_rates, source = await get_consensus_exchange_rates('USD')
+        else:
+            usd_rates, source = await get_exchange_rates('USD')
         if not usd_rates:
             logger.error("Failed to fetch exchange rates from any source")
             return False
         
-        # Current timestamp
-        now = datetime.utcnow()
+        # Skip the write when the provider returned exactly what was stored last time
+        payload_hash = hashlib.sha256(
+            json.dumps([source, usd_rates], sort_keys=True).encode()
+        ).hexdigest()
+        if payload_hash == last_payload_hash:
+            logger.info(f"Rates from {source} unchanged since last update, skipping write")
+            return True
         
-        # Create a mapping of currency codes to IDs for quick lookup
-        currency_map = {c.code: c.id for c in currencies}
+        # Stamp rows with the provider's update time, falling back to the fetch time
+        now = datetime.utcnow()
+        timestamp = get_source_timestamp(source) or now
         
-        # Prepare exchange rate records
-        exchange_rates = []
+        # Build the full cross-rate matrix for all active currencies from the USD table
+        cross_rates.update('USD', usd_rates, list(currency_map), source, timestamp)
         
-        # Add NGN to USD rate
-        if 'NGN' in usd_rates and usd_rates['NGN'] > 0:
-            ngn_to_usd_rate = 1 / usd_rates['NGN']
-            
-            # Add base rate (NGN to USD)
-            usd_currency_id = currency_map.get('USD')
-            if usd_currency_id:
-                ngn_to_usd = ExchangeRate(
-                    base_currency_id=ngn_currency.id,
-                    quote_currency_id=usd_currency_id,
-                    rate=ngn_to_usd_rate,
-                    source=source,
-                    timestamp=now,
-                    created_at=now
-                )
-                exchange_rates.append(ngn_to_usd)
+        # Prepare exchange rate rows for every configured base against every other currency
+        rows = []
+        for base_code in base_codes:
+            base_rates = cross_rates.get_row(base_code)
+            if not base_rates:
+                logger.error(f"{base_code} rate not found in API response")
+                continue
             
-            # Add all other currency rates against NGN
-            for currency_code, usd_to_curr_rate in usd_rates.items():
-                if currency_code in currency_map and currency_code != 'NGN' and currency_code != 'USD':
-                    # NGN to currency rate = (NGN to USD) * (USD to currency)
-                    ngn_to_curr_rate = ngn_to_usd_rate * usd_to_curr_rate
-                    
-                    rate = ExchangeRate(
-                        base_currency_id=ngn_currency.id,
-                        quote_currency_id=currency_map[currency_code],
-                        rate=ngn_to_curr_rate,
-                        source=source,
-                        timestamp=now,
-                        created_at=now
-                    )
-                    exchange_rates.append(rate)
-        else:
-            logger.error("NGN rate not found in API response")
+            rows.extend(
+                {
+                    "base_currency_id": currency_map[base_code],
+                    "quote_currency_id": currency_map[currency_code],
+                    "rate": rate,
+                    "source": source,
+                    "timestamp": timestamp,
+                    "created_at": now
+                }
+                for currency_code, rate in base_rates.items()
+            )
+        
+        if not rows:
             return False
         
-        # Add all rates to database
-        for rate in exchange_rates:
-            db.add(rate)
+        # Write all rates in bulk, ignoring ticks that are already stored
+        stored = await bulk_insert_exchange_rates(db, rows)
         
         await db.commit()
-        logger.info(f"Successfully stored {len(exchange_rates)} exchange rates from {source}")
+        await flush_segment_rows(db)
+        last_payload_hash = payload_hash
+        
+        # Other processes are told over NOTIFY; this one can drop its copy right away
+        latest_rates.invalidate(timestamp)
+        logger.info(f"Successfully stored {stored} of {len(rows)} exchange rates from {source} as of {timestamp}")
         return True
     except Exception as e:
         await db.rollback()
@@ -247,9 +568,8 @@ async def update_exchange_rates() -> bool:
         True if successful, False otherwise
     """
     try:
-        async for db in get_db_session():
+        async with AsyncSessionLocal() as db:
             return await fetch_and_store_exchange_rates(db)
-        return False
     except Exception as e:
         logger.error(f"Error updating exchange rates: {e}")
         return False
@@ -273,33 +593,7 @@ async def get_historical_rates_for_currency_pair(
     Returns:
         List of historical rates with timestamps
     """
-    from sqlalchemy import select
-    from datetime import datetime, timedelta
-    
-    # Calculate start date
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Query historical rates
-    query = select(ExchangeRate).where(
-        ExchangeRate.base_currency_id == base_currency_id,
-        ExchangeRate.quote_currency_id == quote_currency_id,
-        ExchangeRate.timestamp >= start_date
-    ).order_by(ExchangeRate.timestamp.desc())
-    
-    result = await db.execute(query)
-    rates = result.scalars().all()
-    
-    # Format as list of dictionaries
-    formatted_rates = []
-    for rate in rates:
-        formatted_rates.append({
-            "id": rate.id,
-            "rate": float(rate.rate),
-            "timestamp": rate.timestamp,
-            "source": rate.source
-        })
-    
-    return formatted_rates
+    return await rate_repository.get_records(db, base_currency_id, quote_currency_id, days)
 
 
 async def get_current_rate(
@@ -318,19 +612,10 @@ async def get_current_rate(
     Returns:
         Most recent exchange rate or None if not found
     """
-    from sqlalchemy import select
-    
-    # Query for the most recent rate
-    query = select(ExchangeRate).where(
-        ExchangeRate.base_currency_id == base_currency_id,
-        ExchangeRate.quote_currency_id == quote_currency_id
-    ).order_by(ExchangeRate.timestamp.desc()).limit(1)
+    current = await latest_rates.get(db, base_currency_id, quote_currency_id)
     
-    result = await db.execute(query)
-    rate = result.scalar_one_or_none()
-    
-    if rate:
-        return float(rate.rate)
+    if current is not None:
+        return current["rate"]
     return None
 
 
@@ -345,48 +630,43 @@ async def get_all_current_rates(db: AsyncSession, base_currency_code: str = 'NGN
     Returns:
         List of current rates for all currencies
     """
-    from sqlalchemy import select
-    
-    # Get base currency ID
-    base_query = select(Currency).where(Currency.code == base_currency_code)
-    base_result = await db.execute(base_query)
-    base_currency = base_result.scalar_one_or_none()
+    # Get the base currency and all active quote currencies in one query
+    currencies_query = select(Currency).where(
+        (Currency.code == base_currency_code) | (Currency.is_active == True)
+    ).order_by(Currency.code)
+    currencies_result = await db.execute(currencies_query)
+    currencies = currencies_result.scalars().all()
     
+    base_currency = next((c for c in currencies if c.code == base_currency_code), None)
     if not base_currency:
         logger.error(f"Base currency {base_currency_code} not found")
         return []
     
-    # Get all active currencies
-    currencies_query = select(Currency).where(Currency.is_active == True)
-    currencies_result = await db.execute(currencies_query)
-    currencies = currencies_result.scalars().all()
+    # Latest rates come from the cached current rates snapshot
+    base_rates = await latest_rates.get_base(db, base_currency.id)
     
     current_rates = []
-    
-    # Get the most recent rate for each pair
     for quote_currency in currencies:
-        # Skip same currency
-        if quote_currency.id == base_currency.id:
+        current = base_rates.get(quote_currency.id)
+        if current is None or not quote_currency.is_active:
             continue
         
-        # Get most recent rate
-        rate_value = await get_current_rate(db, base_currency.id, quote_currency.id)
-        if rate_value is not None:
-            current_rates.append({
-                "base_currency": {
-                    "id": base_currency.id,
-                    "code": base_currency.code,
-                    "name": base_currency.name,
-                    "symbol": base_currency.symbol
-                },
-                "quote_currency": {
-                    "id": quote_currency.id,
-                    "code": quote_currency.code,
-                    "name": quote_currency.name,
-                    "symbol": quote_currency.symbol
-                },
-                "rate": rate_value,
-                "timestamp": datetime.utcnow()
-            })
-    
-    return current_rates
\ No newline at end of file
+        current_rates.append({
+            "base_currency": {
+                "id": base_currency.id,
+                "code": base_currency.code,
+                "name": base_currency.name,
+                "symbol": base_currency.symbol
+            },
+            "quote_currency": {
+                "id": quote_currency.id,
+                "code": quote_currency.code,
+                "name": quote_currency.name,
+                "symbol": quote_currency.symbol
+            },
+            "rate": current["rate"],
+            "source": current["source"],
+            "timestamp": current["timestamp"]
+        })
+    
+    return current_rates
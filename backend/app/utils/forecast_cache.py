@@ -0,0 +1,272 @@
+"""
+Forecast cache.
+This module keeps rate forecasts so readers do not refit models on every request.
+The prediction job stores its forecasts in the rate_forecasts table, and every
+process holds the ones it has used in memory, keyed by (pair, model) with one
+forecast per horizon and the data watermark they were fitted up to.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.currency import RateForecast
+from app.utils.rate_candles import candles_changed_since
+from app.utils.rate_cache import latest_rates
+
+logger = logging.getLogger(__name__)
+
+ForecastKey = Tuple[int, int, str]
+
+
+class ForecastEntry:
+    """
+    Forecasts of one pair and model, one per horizon, fitted on data up to watermark.
+    """
+
+    def __init__(
+        self,
+        watermark: datetime,
+        forecasts: List[Dict[str, Any]],
+        created_at: datetime,
+        expires_at: datetime
+    ) -> None:
+        self.watermark = watermark
+        self.forecasts = forecasts
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    def is_valid(self, watermark: datetime, now: datetime) -> bool:
+        """True if the forecasts were fitted on data ending at watermark and have not expired."""
+        return self.watermark == watermark and now < self.expires_at
+
+
+class ForecastCache:
+    """
+    Read-through cache of forecasts keyed by (base_currency_id, quote_currency_id, model).
+
+    A forecast is only served while the data it was fitted on still ends at its
+    watermark and for at most FORECAST_CACHE_TTL seconds, which bounds how long
+    updates to the newest candle go unnoticed. A memory miss falls back to the
+    rate_forecasts table. Ticks written before a cached watermark (e.g. a backfill)
+    drop the affected entries; stored rows are only used while no candle of the
+    history they were fitted on has been written since they were created, which
+    holds across restarts and writes by other processes.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[ForecastKey, ForecastEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def invalidate(self, since: Optional[datetime] = None) -> None:
+        """
+        Drop the forecasts fitted on history that new ticks rewrote.
+
+        Ticks after a watermark need no action: the data then ends past the watermark
+        and the entry no longer matches on read.
+
+        Args:
+            since: Timestamp of the oldest tick written, or None if unknown
+        """
+        stale = [
+            key for key, entry in self._entries.items()
+            if since is None or since < entry.watermark
+        ]
+        for key in stale:
+            del self._entries[key]
+
+    def put(
+        self,
+        base_currency_id: int,
+        quote_currency_id: int,
+        model: str,
+        watermark: datetime,
+        forecasts: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Cache forecasts in this process only.
+
+        Args:
+            base_currency_id: Base currency ID
+            quote_currency_id: Quote currency ID
+            model: Model name
+            watermark: Timestamp of the newest point the model was fitted on
+            forecasts: Forecast dictionaries with horizon_days, date, predicted_rate,
+                lower_bound, upper_bound and confidence
+        """
+        now = datetime.utcnow()
+        self._entries[(base_currency_id, quote_currency_id, model)] = ForecastEntry(
+            watermark, forecasts, now, now + timedelta(seconds=settings.FORECAST_CACHE_TTL)
+        )
+
+    async def store(
+        self,
+        db: AsyncSession,
+        base_currency_id: int,
+        quote_currency_id: int,
+        model: str,
+        watermark: datetime,
+        forecasts: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Cache forecasts and replace the stored ones of the pair and model.
+        The caller is responsible for committing.
+
+        Args:
+            db: Database session
+            base_currency_id: Base currency ID
+            quote_currency_id: Quote currency ID
+            model: Model name
+            watermark: Timestamp of the newest point the model was fitted on
+            forecasts: Forecast dictionaries, as for put
+        """
+        self.put(base_currency_id, quote_currency_id, model, watermark, forecasts)
+        entry = self._entries[(base_currency_id, quote_currency_id, model)]
+
+        await db.execute(
+            delete(RateForecast).where(
+                RateForecast.base_currency_id == base_currency_id,
+                RateForecast.quote_currency_id == quote_currency_id,
+                RateForecast.model == model
+            )
+        )
+        db.add_all([
+            RateForecast(
+                base_currency_id=base_currency_id,
+                quote_currency_id=quote_currency_id,
+                model=model,
+                horizon_days=forecast["horizon_days"],
+                watermark=watermark,
+                target_date=forecast["date"],
+                predicted_rate=forecast["predicted_rate"],
+                lower_bound=forecast["lower_bound"],
+                upper_bound=forecast["upper_bound"],
+                confidence=forecast["confidence"],
+                created_at=entry.created_at,
+                expires_at=entry.expires_at
+            )
+            for forecast in forecasts
+        ])
+
+    async def _load(
+        self,
+        db: AsyncSession,
+        key: ForecastKey,
+        resolution: str,
+        start: datetime
+    ) -> Optional[ForecastEntry]:
+        """
+        Read the stored forecasts of a pair and model.
+
+        Args:
+            db: Database session
+            key: Forecast key
+            resolution: Resolution of the history the forecasts are fitted on
+            start: First point of that history
+
+        Returns:
+            Entry built from the stored rows, or None if there are none or their history changed since
+        """
+        self.loads += 1
+        base_currency_id, quote_currency_id, model = key
+        result = await db.execute(
+            select(RateForecast).where(
+                RateForecast.base_currency_id == base_currency_id,
+                RateForecast.quote_currency_id == quote_currency_id,
+                RateForecast.model == model
+            ).order_by(RateForecast.horizon_days)
+        )
+        rows = result.scalars().all()
+        if not rows:
+            return None
+        first = rows[0]
+        if await candles_changed_since(
+            db, base_currency_id, quote_currency_id, resolution, start, first.watermark, first.created_at
+        ):
+            return None
+        return ForecastEntry(
+            first.watermark,
+            [
+                {
+                    "horizon_days": row.horizon_days,
+                    "date": row.target_date,
+                    "predicted_rate": float(row.predicted_rate),
+                    "lower_bound": None if row.lower_bound is None else float(row.lower_bound),
+                    "upper_bound": None if row.upper_bound is None else float(row.upper_bound),
+                    "confidence": None if row.confidence is None else float(row.confidence),
+                }
+                for row in rows
+            ],
+            first.created_at,
+            first.expires_at
+        )
+
+    async def get(
+        self,
+        db: AsyncSession,
+        base_currency_id: int,
+        quote_currency_id: int,
+        model: str,
+        watermark: datetime,
+        resolution: str,
+        start: datetime
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the forecasts of a pair and model fitted on data ending at watermark.
+
+        Args:
+            db: Database session used on a memory miss
+            base_currency_id: Base currency ID
+            quote_currency_id: Quote currency ID
+            model: Model name
+            watermark: Timestamp of the newest point of the pair's current data
+            resolution: Resolution of the data, "raw", "1h" or "1d"
+            start: Timestamp of the first point of the pair's current data
+
+        Returns:
+            Forecasts ordered by horizon, or None if none are valid
+        """
+        key = (base_currency_id, quote_currency_id, model)
+        now = datetime.utcnow()
+        entry = self._entries.get(key)
+        if entry is not None and entry.is_valid(watermark, now):
+            self.hits += 1
+            return entry.forecasts
+
+        # Another process may have stored newer forecasts
+        self.misses += 1
+        entry = await self._load(db, key, resolution, start)
+        if entry is not None and entry.is_valid(watermark, now):
+            self._entries[key] = entry
+            return entry.forecasts
+        return None
+
+    def clear(self) -> None:
+        """Drop every cached forecast."""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Entry count and hit/miss/load counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "loads": self.loads,
+        }
+
+
+# Process-wide forecast cache, told about rewritten history through latest-rate cache invalidations
+forecast_cache = ForecastCache()
+latest_rates.subscribe(forecast_cache.invalidate)
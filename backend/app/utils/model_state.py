@@ -0,0 +1,316 @@
+"""
+Incremental prediction model state.
+This module keeps what the prediction models need of a pair's daily window as
+sufficient statistics: point sums for the linear regressions, lagged difference
+sums for the ARIMA(1,1,0) coefficient and residual variance, the last few closes
+and the EWMA. Sliding the window by a day then only touches the closes that
+enter and leave it, instead of refitting every model on the whole window.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.arima import MAX_AR_COEFFICIENT
+
+# Sums over the window's points, with x the point's ordinal, t its time in days and y its rate
+POINT_KEYS = ("n", "x", "t", "y", "xx", "xy", "tt", "ty", "yy")
+
+# Sums over consecutive differences (d, previous d) of the window's rates
+PAIR_KEYS = ("pairs", "dd", "ll", "d2")
+
+# Span of the exponentially weighted moving average
+EWMA_SPAN = 5
+EWMA_ALPHA = 2 / (EWMA_SPAN + 1)
+
+# Closes kept to revise the newest one, which changes until its day is over
+TAIL_LENGTH = 3
+
+
+def _point_sums(x: np.ndarray, t: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Sums in POINT_KEYS order."""
+    return np.array([
+        len(y), x.sum(), t.sum(), y.sum(),
+        (x * x).sum(), (x * y).sum(), (t * t).sum(), (t * y).sum(), (y * y).sum()
+    ], dtype=np.float64)
+
+
+def _pair_sums(rates: np.ndarray) -> np.ndarray:
+    """Sums in PAIR_KEYS order over every three consecutive rates."""
+    diffs = np.diff(rates)
+    current, previous = diffs[1:], diffs[:-1]
+    return np.array([
+        len(current), (current * previous).sum(), (previous * previous).sum(), (current * current).sum()
+    ], dtype=np.float64)
+
+
+def _run_ewma(ewma: Optional[float], rates: np.ndarray) -> List[float]:
+    """EWMA after each of rates, starting from ewma (or the first rate)."""
+    values = []
+    for rate in rates:
+        ewma = float(rate) if ewma is None else EWMA_ALPHA * float(rate) + (1 - EWMA_ALPHA) * ewma
+        values.append(ewma)
+    return values
+
+
+class PairModelState:
+    """
+    Fitted prediction model state of one pair's window of daily closes.
+
+    x, t and y are kept relative to the values at the last full refit, which keeps
+    the sums well conditioned; ordinals keep counting across slides, so x of the
+    window's first point is first_ordinal.
+    """
+
+    def __init__(
+        self,
+        window_start: int,
+        last_timestamp: int,
+        first_ordinal: int,
+        ref_epoch: int,
+        ref_rate: float,
+        points: np.ndarray,
+        pairs: np.ndarray,
+        tail: List[float],
+        ewma: float,
+        ewma_previous: Optional[float],
+        refitted_at: datetime
+    ) -> None:
+        self.window_start = window_start
+        self.last_timestamp = last_timestamp
+        self.first_ordinal = first_ordinal
+        self.ref_epoch = ref_epoch
+        self.ref_rate = ref_rate
+        self.points = points
+        self.pairs = pairs
+        self.tail = tail
+        self.ewma = ewma
+        self.ewma_previous = ewma_previous
+        self.refitted_at = refitted_at
+
+    @classmethod
+    def fit(cls, timestamps: np.ndarray, rates: np.ndarray, refitted_at: datetime) -> "PairModelState":
+        """
+        Build the state of a window from scratch.
+
+        Args:
+            timestamps: Epoch seconds of the daily closes, oldest first
+            rates: Daily closes
+            refitted_at: Time of the refit
+
+        Returns:
+            Model state
+        """
+        ref_epoch = int(timestamps[0])
+        ref_rate = float(rates.mean())
+        t = (timestamps - ref_epoch) / 86400.0
+        ewma_values = _run_ewma(None, rates)
+        return cls(
+            window_start=int(timestamps[0]),
+            last_timestamp=int(timestamps[-1]),
+            first_ordinal=0,
+            ref_epoch=ref_epoch,
+            ref_rate=ref_rate,
+            points=_point_sums(np.arange(len(rates), dtype=np.float64), t, rates - ref_rate),
+            pairs=_pair_sums(rates),
+            tail=[float(rate) for rate in rates[-TAIL_LENGTH:]],
+            ewma=ewma_values[-1],
+            ewma_previous=ewma_values[-2] if len(ewma_values) > 1 else None,
+            refitted_at=refitted_at
+        )
+
+    def update(
+        self,
+        timestamps: np.ndarray,
+        rates: np.ndarray,
+        window_start: int,
+        drift_threshold: float
+    ) -> Optional[str]:
+        """
+        Slide the window to window_start and take in the closes after the state's last one.
+
+        The newest close of the state is replaced by its current value, since that
+        day's candle may have changed since the last run.
+
+        Args:
+            timestamps: Epoch seconds of the daily closes from the state's window start, oldest first
+            rates: Daily closes
+            window_start: Epoch seconds of the new window start
+            drift_threshold: Largest one-step ARIMA error of a new close, in residual
+                standard deviations, that is still absorbed incrementally
+
+        Returns:
+            None if the state was updated, otherwise why it needs a full refit
+        """
+        n = int(self.points[0])
+        length = len(rates)
+        if n < TAIL_LENGTH or length < n:
+            return "window too short"
+        if int(timestamps[0]) != self.window_start or int(timestamps[n - 1]) != self.last_timestamp:
+            return "history changed"
+        if list(rates[n - TAIL_LENGTH:n - 1]) != self.tail[:-1]:
+            return "history changed"
+        start = int(np.searchsorted(timestamps, window_start))
+        if start > n - TAIL_LENGTH:
+            return "window slid past the stored state"
+
+        # Closes from the revised newest one on, judged by the current fit
+        sigma = np.sqrt(self.residual_variance) if self.residual_variance is not None else np.nan
+        if np.isfinite(sigma):
+            diffs = np.diff(rates[n - TAIL_LENGTH:])
+            errors = diffs[1:] - self.ar_coefficient * diffs[:-1]
+            if len(errors) and np.abs(errors).max() > drift_threshold * sigma:
+                return "drift"
+
+        x = self.first_ordinal + np.arange(length, dtype=np.float64)
+        t = (timestamps - self.ref_epoch) / 86400.0
+        y = rates - self.ref_rate
+
+        # Take out the stored newest close and the closes leaving the window
+        stored_last = np.array([self.tail[-1]])
+        self.points -= _point_sums(x[n - 1:n], t[n - 1:n], stored_last - self.ref_rate)
+        self.pairs -= _pair_sums(np.array(self.tail))
+        self.points -= _point_sums(x[:start], t[:start], y[:start])
+        self.pairs -= _pair_sums(rates[:start + 2])
+
+        # Put in the current newest close and the closes after it
+        self.points += _point_sums(x[n - 1:], t[n - 1:], y[n - 1:])
+        self.pairs += _pair_sums(rates[n - TAIL_LENGTH:])
+
+        ewma_values = _run_ewma(self.ewma_previous, rates[n - 1:])
+        self.ewma = ewma_values[-1]
+        self.ewma_previous = ewma_values[-2] if len(ewma_values) > 1 else self.ewma_previous
+
+        self.window_start = int(timestamps[start])
+        self.last_timestamp = int(timestamps[-1])
+        self.first_ordinal += start
+        self.tail = [float(rate) for rate in rates[max(start, length - TAIL_LENGTH):]]
+        return None
+
+    @property
+    def count(self) -> int:
+        """Number of closes in the window."""
+        return int(self.points[0])
+
+    @property
+    def latest(self) -> float:
+        """Newest close."""
+        return self.tail[-1]
+
+    @property
+    def mean(self) -> float:
+        """Mean close."""
+        return float(self.ref_rate + self.points[3] / self.points[0])
+
+    def variance(self, ddof: int = 0) -> float:
+        """
+        Variance of the closes.
+
+        Args:
+            ddof: Delta degrees of freedom, 1 for the sample variance
+
+        Returns:
+            Variance
+        """
+        n, _, _, sum_y, _, _, _, _, sum_yy = self.points
+        if n <= ddof:
+            return float("nan")
+        return max(sum_yy - sum_y * sum_y / n, 0.0) / (n - ddof)
+
+    def _slope(self, sum_u: float, sum_uu: float, sum_uy: float) -> float:
+        """Least squares slope of the closes against u."""
+        n, sum_y = self.points[0], self.points[3]
+        spread = sum_uu - sum_u * sum_u / n
+        if spread <= 1e-12 * max(sum_uu, 1.0):
+            return 0.0
+        return (sum_uy - sum_u * sum_y / n) / spread
+
+    @property
+    def slope_per_day(self) -> float:
+        """Least squares slope of the closes per day."""
+        _, _, sum_t, _, _, _, sum_tt, sum_ty, _ = self.points
+        return self._slope(sum_t, sum_tt, sum_ty)
+
+    def predict_index(self, steps: int) -> np.ndarray:
+        """
+        Extrapolate the least squares line over the closes' positions.
+
+        Args:
+            steps: Number of positions after the newest close
+
+        Returns:
+            Forecast closes
+        """
+        n, sum_x, _, sum_y, sum_xx, sum_xy, _, _, _ = self.points
+        slope = self._slope(sum_x, sum_xx, sum_xy)
+        intercept = sum_y / n - slope * sum_x / n
+        future_x = self.first_ordinal + n + np.arange(steps, dtype=np.float64)
+        return self.ref_rate + intercept + slope * future_x
+
+    @property
+    def ar_coefficient(self) -> float:
+        """Conditional least squares AR coefficient of the differences."""
+        _, cross, energy, _ = self.pairs
+        if energy <= 0:
+            return 0.0
+        return float(np.clip(cross / energy, -MAX_AR_COEFFICIENT, MAX_AR_COEFFICIENT))
+
+    @property
+    def residual_variance(self) -> Optional[float]:
+        """Variance of the AR residuals, None without any difference pairs."""
+        count, cross, energy, squares = self.pairs
+        if count < 1:
+            return None
+        phi = self.ar_coefficient
+        return max(squares - 2 * phi * cross + phi * phi * energy, 0.0) / count
+
+    @property
+    def last_diff(self) -> float:
+        """Newest difference of the closes."""
+        return self.tail[-1] - self.tail[-2] if len(self.tail) > 1 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the state as JSON-serializable values.
+
+        Returns:
+            Dictionary accepted by from_dict
+        """
+        return {
+            "window_start": self.window_start,
+            "last_timestamp": self.last_timestamp,
+            "first_ordinal": self.first_ordinal,
+            "ref_epoch": self.ref_epoch,
+            "ref_rate": self.ref_rate,
+            "points": dict(zip(POINT_KEYS, self.points.tolist())),
+            "pairs": dict(zip(PAIR_KEYS, self.pairs.tolist())),
+            "tail": self.tail,
+            "ewma": self.ewma,
+            "ewma_previous": self.ewma_previous,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], refitted_at: datetime) -> "PairModelState":
+        """
+        Rebuild a state from to_dict values.
+
+        Args:
+            data: Values returned by to_dict
+            refitted_at: Time of the last full refit
+
+        Returns:
+            Model state
+        """
+        return cls(
+            window_start=data["window_start"],
+            last_timestamp=data["last_timestamp"],
+            first_ordinal=data["first_ordinal"],
+            ref_epoch=data["ref_epoch"],
+            ref_rate=data["ref_rate"],
+            points=np.array([data["points"][key] for key in POINT_KEYS], dtype=np.float64),
+            pairs=np.array([data["pairs"][key] for key in PAIR_KEYS], dtype=np.float64),
+            tail=list(data["tail"]),
+            ewma=data["ewma"],
+            ewma_previous=data["ewma_previous"],
+            refitted_at=refitted_at
+        )
@@ -1,266 +1,74 @@
 """
 Exchange rate prediction utilities.
 This module provides algorithms for exchange rate prediction and analysis.
+The model fitting itself lives in app.utils.prediction_models and runs in a
+process pool, so the daily job does not block the event loop.
 """
+import asyncio
 import logging
-import numpy as np
-import pandas as pd
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, List, Optional, Any
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.models.currency import Currency, ExchangeRate
+from app.db.session import AsyncSessionLocal
+from app.models.currency import Currency, PredictionModelState
 from app.models.alert import Alert
 from app.services.notification import send_alert_notification
+from app.utils.forecast_cache import forecast_cache
+from app.utils.prediction_models import (
+    ENSEMBLE_MODEL,
+    analyze_pairs,
+    analyze_state,
+    fit_model_states,
+    predict_trend_rates_batch,
+    trend_model_name,
+)
+from app.utils.rate_cache import latest_rates
+from app.utils.model_state import PairModelState
+from app.utils.rate_candles import bucket_start, candles_changed_since, choose_resolution
+from app.utils.rate_repository import rate_repository
+from app.utils.rate_window import from_epoch, to_epoch
 
 logger = logging.getLogger(__name__)
 
-
-async def get_historical_rates(
-    db: AsyncSession, 
-    base_currency_id: int, 
-    quote_currency_id: int, 
-    days: int
-) -> List[Dict[str, Any]]:
-    """
-    Get historical exchange rates for a currency pair.
-    
-    Args:
-        db: Database session
-        base_currency_id: ID of the base currency
-        quote_currency_id: ID of the quote currency
-        days: Number of days of historical data to retrieve
-        
-    Returns:
-        List of exchange rate records
-    """
-    # Calculate start date
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Query for historical rates
-    query = select(ExchangeRate).where(
-        ExchangeRate.base_currency_id == base_currency_id,
-        ExchangeRate.quote_currency_id == quote_currency_id,
-        ExchangeRate.timestamp >= start_date
-    ).order_by(ExchangeRate.timestamp.desc())
-    
-    result = await db.execute(query)
-    rates = result.scalars().all()
-    
-    return [
-        {
-            "rate": float(rate.rate),
-            "timestamp": rate.timestamp,
-            "source": rate.source
-        }
-        for rate in rates
-    ]
-
-
-def calculate_statistics(rates: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """
-    Calculate statistical metrics for a series of exchange rates.
-    
-    Args:
-        rates: List of exchange rate records
-        
-    Returns:
-        Dictionary of statistical metrics
-    """
-    if not rates:
-        return {
-            "mean": None,
-            "median": None,
-            "std_dev": None,
-            "min": None,
-            "max": None,
-            "volatility": None,
-            "trend": None
-        }
-    
-    # Extract rate values
-    rate_values = [r["rate"] for r in rates]
-    
-    # Calculate statistics
-    mean_rate = np.mean(rate_values)
-    median_rate = np.median(rate_values)
-    std_dev = np.std(rate_values)
-    min_rate = min(rate_values)
-    max_rate = max(rate_values)
-    
-    # Calculate volatility (coefficient of variation)
-    volatility = std_dev / mean_rate if mean_rate > 0 else 0
-    
-    # Calculate trend (simple linear regression slope)
-    timestamps = [(r["timestamp"] - rates[-1]["timestamp"]).total_seconds() / 86400 for r in rates]  # Convert to days
-    if len(timestamps) > 1 and len(set(timestamps)) > 1:
-        slope, _ = np.polyfit(timestamps, rate_values, 1)
-        # Normalize slope as percentage change per day
-        trend = slope / mean_rate * 100
-    else:
-        trend = 0
-    
-    return {
-        "mean": mean_rate,
-        "median": median_rate,
-        "std_dev": std_dev,
-        "min": min_rate,
-        "max": max_rate,
-        "volatility": volatility,
-        "trend": trend  # Percentage change per day
-    }
+# Worker processes fitting prediction models, created on first use
+_prediction_pool: Optional[ProcessPoolExecutor] = None
+_prediction_workers = 0
 
 
-def predict_future_rates(
-    rates: List[Dict[str, Any]], 
-    days_ahead: int = 7
-) -> List[Dict[str, Any]]:
+def get_prediction_pool() -> ProcessPoolExecutor:
     """
-    Predict future exchange rates using various algorithms.
+    Get the process pool used for prediction model fitting.
     
-    Args:
-        rates: List of historical exchange rate records
-        days_ahead: Number of days to predict ahead
-        
     Returns:
-        List of predicted rate values with confidence intervals
+        Process pool with PREDICTION_WORKERS processes (one per CPU core if 0)
     """
-    if not rates or len(rates) < 5:
-        return []
-    
-    # Convert to pandas DataFrame for easier analysis
-    df = pd.DataFrame([
-        {"rate": r["rate"], "timestamp": r["timestamp"]} 
-        for r in rates
-    ])
-    df = df.sort_values("timestamp")
-    
-    # Extract features (simple time index for now)
-    df["time_index"] = range(len(df))
-    
-    # Calculate moving averages
-    df["ma_3"] = df["rate"].rolling(window=3, min_periods=1).mean()
-    df["ma_7"] = df["rate"].rolling(window=7, min_periods=1).mean()
-    
-    # Calculate simple exponential weighted moving average
-    df["ewma"] = df["rate"].ewm(span=5, adjust=False).mean()
-    
-    # Simple linear regression
-    X = df["time_index"].values.reshape(-1, 1)
-    y = df["rate"].values
-    
-    if len(set(X.flatten())) > 1:  # Check if we have variation in X
-        from sklearn.linear_model import LinearRegression
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        # Generate future time indices
-        future_time_indices = np.array(range(len(df), len(df) + days_ahead)).reshape(-1, 1)
-        
-        # Predict future rates
-        future_rates_lr = model.predict(future_time_indices)
-    else:
-        # If we don't have enough data variation, use last value
-        future_rates_lr = np.array([y[-1]] * days_ahead)
-    
-    # Attempt to fit ARIMA model if we have enough data
-    try:
-        from statsmodels.tsa.arima.model import ARIMA
-        if len(df) >= 10:  # Need sufficient data for ARIMA
-            # Fit ARIMA model (simple parameters for now)
-            model = ARIMA(df["rate"].values, order=(1, 1, 0))
-            model_fit = model.fit()
-            
-            # Forecast
-            forecast = model_fit.forecast(steps=days_ahead)
-            future_rates_arima = forecast
-        else:
-            future_rates_arima = future_rates_lr  # Fallback to linear regression
-    except Exception as e:
-        logger.warning(f"ARIMA model failed: {e}")
-        future_rates_arima = future_rates_lr  # Fallback to linear regression
-    
-    # Average predictions from different models for robustness
-    future_rates = (future_rates_lr + future_rates_arima) / 2
-    
-    # Calculate prediction error bounds (simple approach)
-    std_dev = df["rate"].std()
-    error_margin = std_dev * 1.96  # 95% confidence interval assuming normal distribution
-    
-    # Generate dates for predictions
-    last_date = df["timestamp"].iloc[-1]
-    future_dates = [last_date + timedelta(days=i+1) for i in range(days_ahead)]
-    
-    # Prepare prediction results
-    predictions = []
-    for i in range(days_ahead):
-        predictions.append({
-            "date": future_dates[i],
-            "predicted_rate": float(future_rates[i]),
-            "lower_bound": float(max(0, future_rates[i] - error_margin)),
-            "upper_bound": float(future_rates[i] + error_margin),
-            "confidence": 0.95  # 95% confidence interval
-        })
-    
-    return predictions
+    global _prediction_pool, _prediction_workers
+    if _prediction_pool is None:
+        workers = settings.PREDICTION_WORKERS or os.cpu_count() or 1
+        _prediction_workers = workers
+        # Spawn rather than fork the server process with its event loop and driver threads
+        _prediction_pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Started prediction process pool with {workers} workers")
+    return _prediction_pool
 
 
-def calculate_optimal_thresholds(
-    rates: List[Dict[str, Any]], 
-    statistics: Dict[str, Any], 
-    predictions: List[Dict[str, Any]]
-) -> Dict[str, float]:
+def shutdown_prediction_pool() -> None:
     """
-    Calculate optimal thresholds for buy/sell alerts.
-    
-    Args:
-        rates: Historical exchange rates
-        statistics: Statistical metrics
-        predictions: Future rate predictions
-        
-    Returns:
-        Dictionary with buy and sell thresholds
+    Stop the prediction process pool if it was started.
     """
-    # Extract current rate
-    current_rate = rates[0]["rate"] if rates else None
-    if current_rate is None:
-        return {"buy_threshold": 0, "sell_threshold": 0}
-    
-    # Extract statistical measures
-    mean = statistics["mean"]
-    std_dev = statistics["std_dev"]
-    trend = statistics["trend"]
-    
-    # Default thresholds based on statistical measures
-    default_buy_threshold = mean - std_dev  # Buy when rate is lower than average (good for buying foreign currency)
-    default_sell_threshold = mean + std_dev  # Sell when rate is higher than average
-    
-    # Adjust thresholds based on trend
-    trend_adjustment = trend * 5  # Scale trend impact
-    
-    buy_threshold = default_buy_threshold * (1 - trend_adjustment/100)  # Lower buy threshold if downward trend
-    sell_threshold = default_sell_threshold * (1 + trend_adjustment/100)  # Raise sell threshold if upward trend
-    
-    # Consider predictions
-    if predictions:
-        # Calculate average predicted rate
-        avg_predicted_rate = sum(p["predicted_rate"] for p in predictions) / len(predictions)
-        
-        # If prediction shows significant change, adjust thresholds
-        predicted_change = (avg_predicted_rate - current_rate) / current_rate
-        if abs(predicted_change) > 0.02:  # 2% change threshold
-            # Adjust buy/sell thresholds based on predicted direction
-            if predicted_change < 0:  # Predicted to decrease
-                buy_threshold = avg_predicted_rate * 1.01  # Buy slightly above predicted low
-            else:  # Predicted to increase
-                sell_threshold = avg_predicted_rate * 0.99  # Sell slightly below predicted high
-    
-    return {
-        "buy_threshold": max(0, buy_threshold),  # Ensure non-negative
-        "sell_threshold": max(buy_threshold, sell_threshold)  # Ensure sell > buy
-    }
+    global _prediction_pool
+    if _prediction_pool is not None:
+        _prediction_pool.shutdown(wait=False, cancel_futures=True)
+        _prediction_pool = None
 
 
 async def generate_alerts_from_predictions(
@@ -367,22 +175,17 @@ async def check_and_notify_triggered_alerts(db: AsyncSession) -> None:
         
         now = datetime.utcnow()
         
+        # Latest rate of every pair from the cached current rates snapshot
+        current_rates = await latest_rates.get_all(db)
+        
         # Process each alert
         for alert in alerts:
-            # Get the latest exchange rate for this currency pair
-            rate_query = select(ExchangeRate).where(
-                ExchangeRate.base_currency_id == alert.base_currency_id,
-                ExchangeRate.quote_currency_id == alert.quote_currency_id
-            ).order_by(ExchangeRate.timestamp.desc()).limit(1)
-            
-            rate_result = await db.execute(rate_query)
-            latest_rate = rate_result.scalar_one_or_none()
-            
-            if not latest_rate:
+            current = current_rates.get((alert.base_currency_id, alert.quote_currency_id))
+            if current is None:
                 continue
             
             # Check if alert is triggered
-            rate_value = float(latest_rate.rate)
+            rate_value = current["rate"]
             threshold = float(alert.threshold)
             is_triggered = False
             
@@ -452,6 +255,172 @@ async def check_and_notify_triggered_alerts(db: AsyncSession) -> None:
         logger.error(f"Error checking and notifying alerts: {e}")
 
 
+async def map_in_pool(func: Callable, items: List[Any], *args: Any) -> List[Optional[Any]]:
+    """
+    Run func over items in the prediction process pool, one batch of items per worker.
+    
+    Args:
+        func: Picklable function taking a list of items and args, returning one result per item
+        items: Items to process
+        *args: Further arguments of func
+        
+    Returns:
+        Result per item, None for the items of a batch that failed
+    """
+    if not items:
+        return []
+    loop = asyncio.get_running_loop()
+    pool = get_prediction_pool()
+    batch_count = min(_prediction_workers, len(items))
+    batches = [list(range(i, len(items), batch_count)) for i in range(batch_count)]
+    batch_results = await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, func, [items[index] for index in batch], *args)
+            for batch in batches
+        ),
+        return_exceptions=True
+    )
+    
+    results: List[Optional[Any]] = [None] * len(items)
+    for batch, result in zip(batches, batch_results):
+        if isinstance(result, BaseException):
+            logger.error(f"Prediction worker failed on a batch of {len(batch)} pairs: {result}")
+            continue
+        for index, item_result in zip(batch, result):
+            results[index] = item_result
+    return results
+
+
+async def load_model_states(db: AsyncSession, base_currency_id: int) -> Dict[int, PairModelState]:
+    """
+    Load the stored model states of a base currency's pairs.
+    
+    States whose window has daily candles written after the state was saved (e.g. by
+    a backfill in another process) are left out, so those pairs are refitted from
+    scratch. The newest close a state took in is not checked, as updates revise it.
+    
+    Args:
+        db: Database session
+        base_currency_id: Base currency ID
+        
+    Returns:
+        Dictionary of quote currency ID to model state
+    """
+    result = await db.execute(
+        select(PredictionModelState).where(PredictionModelState.base_currency_id == base_currency_id)
+    )
+    states = {}
+    for row in result.scalars().all():
+        state = PairModelState.from_dict(row.state, row.refitted_at)
+        if await candles_changed_since(
+            db, base_currency_id, row.quote_currency_id, "1d",
+            from_epoch(state.window_start), from_epoch(state.last_timestamp), row.updated_at
+        ):
+            logger.info(f"History of pair {base_currency_id}/{row.quote_currency_id} changed since its model state was saved")
+            continue
+        states[row.quote_currency_id] = state
+    return states
+
+
+async def update_model_state(
+    db: AsyncSession,
+    base_currency_id: int,
+    quote_currency_id: int,
+    state: PairModelState,
+    window_start: datetime
+) -> Optional[str]:
+    """
+    Update a pair's model state from the daily closes after it, unless a full refit is due.
+    
+    Args:
+        db: Database session
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+        state: Stored model state
+        window_start: Start of the prediction window
+        
+    Returns:
+        None if the state was updated, otherwise why the pair needs a full refit
+    """
+    if (datetime.utcnow() - state.refitted_at).total_seconds() >= settings.PREDICTION_FULL_REFIT_INTERVAL:
+        return "scheduled refit"
+    
+    # From the state's own window start, so the closes leaving the window can be taken out
+    window = await rate_repository.get_range(
+        db, base_currency_id, quote_currency_id, "1d", from_epoch(state.window_start)
+    )
+    if not len(window):
+        return "no history"
+    return state.update(
+        window.timestamps, window.rates, int(to_epoch([window_start])[0]),
+        settings.PREDICTION_DRIFT_THRESHOLD
+    )
+
+
+async def save_model_state(
+    db: AsyncSession,
+    base_currency_id: int,
+    quote_currency_id: int,
+    state: PairModelState
+) -> None:
+    """
+    Store a pair's model state. The caller is responsible for committing.
+    
+    Args:
+        db: Database session
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+        state: Model state
+    """
+    await db.merge(PredictionModelState(
+        base_currency_id=base_currency_id,
+        quote_currency_id=quote_currency_id,
+        watermark=from_epoch(state.last_timestamp),
+        ar_coefficient=state.ar_coefficient,
+        residual_variance=state.residual_variance,
+        ewma=state.ewma,
+        state=state.to_dict(),
+        refitted_at=state.refitted_at,
+        updated_at=datetime.utcnow()
+    ))
+
+
+async def store_trend_forecasts(
+    db: AsyncSession,
+    base_currency: Currency,
+    quote_currencies: List[Currency]
+) -> None:
+    """
+    Precompute the trend analysis forecasts of every FORECAST_TREND_WINDOWS window.
+    
+    Args:
+        db: Database session
+        base_currency: Base currency
+        quote_currencies: Quote currencies to forecast
+    """
+    for days in settings.FORECAST_TREND_WINDOWS:
+        resolution = choose_resolution(days)
+        model = trend_model_name(resolution, days)
+        
+        windows = []
+        for quote_currency in quote_currencies:
+            window = await rate_repository.get_window(db, base_currency.id, quote_currency.id, resolution, days)
+            if len(window):
+                windows.append((quote_currency, window))
+        if not windows:
+            continue
+        
+        # Trend lines are one vectorized pass, cheap enough to fit on the loop
+        fitted = predict_trend_rates_batch([window for _, window in windows])
+        for (quote_currency, window), forecasts in zip(windows, fitted):
+            await forecast_cache.store(
+                db, base_currency.id, quote_currency.id, model,
+                from_epoch(window.timestamps[-1]), forecasts
+            )
+        await db.commit()
+        logger.info(f"Stored {model} forecasts for {len(windows)} pairs")
+
+
 async def run_prediction_analysis() -> None:
     """
     Run prediction analysis on all active currency pairs and generate alerts.
@@ -459,7 +428,7 @@ async def run_prediction_analysis() -> None:
     """
     logger.info("Starting prediction analysis run")
     
-    async for db in get_db_session():
+    async with AsyncSessionLocal() as db:
         try:
             # Get all active currencies
             currencies_query = select(Currency).where(Currency.is_active == True)
@@ -476,42 +445,67 @@ async def run_prediction_analysis() -> None:
                 logger.warning("NGN currency not found")
                 return
             
-            # Run analysis for each currency pair with NGN as base
+            window_start = bucket_start(
+                datetime.utcnow() - timedelta(days=settings.PREDICTION_WINDOW_DAYS), "1d"
+            )
+            # Model state covers the native models only; the reference backend refits every run
+            incremental = settings.PREDICTION_ARIMA_BACKEND == "native"
+            states = await load_model_states(db, ngn_currency.id) if incremental else {}
+            
+            # Bring stored model states up to date from the new daily closes; one forecast step is one day
+            updated = []
+            refits = []
             for quote_currency in currencies:
                 # Skip NGN to NGN
                 if quote_currency.id == ngn_currency.id:
                     continue
                 
-                # Get historical rates
-                historical_rates = await get_historical_rates(
-                    db=db,
-                    base_currency_id=ngn_currency.id,
-                    quote_currency_id=quote_currency.id,
-                    days=settings.PREDICTION_WINDOW_DAYS
+                state = states.get(quote_currency.id)
+                if state is not None:
+                    reason = await update_model_state(db, ngn_currency.id, quote_currency.id, state, window_start)
+                    if reason is None:
+                        updated.append((quote_currency, state))
+                        continue
+                    logger.info(f"Refitting NGN/{quote_currency.code} from scratch: {reason}")
+                
+                window = await rate_repository.get_range(
+                    db, ngn_currency.id, quote_currency.id, "1d", window_start
                 )
                 
-                if not historical_rates:
+                if not len(window):
                     logger.warning(f"No historical rates for NGN/{quote_currency.code}")
                     continue
                 
-                # Calculate statistics
-                stats = calculate_statistics(historical_rates)
-                
-                # Make predictions
-                predictions = predict_future_rates(
-                    rates=historical_rates,
-                    days_ahead=settings.PREDICTION_HORIZON_DAYS
-                )
-                
-                # Calculate optimal thresholds
-                thresholds = calculate_optimal_thresholds(
-                    rates=historical_rates,
-                    statistics=stats,
-                    predictions=predictions
+                # Copy out of the repository's arrays, which later catch-ups may rewrite
+                refits.append((quote_currency, window.timestamps.copy(), window.rates.copy()))
+            
+            # Fit the pairs that need a full refit in parallel worker processes
+            started = time.perf_counter()
+            series = [(timestamps, rates) for _, timestamps, rates in refits]
+            results = []
+            if incremental:
+                fitted = await map_in_pool(fit_model_states, series, datetime.utcnow())
+                updated.extend(
+                    (quote_currency, state)
+                    for (quote_currency, _, _), state in zip(refits, fitted)
+                    if state is not None
                 )
-                
+                for quote_currency, state in updated:
+                    results.append((quote_currency, state.last_timestamp, state.latest, state,
+                                    analyze_state(state, settings.PREDICTION_HORIZON_DAYS)))
+            else:
+                analyses = await map_in_pool(analyze_pairs, series, settings.PREDICTION_HORIZON_DAYS)
+                for (quote_currency, timestamps, rates), analysis in zip(refits, analyses):
+                    if analysis is not None:
+                        results.append((quote_currency, int(timestamps[-1]), float(rates[-1]), None, analysis))
+            logger.info(
+                f"Fitted prediction models for {len(results)} pairs ({len(refits)} full refits) "
+                f"in {time.perf_counter() - started:.2f} seconds"
+            )
+            
+            # Write alerts, forecasts and model state back on the loop
+            for quote_currency, last_timestamp, current_rate, state, (stats, predictions, thresholds) in results:
                 # Generate alerts from predictions
-                current_rate = historical_rates[0]["rate"] if historical_rates else 0
                 await generate_alerts_from_predictions(
                     db=db,
                     base_currency_id=ngn_currency.id,
@@ -520,8 +514,19 @@ async def run_prediction_analysis() -> None:
                     thresholds=thresholds
                 )
                 
+                # Keep the forecasts for the API and the state for the next run
+                await forecast_cache.store(
+                    db, ngn_currency.id, quote_currency.id, ENSEMBLE_MODEL,
+                    from_epoch(last_timestamp), predictions
+                )
+                if state is not None:
+                    await save_model_state(db, ngn_currency.id, quote_currency.id, state)
+                await db.commit()
+                
                 logger.info(f"Completed prediction analysis for NGN/{quote_currency.code}")
             
+            await store_trend_forecasts(db, ngn_currency, [result[0] for result in results])
+            
             logger.info("Prediction analysis run completed")
         except Exception as e:
             logger.error(f"Error in prediction analysis: {e}")
@@ -534,7 +539,7 @@ async def check_alerts() -> None:
     """
     logger.info("Starting alert check run")
     
-    async for db in get_db_session():
+    async with AsyncSessionLocal() as db:
         try:
             await check_and_notify_triggered_alerts(db)
             logger.info("Alert check run completed")
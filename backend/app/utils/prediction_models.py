@@ -0,0 +1,432 @@
+"""
+Exchange rate prediction models.
+This module holds the CPU-bound part of the prediction job: statistics, forecasts
+and alert thresholds for pair histories. It has no database or I/O
+dependencies, so run_prediction_analysis can run it in worker processes.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.arima import MIN_ARIMA_POINTS, forecast_ar1_differences, forecast_arima
+from app.utils.model_state import PairModelState
+from app.utils.rate_window import RateWindow, from_epoch
+from app.utils.trend import fit_linear_trends
+
+logger = logging.getLogger(__name__)
+
+# Model name of the combined regression/ARIMA forecasts of predict_future_rates
+ENSEMBLE_MODEL = "ensemble"
+
+# Days ahead the trend analysis forecasts
+TREND_HORIZONS = (7, 14, 30)
+
+
+def calculate_statistics(window: RateWindow) -> Dict[str, Any]:
+    """
+    Calculate statistical metrics for a series of exchange rates.
+    
+    Args:
+        window: Rate history window, oldest first
+        
+    Returns:
+        Dictionary of statistical metrics
+    """
+    return calculate_statistics_batch([window])[0]
+
+
+def calculate_statistics_batch(windows: Sequence[RateWindow]) -> List[Dict[str, Any]]:
+    """
+    Calculate statistical metrics of several pairs, fitting their trends in one batch.
+    
+    Args:
+        windows: Rate history windows, oldest first
+        
+    Returns:
+        List of statistics per window, as returned by calculate_statistics
+    """
+    # Trend lines over elapsed days for every non-empty window at once
+    slopes = np.zeros(len(windows))
+    fitted = [row for row, window in enumerate(windows) if len(window)]
+    if fitted:
+        trends = fit_linear_trends([windows[row].days for row in fitted], [windows[row].rates for row in fitted])
+        slopes[fitted] = trends.slope
+    return [
+        _window_statistics(window, float(slopes[row]))
+        for row, window in enumerate(windows)
+    ]
+
+
+def _window_statistics(window: RateWindow, slope: float) -> Dict[str, Any]:
+    """
+    Calculate statistical metrics of a window given its fitted trend slope.
+    
+    Args:
+        window: Rate history window, oldest first
+        slope: Least squares slope of the rates per day
+        
+    Returns:
+        Dictionary of statistical metrics
+    """
+    if not len(window):
+        return {
+            "mean": None,
+            "median": None,
+            "std_dev": None,
+            "min": None,
+            "max": None,
+            "volatility": None,
+            "trend": None
+        }
+    
+    rate_values = window.rates
+    
+    # Calculate statistics
+    mean_rate = float(np.mean(rate_values))
+    median_rate = float(np.median(rate_values))
+    std_dev = float(np.std(rate_values))
+    min_rate = float(rate_values.min())
+    max_rate = float(rate_values.max())
+    
+    # Calculate volatility (coefficient of variation)
+    volatility = std_dev / mean_rate if mean_rate > 0 else 0
+    
+    # Normalize the trend slope as percentage change per day
+    trend = slope / mean_rate * 100 if mean_rate else 0
+    
+    return {
+        "mean": mean_rate,
+        "median": median_rate,
+        "std_dev": std_dev,
+        "min": min_rate,
+        "max": max_rate,
+        "volatility": volatility,
+        "trend": trend  # Percentage change per day
+    }
+
+
+def predict_future_rates(
+    window: RateWindow, 
+    days_ahead: int = 7
+) -> List[Dict[str, Any]]:
+    """
+    Predict future exchange rates using various algorithms.
+    
+    Args:
+        window: Rate history window, oldest first
+        days_ahead: Number of days to predict ahead
+        
+    Returns:
+        List of predicted rate values with confidence intervals
+    """
+    return predict_future_rates_batch([window], days_ahead)[0]
+
+
+def predict_future_rates_batch(
+    windows: Sequence[RateWindow],
+    days_ahead: int = 7
+) -> List[List[Dict[str, Any]]]:
+    """
+    Predict future exchange rates of several pairs, fitting their ARIMA models in one batch.
+    
+    Args:
+        windows: Rate history windows, oldest first
+        days_ahead: Number of days to predict ahead
+        
+    Returns:
+        List of predictions per window, as returned by predict_future_rates
+    """
+    # Linear regression on the time index for every window at once
+    trends = fit_linear_trends(
+        [np.arange(len(window), dtype=np.float64) for window in windows],
+        [window.rates for window in windows]
+    )
+    future_time_indices = np.array([
+        np.arange(len(window), len(window) + days_ahead) for window in windows
+    ]).reshape(len(windows), days_ahead)
+    future_rates_lr = trends.predict(future_time_indices)
+    
+    # ARIMA(1,1,0) for every window with enough data at once
+    future_rates_arima, _, _ = forecast_arima(
+        [window.rates for window in windows],
+        days_ahead,
+        backend=settings.PREDICTION_ARIMA_BACKEND
+    )
+    
+    return [
+        _combine_predictions(
+            int(window.timestamps[-1]), float(np.std(window.rates, ddof=1)), days_ahead,
+            future_rates_lr[row], future_rates_arima[row]
+        ) if len(window) >= 5 else []
+        for row, window in enumerate(windows)
+    ]
+
+
+def _combine_predictions(
+    last_timestamp: int,
+    std_dev: float,
+    days_ahead: int,
+    future_rates_lr: np.ndarray,
+    future_rates_arima: np.ndarray
+) -> List[Dict[str, Any]]:
+    """
+    Combine a window's linear regression forecast with its ARIMA forecast.
+    
+    Args:
+        last_timestamp: Epoch seconds of the window's newest point
+        std_dev: Sample standard deviation of the window's rates
+        days_ahead: Number of days to predict ahead
+        future_rates_lr: Linear regression forecast
+        future_rates_arima: ARIMA forecast, NaN if the window was too short to fit
+        
+    Returns:
+        List of predicted rate values with confidence intervals
+    """
+    # Fall back to linear regression where ARIMA could not be fitted
+    if np.isnan(future_rates_arima).any():
+        future_rates_arima = future_rates_lr
+    
+    # Average predictions from different models for robustness
+    future_rates = (future_rates_lr + future_rates_arima) / 2
+    
+    # Calculate prediction error bounds (simple approach)
+    error_margin = std_dev * 1.96  # 95% confidence interval assuming normal distribution
+    
+    # Generate dates for predictions
+    last_date = from_epoch(last_timestamp)
+    future_dates = [last_date + timedelta(days=i+1) for i in range(days_ahead)]
+    
+    # Prepare prediction results
+    predictions = []
+    for i in range(days_ahead):
+        predictions.append({
+            "horizon_days": i + 1,
+            "date": future_dates[i],
+            "predicted_rate": float(future_rates[i]),
+            "lower_bound": float(max(0, future_rates[i] - error_margin)),
+            "upper_bound": float(future_rates[i] + error_margin),
+            "confidence": 0.95  # 95% confidence interval
+        })
+    
+    return predictions
+
+
+def trend_model_name(resolution: str, days: int) -> str:
+    """
+    Get the model name of trend forecasts fitted on a window.
+    
+    Args:
+        resolution: Resolution of the window
+        days: Window length in days
+        
+    Returns:
+        Model name, e.g. "trend_1h_30d"
+    """
+    return f"trend_{resolution}_{days}d"
+
+
+def predict_trend_rates_batch(
+    windows: Sequence[RateWindow],
+    horizons: Sequence[int] = TREND_HORIZONS
+) -> List[List[Dict[str, Any]]]:
+    """
+    Extrapolate the least squares trend line of several pairs, fitted in one batch.
+    
+    Args:
+        windows: Non-empty rate history windows, oldest first
+        horizons: Days ahead of the last point to forecast
+        
+    Returns:
+        List of forecasts per window, in the format of predict_future_rates without bounds
+    """
+    trends = fit_linear_trends([window.days for window in windows], [window.rates for window in windows])
+    future_x = np.array([
+        [window.days[-1] + horizon for horizon in horizons] for window in windows
+    ]).reshape(len(windows), len(horizons))
+    future_rates = trends.predict(future_x)
+    
+    results = []
+    for row, window in enumerate(windows):
+        last_date = from_epoch(window.timestamps[-1])
+        results.append([
+            {
+                "horizon_days": horizon,
+                "date": last_date + timedelta(days=horizon),
+                "predicted_rate": float(future_rates[row, i]),
+                "lower_bound": None,
+                "upper_bound": None,
+                "confidence": None
+            }
+            for i, horizon in enumerate(horizons)
+        ])
+    return results
+
+
+def calculate_optimal_thresholds(
+    window: RateWindow, 
+    statistics: Dict[str, Any], 
+    predictions: List[Dict[str, Any]]
+) -> Dict[str, float]:
+    """
+    Calculate optimal thresholds for buy/sell alerts.
+    
+    Args:
+        window: Rate history window, oldest first
+        statistics: Statistical metrics
+        predictions: Future rate predictions
+        
+    Returns:
+        Dictionary with buy and sell thresholds
+    """
+    return _thresholds(window.latest, statistics, predictions)
+
+
+def _thresholds(
+    current_rate: Optional[float],
+    statistics: Dict[str, Any],
+    predictions: List[Dict[str, Any]]
+) -> Dict[str, float]:
+    """
+    Calculate optimal thresholds for buy/sell alerts around the current rate.
+    
+    Args:
+        current_rate: Newest rate, None without history
+        statistics: Statistical metrics
+        predictions: Future rate predictions
+        
+    Returns:
+        Dictionary with buy and sell thresholds
+    """
+    if current_rate is None:
+        return {"buy_threshold": 0, "sell_threshold": 0}
+    
+    # Extract statistical measures
+    mean = statistics["mean"]
+    std_dev = statistics["std_dev"]
+    trend = statistics["trend"]
+    
+    # Default thresholds based on statistical measures
+    default_buy_threshold = mean - std_dev  # Buy when rate is lower than average (good for buying foreign currency)
+    default_sell_threshold = mean + std_dev  # Sell when rate is higher than average
+    
+    # Adjust thresholds based on trend
+    trend_adjustment = trend * 5  # Scale trend impact
+    
+    buy_threshold = default_buy_threshold * (1 - trend_adjustment/100)  # Lower buy threshold if downward trend
+    sell_threshold = default_sell_threshold * (1 + trend_adjustment/100)  # Raise sell threshold if upward trend
+    
+    # Consider predictions
+    if predictions:
+        # Calculate average predicted rate
+        avg_predicted_rate = sum(p["predicted_rate"] for p in predictions) / len(predictions)
+        
+        # If prediction shows significant change, adjust thresholds
+        predicted_change = (avg_predicted_rate - current_rate) / current_rate
+        if abs(predicted_change) > 0.02:  # 2% change threshold
+            # Adjust buy/sell thresholds based on predicted direction
+            if predicted_change < 0:  # Predicted to decrease
+                buy_threshold = avg_predicted_rate * 1.01  # Buy slightly above predicted low
+            else:  # Predicted to increase
+                sell_threshold = avg_predicted_rate * 0.99  # Sell slightly below predicted high
+    
+    return {
+        "buy_threshold": max(0, buy_threshold),  # Ensure non-negative
+        "sell_threshold": max(buy_threshold, sell_threshold)  # Ensure sell > buy
+    }
+
+
+def analyze_pairs(
+    series: Sequence[Tuple[np.ndarray, np.ndarray]],
+    days_ahead: int
+) -> List[Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, float]]]:
+    """
+    Fit the prediction models to several pairs' histories, batching their ARIMA fits.
+    Runs in a worker process, so it takes and returns only picklable values.
+    
+    Args:
+        series: (epoch seconds, rates) arrays per pair, oldest first
+        days_ahead: Number of days to predict ahead
+        
+    Returns:
+        List of (statistics, predictions, thresholds) per pair
+    """
+    windows = [RateWindow(timestamps, rates) for timestamps, rates in series]
+    all_statistics = calculate_statistics_batch(windows)
+    all_predictions = predict_future_rates_batch(windows, days_ahead)
+    results = []
+    for window, stats, predictions in zip(windows, all_statistics, all_predictions):
+        thresholds = calculate_optimal_thresholds(
+            window=window,
+            statistics=stats,
+            predictions=predictions
+        )
+        results.append((stats, predictions, thresholds))
+    return results
+
+
+def fit_model_states(
+    series: Sequence[Tuple[np.ndarray, np.ndarray]],
+    refitted_at: datetime
+) -> List[PairModelState]:
+    """
+    Fit the model state of several pairs' daily windows from scratch.
+    Runs in a worker process, so it takes and returns only picklable values.
+    
+    Args:
+        series: (epoch seconds, daily closes) arrays per pair, oldest first
+        refitted_at: Time of the refit
+        
+    Returns:
+        Model state per pair
+    """
+    return [PairModelState.fit(timestamps, rates, refitted_at) for timestamps, rates in series]
+
+
+def analyze_state(
+    state: PairModelState,
+    days_ahead: int
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, float]]:
+    """
+    Get statistics, predictions and thresholds from a pair's model state.
+    
+    Gives the same predictions as analyze_pairs with the native ARIMA backend on the
+    state's window, in time independent of the window length. Statistics that need
+    the individual rates (median, min, max) are not available.
+    
+    Args:
+        state: Model state of the pair's daily window
+        days_ahead: Number of days to predict ahead
+        
+    Returns:
+        Tuple of (statistics, predictions, thresholds)
+    """
+    mean_rate = state.mean
+    std_dev = float(np.sqrt(state.variance()))
+    stats = {
+        "mean": mean_rate,
+        "std_dev": std_dev,
+        "volatility": std_dev / mean_rate if mean_rate > 0 else 0,
+        "trend": state.slope_per_day / mean_rate * 100 if mean_rate else 0,  # Percentage change per day
+        "ewma": state.ewma
+    }
+    
+    predictions = []
+    if state.count >= 5:
+        future_rates_lr = state.predict_index(days_ahead)
+        if state.count >= MIN_ARIMA_POINTS:
+            future_rates_arima, _, _ = forecast_ar1_differences(
+                np.array([state.ar_coefficient]), np.array([state.residual_variance]),
+                np.array([state.latest]), np.array([state.last_diff]), days_ahead
+            )
+            future_rates_arima = future_rates_arima[0]
+        else:
+            future_rates_arima = future_rates_lr
+        predictions = _combine_predictions(
+            state.last_timestamp, float(np.sqrt(state.variance(ddof=1))), days_ahead,
+            future_rates_lr, future_rates_arima
+        )
+    
+    return stats, predictions, _thresholds(state.latest, stats, predictions)
@@ -0,0 +1,157 @@
+"""
+Exchange rate provider HTTP clients.
+This module keeps one long-lived, pooled HTTP client per rate provider so that
+repeated fetches reuse keep-alive connections instead of paying a new TCP and
+TLS handshake on every call.
+"""
+import importlib.util
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional "h2" package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ProviderClientManager:
+    """
+    Owns a pooled httpx.AsyncClient per provider for the life of the application.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """
+        Create a client configured from the provider HTTP settings.
+
+        Returns:
+            New httpx.AsyncClient
+        """
+        limits = httpx.Limits(
+            max_connections=settings.PROVIDER_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PROVIDER_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.PROVIDER_HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            settings.PROVIDER_HTTP_TIMEOUT,
+            connect=settings.PROVIDER_HTTP_CONNECT_TIMEOUT,
+        )
+        return httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            http2=settings.PROVIDER_HTTP2_ENABLED and HTTP2_AVAILABLE,
+        )
+
+    def _make_trace(self, provider: str):
+        """
+        Build an httpcore trace callback that counts handshakes for a provider.
+
+        Args:
+            provider: Provider name
+
+        Returns:
+            Async trace callback suitable for the "trace" request extension
+        """
+        stats = self._stats[provider]
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                stats["tcp_connects"] += 1
+            elif event_name == "connection.start_tls.complete":
+                stats["tls_handshakes"] += 1
+
+        return trace
+
+    async def start(self, providers: Optional[list] = None) -> None:
+        """
+        Open clients for the given providers.
+
+        Args:
+            providers: Provider names to open eagerly (others are opened on first use)
+        """
+        for provider in providers or []:
+            self.get(provider)
+        logger.info(
+            f"Provider HTTP clients started (http2={settings.PROVIDER_HTTP2_ENABLED and HTTP2_AVAILABLE})"
+        )
+
+    async def close(self) -> None:
+        """
+        Close all provider clients and release their connections.
+        """
+        for provider, client in self._clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing HTTP client for {provider}: {e}")
+        self._clients.clear()
+        logger.info("Provider HTTP clients closed")
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """
+        Get the shared client for a provider, creating it if needed.
+
+        Args:
+            provider: Provider name
+
+        Returns:
+            Shared httpx.AsyncClient for the provider
+        """
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._build_client()
+            self._clients[provider] = client
+            self._stats.setdefault(provider, {
+                "requests": 0,
+                "tcp_connects": 0,
+                "tls_handshakes": 0,
+            })
+        return client
+
+    async def request(self, provider: str, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        Issue a GET request through the provider's shared client.
+
+        Args:
+            provider: Provider name
+            url: URL to fetch
+            **kwargs: Extra arguments passed to httpx.AsyncClient.get
+
+        Returns:
+            HTTP response
+        """
+        client = self.get(provider)
+        self._stats[provider]["requests"] += 1
+        extensions = kwargs.pop("extensions", {})
+        extensions["trace"] = self._make_trace(provider)
+        return await client.get(url, extensions=extensions, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get connection reuse statistics per provider.
+
+        Returns:
+            Dictionary of provider name to request, handshake and reuse counts
+        """
+        stats = {}
+        for provider, counts in self._stats.items():
+            requests = counts["requests"]
+            reused = max(0, requests - counts["tcp_connects"])
+            stats[provider] = {
+                **counts,
+                "reused_connections": reused,
+                "reuse_ratio": reused / requests if requests else 0.0,
+                "is_open": provider in self._clients and not self._clients[provider].is_closed,
+            }
+        return stats
+
+
+# Process-wide client manager, opened and closed by the application event handlers
+provider_clients = ProviderClientManager()
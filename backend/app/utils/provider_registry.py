@@ -0,0 +1,235 @@
+"""
+Exchange rate provider health registry.
+This module tracks rolling latency, error rate and quota exhaustion per provider,
+ranks providers by health and guards each one with a circuit breaker.
+"""
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker states
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """
+    Rolling health statistics and circuit breaker state for one provider.
+    """
+
+    def __init__(self, name: str, priority: int, window: int) -> None:
+        self.name = name
+        self.priority = priority  # Position in the default provider order, used as a tie-breaker
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)  # (latency, succeeded)
+        self.last_sample_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.state = CIRCUIT_CLOSED
+        self.opened_at: Optional[float] = None
+        self.quota_reset_at: Optional[float] = None
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of failed fetches in the rolling window."""
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    @property
+    def avg_latency(self) -> Optional[float]:
+        """Mean fetch latency in the rolling window, in seconds."""
+        if not self.samples:
+            return None
+        return sum(latency for latency, _ in self.samples) / len(self.samples)
+
+    @property
+    def score(self) -> float:
+        """
+        Expected time to obtain a successful response (lower is healthier).
+
+        Providers without samples score 0 so they are tried and measured.
+        """
+        if not self.samples:
+            return 0.0
+        success_rate = max(1.0 - self.error_rate, 0.05)
+        return self.avg_latency / success_rate
+
+
+class ProviderRegistry:
+    """
+    Ranks rate providers by rolling health and applies circuit breakers.
+
+    A provider's circuit opens after PROVIDER_CIRCUIT_FAILURE_THRESHOLD consecutive
+    failures. Once PROVIDER_CIRCUIT_COOLDOWN seconds pass, the circuit goes half-open
+    and the provider is offered as a single probe: success closes the circuit,
+    failure re-opens it. Providers that report quota exhaustion are skipped until
+    their quota resets.
+    """
+
+    def __init__(self) -> None:
+        self._providers: Dict[str, ProviderHealth] = {}
+
+    def register(self, names: List[str]) -> None:
+        """
+        Register providers in their default priority order.
+
+        Args:
+            names: Provider names
+        """
+        for name in names:
+            if name not in self._providers:
+                self._providers[name] = ProviderHealth(
+                    name, len(self._providers), settings.PROVIDER_HEALTH_WINDOW
+                )
+
+    def _health(self, name: str) -> ProviderHealth:
+        if name not in self._providers:
+            self.register([name])
+        return self._providers[name]
+
+    def rank(self) -> List[str]:
+        """
+        Get the providers to try, healthiest first.
+
+        Open circuits, outstanding probes and quota-exhausted providers are left out.
+        Open circuits whose cooldown has elapsed are appended as recovery probes.
+
+        Returns:
+            Provider names in the order they should be tried
+        """
+        now = time.monotonic()
+        available = []
+        probes = []
+
+        for health in self._providers.values():
+            if health.quota_reset_at is not None:
+                if now < health.quota_reset_at:
+                    continue
+                health.quota_reset_at = None
+
+            if health.state == CIRCUIT_CLOSED:
+                # Forget stale samples so a demoted provider is measured again
+                if (
+                    health.last_sample_at is not None
+                    and now - health.last_sample_at > settings.PROVIDER_HEALTH_STALE_AFTER
+                ):
+                    health.samples.clear()
+                available.append(health)
+            elif (
+                health.state == CIRCUIT_OPEN
+                and now - health.opened_at >= settings.PROVIDER_CIRCUIT_COOLDOWN
+            ):
+                probes.append(health)
+
+        available.sort(key=lambda h: (h.score, h.priority))
+        probes.sort(key=lambda h: h.priority)
+        return [h.name for h in available + probes]
+
+    def record_attempt(self, name: str) -> None:
+        """
+        Record that a fetch is starting, moving an open circuit to half-open.
+
+        Args:
+            name: Provider name
+        """
+        health = self._health(name)
+        if health.state == CIRCUIT_OPEN:
+            health.state = CIRCUIT_HALF_OPEN
+            logger.info(f"Circuit for {name} is half-open, probing recovery")
+
+    def record_success(self, name: str, latency: float) -> None:
+        """
+        Record a successful fetch.
+
+        Args:
+            name: Provider name
+            latency: Fetch latency in seconds
+        """
+        health = self._health(name)
+        health.samples.append((latency, True))
+        health.last_sample_at = time.monotonic()
+        health.consecutive_failures = 0
+        if health.state != CIRCUIT_CLOSED:
+            logger.info(f"Circuit for {name} closed after successful probe")
+        health.state = CIRCUIT_CLOSED
+        health.opened_at = None
+
+    def record_failure(self, name: str, latency: float) -> None:
+        """
+        Record a failed fetch, opening the circuit if the provider keeps failing.
+
+        Args:
+            name: Provider name
+            latency: Fetch latency in seconds
+        """
+        health = self._health(name)
+        health.samples.append((latency, False))
+        health.last_sample_at = time.monotonic()
+        health.consecutive_failures += 1
+
+        if (
+            health.state == CIRCUIT_HALF_OPEN
+            or health.consecutive_failures >= settings.PROVIDER_CIRCUIT_FAILURE_THRESHOLD
+        ):
+            if health.state != CIRCUIT_OPEN:
+                logger.warning(
+                    f"Circuit for {name} opened after {health.consecutive_failures} consecutive failures"
+                )
+            health.state = CIRCUIT_OPEN
+            health.opened_at = time.monotonic()
+
+    def record_cancelled(self, name: str) -> None:
+        """
+        Record a fetch that was cancelled before completing.
+
+        A cancelled half-open probe leaves the circuit open so it is probed again.
+
+        Args:
+            name: Provider name
+        """
+        health = self._health(name)
+        if health.state == CIRCUIT_HALF_OPEN:
+            health.state = CIRCUIT_OPEN
+
+    def record_quota_exhausted(self, name: str, retry_after: Optional[float] = None) -> None:
+        """
+        Mark a provider's quota as exhausted so it is skipped until it resets.
+
+        Args:
+            name: Provider name
+            retry_after: Seconds until the quota resets, if the provider reported it
+        """
+        health = self._health(name)
+        cooldown = retry_after if retry_after else settings.PROVIDER_QUOTA_COOLDOWN
+        health.quota_reset_at = time.monotonic() + cooldown
+        logger.warning(f"Quota exhausted for {name}, skipping for {cooldown:.0f} seconds")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get health statistics per provider.
+
+        Returns:
+            Dictionary of provider name to circuit state, error rate, latency and score
+        """
+        now = time.monotonic()
+        return {
+            name: {
+                "state": health.state,
+                "samples": len(health.samples),
+                "error_rate": health.error_rate,
+                "avg_latency": health.avg_latency,
+                "score": health.score,
+                "consecutive_failures": health.consecutive_failures,
+                "quota_exhausted": health.quota_reset_at is not None and now < health.quota_reset_at,
+            }
+            for name, health in self._providers.items()
+        }
+
+
+# Process-wide provider registry
+provider_registry = ProviderRegistry()
@@ -0,0 +1,294 @@
+"""
+Process-local latest-rate cache.
+This module keeps the current_rates snapshot in memory so latest-rate reads do not
+hit the database. Ingest announces new rates with PostgreSQL NOTIFY and every
+process LISTENs on the same channel to reload its copy, so all uvicorn workers stay
+current without polling.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.currency import CurrentRate
+
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[int, int]
+
+
+async def notify_rates_changed(db: AsyncSession, since: datetime, timestamp: datetime, pairs: int) -> None:
+    """
+    Announce new latest rates to every listening process.
+
+    pg_notify is transactional, so listeners are only told once the caller commits.
+    Does nothing on databases other than PostgreSQL.
+
+    Args:
+        db: Database session holding the ingest transaction
+        since: Timestamp of the oldest tick written
+        timestamp: Provider timestamp of the newest rate written
+        pairs: Number of pairs updated
+    """
+    connection = await db.connection()
+    if connection.dialect.name != "postgresql":
+        return
+
+    payload = json.dumps({"since": since.isoformat(), "timestamp": timestamp.isoformat(), "pairs": pairs})
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": settings.RATE_CACHE_NOTIFY_CHANNEL, "payload": payload}
+    )
+
+
+class LatestRateCache:
+    """
+    In-memory copy of the current_rates snapshot keyed by (base_currency_id, quote_currency_id).
+
+    The snapshot is loaded on the first read and reloaded whenever a rate change is
+    announced on the notify channel or the local process invalidates it.
+    """
+
+    def __init__(self) -> None:
+        self._rates: Dict[Pair, Dict[str, Any]] = {}
+        self._loaded = False
+        self._generation = 0
+        self._load_lock = asyncio.Lock()
+        self._listen_task: Optional[asyncio.Task] = None
+        self._listening = False
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.notifications = 0
+        self.last_loaded_at: Optional[datetime] = None
+        self._subscribers: List[Callable[[Optional[datetime]], None]] = []
+
+    async def _load(self, db: AsyncSession) -> None:
+        """
+        Replace the cached snapshot with the one stored in the database.
+
+        Args:
+            db: Database session
+        """
+        async with self._load_lock:
+            if self.is_fresh:
+                return
+            generation = self._generation
+            result = await db.execute(select(
+                CurrentRate.base_currency_id,
+                CurrentRate.quote_currency_id,
+                CurrentRate.rate,
+                CurrentRate.source,
+                CurrentRate.timestamp
+            ))
+            # Built completely before being swapped in, so readers never see a partial snapshot
+            self._rates = {
+                (base_currency_id, quote_currency_id): {
+                    "rate": float(rate),
+                    "source": source,
+                    "timestamp": timestamp
+                }
+                for base_currency_id, quote_currency_id, rate, source, timestamp in result.all()
+            }
+            # An invalidation that arrived during the query means this copy may already be stale
+            self._loaded = generation == self._generation
+            self.reloads += 1
+            self.last_loaded_at = datetime.utcnow()
+
+    async def _ensure_loaded(self, db: AsyncSession) -> None:
+        """
+        Load the snapshot if it is not cached, counting the read as a hit or miss.
+
+        Args:
+            db: Database session
+        """
+        if self.is_fresh:
+            self.hits += 1
+            return
+        self.misses += 1
+        await self._load(db)
+
+    def invalidate(self, since: Optional[datetime] = None) -> None:
+        """
+        Drop the cached snapshot so the next read reloads it, and tell subscribers.
+
+        Args:
+            since: Timestamp of the oldest tick written, if known
+        """
+        self._generation += 1
+        self._loaded = False
+        for callback in self._subscribers:
+            callback(since)
+
+    def subscribe(self, callback: Callable[[Optional[datetime]], None]) -> None:
+        """
+        Register a callback run on every invalidation, local or notified.
+
+        Lets other in-process caches of rate history piggyback on the same
+        LISTEN/NOTIFY channel.
+
+        Args:
+            callback: Called with the timestamp of the oldest tick written, or None if unknown
+        """
+        self._subscribers.append(callback)
+
+    async def get(self, db: AsyncSession, base_currency_id: int, quote_currency_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the latest rate of a currency pair.
+
+        Args:
+            db: Database session used to fill the cache on a miss
+            base_currency_id: Base currency ID
+            quote_currency_id: Quote currency ID
+
+        Returns:
+            Dictionary with rate, source and timestamp, or None if the pair has no rate
+        """
+        await self._ensure_loaded(db)
+        return self._rates.get((base_currency_id, quote_currency_id))
+
+    async def get_all(self, db: AsyncSession) -> Dict[Pair, Dict[str, Any]]:
+        """
+        Get the latest rate of every pair.
+
+        Args:
+            db: Database session used to fill the cache on a miss
+
+        Returns:
+            Dictionary of (base_currency_id, quote_currency_id) to rate details
+        """
+        await self._ensure_loaded(db)
+        return self._rates
+
+    async def get_base(self, db: AsyncSession, base_currency_id: int) -> Dict[int, Dict[str, Any]]:
+        """
+        Get the latest rates of every pair with the given base currency.
+
+        Args:
+            db: Database session used to fill the cache on a miss
+            base_currency_id: Base currency ID
+
+        Returns:
+            Dictionary of quote currency ID to rate details
+        """
+        rates = await self.get_all(db)
+        return {
+            quote_currency_id: details
+            for (pair_base_id, quote_currency_id), details in rates.items()
+            if pair_base_id == base_currency_id
+        }
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        """
+        asyncpg listener callback for rate change announcements.
+        """
+        self.notifications += 1
+        try:
+            since = datetime.fromisoformat(json.loads(payload)["since"])
+        except (ValueError, KeyError, TypeError):
+            since = None
+        self.invalidate(since)
+        logger.debug(f"Latest-rate cache invalidated by notification: {payload}")
+
+    async def _listen(self, dsn: str) -> None:
+        """
+        Hold a LISTEN connection open, reconnecting whenever it is lost.
+
+        While the connection is down the cache is not trusted and every read
+        reloads from the database.
+
+        Args:
+            dsn: asyncpg connection string
+        """
+        channel = settings.RATE_CACHE_NOTIFY_CHANNEL
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                lost = asyncio.get_running_loop().create_future()
+                connection.add_termination_listener(
+                    lambda _: lost.done() or lost.set_result(None)
+                )
+                await connection.add_listener(channel, self._on_notification)
+                self._listening = True
+                # Changes may have been missed while not listening
+                self.invalidate()
+                logger.info(f"Latest-rate cache listening on channel {channel}")
+                await lost
+                logger.warning("Latest-rate cache LISTEN connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Latest-rate cache could not LISTEN on {channel}: {e}")
+            finally:
+                self._listening = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(settings.RATE_CACHE_RECONNECT_DELAY)
+
+    @property
+    def is_fresh(self) -> bool:
+        """True when the cached snapshot can be served without reloading."""
+        if not settings.RATE_CACHE_ENABLED or not self._loaded:
+            return False
+        # A started listener that is down may have missed notifications
+        return self._listen_task is None or self._listening
+
+    async def start(self) -> None:
+        """
+        Start listening for rate change notifications (PostgreSQL with asyncpg only).
+        """
+        if not settings.RATE_CACHE_ENABLED or self._listen_task is not None:
+            return
+
+        dsn = str(settings.DATABASE_URI)
+        if not dsn.startswith("postgresql+asyncpg://"):
+            logger.info("Latest-rate cache notifications need PostgreSQL with asyncpg, relying on local invalidation")
+            return
+
+        self._listen_task = asyncio.create_task(
+            self._listen(dsn.replace("postgresql+asyncpg://", "postgresql://", 1))
+        )
+
+    async def stop(self) -> None:
+        """
+        Stop listening for notifications.
+        """
+        if self._listen_task is None:
+            return
+        self._listen_task.cancel()
+        try:
+            await self._listen_task
+        except asyncio.CancelledError:
+            pass
+        self._listen_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Hit/miss counters, reload and notification counts and listener state
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.RATE_CACHE_ENABLED,
+            "pairs": len(self._rates) if self._loaded else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "reloads": self.reloads,
+            "notifications": self.notifications,
+            "listening": self._listening,
+            "last_loaded_at": self.last_loaded_at,
+        }
+
+
+# Process-wide latest-rate cache
+latest_rates = LatestRateCache()
@@ -0,0 +1,337 @@
+"""
+Exchange rate candle rollups.
+This module maintains 1-hour and 1-day open/high/low/close candles per currency
+pair, updated incrementally from every batch of newly stored ticks, and reads
+them back for history and trend queries.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.currency import RateCandle
+
+logger = logging.getLogger(__name__)
+
+# Supported candle resolutions, finest first
+CANDLE_RESOLUTIONS = {
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+
+CANDLE_KEY = ["base_currency_id", "quote_currency_id", "resolution", "bucket_start"]
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """
+    Get the start of the candle bucket a timestamp falls in.
+
+    Args:
+        timestamp: Tick timestamp
+        resolution: Candle resolution
+
+    Returns:
+        Start of the bucket
+    """
+    if resolution == "1d":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def choose_resolution(days: int) -> str:
+    """
+    Pick the finest candle resolution that covers a window in at most CANDLE_MAX_POINTS rows.
+
+    Args:
+        days: Window length in days
+
+    Returns:
+        Candle resolution
+    """
+    window = timedelta(days=days)
+    for resolution, width in CANDLE_RESOLUTIONS.items():
+        if window / width <= settings.CANDLE_MAX_POINTS:
+            return resolution
+    return list(CANDLE_RESOLUTIONS)[-1]
+
+
+def aggregate_candles(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Roll exchange rate rows up into candles for every resolution.
+
+    Args:
+        rows: Rows with base_currency_id, quote_currency_id, rate and timestamp
+
+    Returns:
+        Candle rows keyed by column name
+    """
+    candles: Dict[Tuple[int, int, str, datetime], Dict[str, Any]] = {}
+    for row in rows:
+        rate = float(row["rate"])
+        timestamp = row["timestamp"]
+        for resolution in CANDLE_RESOLUTIONS:
+            key = (row["base_currency_id"], row["quote_currency_id"], resolution, bucket_start(timestamp, resolution))
+            candle = candles.get(key)
+            if candle is None:
+                candles[key] = {
+                    "base_currency_id": key[0],
+                    "quote_currency_id": key[1],
+                    "resolution": resolution,
+                    "bucket_start": key[3],
+                    "open": rate,
+                    "high": rate,
+                    "low": rate,
+                    "close": rate,
+                    "count": 1,
+                    "open_time": timestamp,
+                    "close_time": timestamp,
+                }
+                continue
+
+            candle["high"] = max(candle["high"], rate)
+            candle["low"] = min(candle["low"], rate)
+            candle["count"] += 1
+            if timestamp < candle["open_time"]:
+                candle["open"], candle["open_time"] = rate, timestamp
+            if timestamp >= candle["close_time"]:
+                candle["close"], candle["close_time"] = rate, timestamp
+    return list(candles.values())
+
+
+async def upsert_candles(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """
+    Fold newly stored exchange rate rows into the candle tables.
+
+    Only pass rows that were actually inserted, otherwise replayed ticks would be
+    counted twice. Rows may arrive out of order (e.g. backfills): the open and close
+    only move when a tick is earlier or later than the one that set them. The caller
+    is responsible for committing.
+
+    Args:
+        db: Database session
+        rows: Inserted exchange rate rows
+
+    Returns:
+        Number of candles written
+    """
+    return await merge_candles(db, aggregate_candles(rows), add_counts=True)
+
+
+def candle_changed(stored: Any, merged: Any) -> Any:
+    """
+    SQL condition that merging a candle changes the stored one without adding ticks.
+
+    Args:
+        stored: Stored candle columns
+        merged: Merged candle columns (the insert's excluded row)
+
+    Returns:
+        Boolean SQL expression
+    """
+    return or_(
+        merged.open_time < stored.open_time,
+        merged.close_time > stored.close_time,
+        and_(merged.close_time == stored.close_time, merged.close != stored.close),
+        merged.high > stored.high,
+        merged.low < stored.low,
+        merged.count > stored.count,
+    )
+
+
+async def merge_candles(db: AsyncSession, candles: List[Dict[str, Any]], add_counts: bool = False) -> int:
+    """
+    Merge candles into the stored ones.
+
+    The open and close only move when the merged candle opens earlier or closes later,
+    and the high and low widen. With add_counts the tick counts are summed, which suits
+    ticks the stored candle has not seen yet; otherwise the larger count is kept, so
+    merging candles rebuilt from ticks the stored candle already covers (e.g. during
+    compaction) is idempotent and never drops ticks that are no longer stored raw.
+    updated_at only moves when the stored candle changes, so it tells when the
+    history behind it was last rewritten (see candles_changed_since).
+    The caller is responsible for committing.
+
+    Args:
+        db: Database session
+        candles: Candle rows keyed by column name
+        add_counts: Whether the candles' ticks are new to the stored candles
+
+    Returns:
+        Number of candles written
+    """
+    if not candles:
+        return 0
+
+    now = datetime.utcnow()
+    for candle in candles:
+        candle["updated_at"] = now
+
+    connection = await db.connection()
+    dialect_name = connection.dialect.name
+    if dialect_name == "postgresql":
+        insert_factory, greatest, least = postgresql.insert, func.greatest, func.least
+    elif dialect_name == "sqlite":
+        insert_factory, greatest, least = sqlite.insert, func.max, func.min
+    else:
+        for candle in candles:
+            await merge_candle(db, candle, add_counts)
+        return len(candles)
+
+    batch_size = settings.RATE_INSERT_BATCH_SIZE
+    for start in range(0, len(candles), batch_size):
+        statement = insert_factory(RateCandle).values(candles[start:start + batch_size])
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=CANDLE_KEY,
+            set_={
+                # Every right-hand side sees the stored row as it was before the update
+                "open": case((excluded.open_time < RateCandle.open_time, excluded.open), else_=RateCandle.open),
+                "open_time": least(RateCandle.open_time, excluded.open_time),
+                "high": greatest(RateCandle.high, excluded.high),
+                "low": least(RateCandle.low, excluded.low),
+                "close": case((excluded.close_time >= RateCandle.close_time, excluded.close), else_=RateCandle.close),
+                "close_time": greatest(RateCandle.close_time, excluded.close_time),
+                "count": (
+                    RateCandle.count + excluded.count if add_counts
+                    else greatest(RateCandle.count, excluded.count)
+                ),
+                "updated_at": (
+                    excluded.updated_at if add_counts
+                    else case((candle_changed(RateCandle, excluded), excluded.updated_at), else_=RateCandle.updated_at)
+                ),
+            }
+        )
+        await db.execute(statement)
+    return len(candles)
+
+
+async def merge_candle(db: AsyncSession, candle: Dict[str, Any], add_counts: bool = True) -> None:
+    """
+    Merge one candle into the stored one through the ORM (databases without ON CONFLICT).
+
+    Args:
+        db: Database session
+        candle: Candle row keyed by column name
+        add_counts: Whether the candle's ticks are new to the stored candle
+    """
+    stored = await db.get(RateCandle, tuple(candle[column] for column in CANDLE_KEY))
+    if stored is None:
+        db.add(RateCandle(**candle))
+        return
+
+    changed = add_counts or (
+        candle["open_time"] < stored.open_time
+        or candle["close_time"] > stored.close_time
+        or (candle["close_time"] == stored.close_time and candle["close"] != float(stored.close))
+        or candle["high"] > float(stored.high)
+        or candle["low"] < float(stored.low)
+        or candle["count"] > stored.count
+    )
+    if candle["open_time"] < stored.open_time:
+        stored.open, stored.open_time = candle["open"], candle["open_time"]
+    if candle["close_time"] >= stored.close_time:
+        stored.close, stored.close_time = candle["close"], candle["close_time"]
+    stored.high = max(float(stored.high), candle["high"])
+    stored.low = min(float(stored.low), candle["low"])
+    stored.count = stored.count + candle["count"] if add_counts else max(stored.count, candle["count"])
+    if changed:
+        stored.updated_at = candle["updated_at"]
+
+
+async def get_candles(
+    db: AsyncSession,
+    base_currency_id: int,
+    quote_currency_id: int,
+    resolution: str,
+    start: datetime,
+    end: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Get the candles of a currency pair in a time window, oldest first.
+
+    Args:
+        db: Database session
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+        resolution: Candle resolution
+        start: Window start (candles whose bucket starts before it are excluded)
+        end: Optional window end
+
+    Returns:
+        List of candles with bucket_start, open, high, low, close and count
+    """
+    query = select(
+        RateCandle.bucket_start,
+        RateCandle.open,
+        RateCandle.high,
+        RateCandle.low,
+        RateCandle.close,
+        RateCandle.count
+    ).where(
+        RateCandle.base_currency_id == base_currency_id,
+        RateCandle.quote_currency_id == quote_currency_id,
+        RateCandle.resolution == resolution,
+        RateCandle.bucket_start >= bucket_start(start, resolution)
+    )
+    if end is not None:
+        query = query.where(RateCandle.bucket_start <= end)
+
+    result = await db.execute(query.order_by(RateCandle.bucket_start))
+    return [
+        {
+            "bucket_start": bucket,
+            "open": float(open_rate),
+            "high": float(high),
+            "low": float(low),
+            "close": float(close),
+            "count": count
+        }
+        for bucket, open_rate, high, low, close, count in result.all()
+    ]
+
+
+async def candles_changed_since(
+    db: AsyncSession,
+    base_currency_id: int,
+    quote_currency_id: int,
+    resolution: str,
+    start: datetime,
+    end: datetime,
+    since: datetime
+) -> bool:
+    """
+    Check whether any of a pair's candles in [start, end) changed after a point in time.
+
+    Every candle write stamps updated_at, so this tells whether history a model was
+    fitted on has been rewritten since (e.g. by a backfill), whichever process wrote it.
+    Raw history is checked on the daily candles, which every stored tick updates.
+
+    Args:
+        db: Database session
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+        resolution: "raw", "1h" or "1d"
+        start: Range start
+        end: Range end (exclusive), e.g. the newest point the model took in
+        since: Time the model was fitted or saved
+
+    Returns:
+        True if a candle in the range was written after since
+    """
+    if resolution not in CANDLE_RESOLUTIONS:
+        resolution = "1d"
+    changed = await db.scalar(
+        select(RateCandle.bucket_start).where(
+            RateCandle.base_currency_id == base_currency_id,
+            RateCandle.quote_currency_id == quote_currency_id,
+            RateCandle.resolution == resolution,
+            RateCandle.bucket_start >= bucket_start(start, resolution),
+            RateCandle.bucket_start < end,
+            RateCandle.updated_at > since
+        ).limit(1)
+    )
+    return changed is not None
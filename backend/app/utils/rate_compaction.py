@@ -0,0 +1,235 @@
+"""
+Exchange rate compaction.
+Raw ticks are only needed at full granularity for recent history. This module
+folds ticks older than RATE_COMPACTION_AGE_DAYS into their daily candles and
+deletes them in bounded batches, so old history costs one candle per pair and day.
+Raw history reads (app.utils.rate_repository, history pages and exports) serve the
+compacted range from the daily candles.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Select, delete, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.currency import CurrentRate, ExchangeRate, RateCandle
+from app.utils.rate_candles import aggregate_candles, bucket_start, merge_candles
+
+logger = logging.getLogger(__name__)
+
+# Candle resolution compacted ticks are folded into
+COMPACTED_RESOLUTION = "1d"
+
+# Source reported for the candle closes that stand in for compacted ticks
+COMPACTED_SOURCE = f"candles:{COMPACTED_RESOLUTION}"
+
+
+def compaction_horizon() -> Optional[datetime]:
+    """
+    Get the day before which raw ticks are compacted.
+
+    Returns:
+        Start of the first day kept raw, or None if compaction is disabled
+    """
+    if settings.RATE_COMPACTION_AGE_DAYS <= 0:
+        return None
+    return bucket_start(datetime.utcnow() - timedelta(days=settings.RATE_COMPACTION_AGE_DAYS), COMPACTED_RESOLUTION)
+
+
+def split_at_horizon(
+    start: Optional[datetime],
+    end: Optional[datetime]
+) -> Tuple[Optional[Tuple[Optional[datetime], datetime]], Optional[Tuple[datetime, Optional[datetime]]]]:
+    """
+    Split a raw read of [start, end) into its compacted and its raw part.
+
+    Args:
+        start: Optional range start (inclusive)
+        end: Optional range end (exclusive)
+
+    Returns:
+        Tuple of (compacted range, raw range), either None when the read misses it
+    """
+    horizon = compaction_horizon()
+    if horizon is None or (start is not None and start >= horizon):
+        return None, (start, end)
+
+    compacted = (start, horizon if end is None else min(end, horizon))
+    if end is not None and end <= horizon:
+        return compacted, None
+    return compacted, (horizon, end)
+
+
+def compacted_rate_query(
+    base_currency_id: int,
+    quote_currency_id: int,
+    start: Optional[datetime],
+    end: datetime
+) -> Select:
+    """
+    Build a query for the daily candle closes standing in for a pair's compacted ticks.
+
+    Rows have the timestamp, rate and source columns of a raw tick query, so callers
+    can read them in place of ticks before the compaction horizon.
+
+    Args:
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+        start: Optional range start (inclusive)
+        end: Range end (exclusive)
+
+    Returns:
+        Unordered query of (timestamp, rate, source) rows
+    """
+    query = select(
+        RateCandle.bucket_start.label("timestamp"),
+        RateCandle.close.label("rate"),
+        literal(COMPACTED_SOURCE).label("source")
+    ).where(
+        RateCandle.base_currency_id == base_currency_id,
+        RateCandle.quote_currency_id == quote_currency_id,
+        RateCandle.resolution == COMPACTED_RESOLUTION,
+        RateCandle.bucket_start < end
+    )
+    if start is not None:
+        query = query.where(RateCandle.bucket_start >= start)
+    return query
+
+
+async def compact_batch(
+    db: AsyncSession,
+    base_currency_id: int,
+    quote_currency_id: int,
+    start: datetime,
+    horizon: datetime,
+    batch_size: int
+) -> Optional[Tuple[datetime, int, int]]:
+    """
+    Compact the next whole days of a pair's ticks, up to about batch_size rows.
+
+    The ticks of those days are merged into their daily candles before they are
+    deleted, in the same transaction. Merging rather than overwriting keeps whatever
+    the stored candle already folded in, e.g. ticks of a day that was compacted before
+    a backfill added to it. A single day with more than
+    batch_size ticks is compacted on its own. The caller is responsible for committing.
+
+    Args:
+        db: Database session
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+        start: Day to continue from
+        horizon: First day that is kept raw
+        batch_size: Rows per batch
+
+    Returns:
+        Tuple of (day to continue from, candles written, rows deleted), or None when nothing is left
+    """
+    pair = (
+        ExchangeRate.base_currency_id == base_currency_id,
+        ExchangeRate.quote_currency_id == quote_currency_id,
+    )
+    result = await db.execute(
+        select(ExchangeRate.rate, ExchangeRate.timestamp).where(
+            *pair, ExchangeRate.timestamp >= start, ExchangeRate.timestamp < horizon
+        ).order_by(ExchangeRate.timestamp).limit(batch_size + 1)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+
+    first_day = bucket_start(rows[0].timestamp, COMPACTED_RESOLUTION)
+    if len(rows) <= batch_size:
+        end = horizon
+    else:
+        # Stop before the day the batch was cut in, so every day is compacted whole
+        end = bucket_start(rows[-1].timestamp, COMPACTED_RESOLUTION)
+        rows = [row for row in rows if row.timestamp < end]
+        if end == first_day:
+            end = first_day + timedelta(days=1)
+            result = await db.execute(
+                select(ExchangeRate.rate, ExchangeRate.timestamp).where(
+                    *pair, ExchangeRate.timestamp >= first_day, ExchangeRate.timestamp < end
+                )
+            )
+            rows = result.all()
+
+    candles = [
+        candle for candle in aggregate_candles([
+            {
+                "base_currency_id": base_currency_id,
+                "quote_currency_id": quote_currency_id,
+                "rate": row.rate,
+                "timestamp": row.timestamp,
+            }
+            for row in rows
+        ])
+        if candle["resolution"] == COMPACTED_RESOLUTION
+    ]
+    written = await merge_candles(db, candles)
+
+    result = await db.execute(
+        delete(ExchangeRate).where(
+            *pair, ExchangeRate.timestamp >= first_day, ExchangeRate.timestamp < end
+        )
+    )
+    return end, written, result.rowcount
+
+
+async def compact_rates() -> Dict[str, Any]:
+    """
+    Compact every pair's ticks older than the compaction horizon.
+    This function is designed to be called periodically.
+
+    Each batch is its own short transaction, so locks are only ever held on about
+    RATE_COMPACTION_BATCH_SIZE rows.
+
+    Returns:
+        Pairs processed, candles written, rows deleted and elapsed seconds
+    """
+    stats = {"pairs": 0, "candles": 0, "rows_deleted": 0, "seconds": 0.0}
+    horizon = compaction_horizon()
+    if horizon is None:
+        return stats
+
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(CurrentRate.base_currency_id, CurrentRate.quote_currency_id))
+        pairs = result.all()
+
+    for base_currency_id, quote_currency_id in pairs:
+        async with AsyncSessionLocal() as db:
+            oldest = await db.scalar(
+                select(func.min(ExchangeRate.timestamp)).where(
+                    ExchangeRate.base_currency_id == base_currency_id,
+                    ExchangeRate.quote_currency_id == quote_currency_id
+                )
+            )
+        if oldest is None or oldest >= horizon:
+            continue
+
+        stats["pairs"] += 1
+        start = bucket_start(oldest, COMPACTED_RESOLUTION)
+        while True:
+            async with AsyncSessionLocal() as db:
+                batch = await compact_batch(
+                    db, base_currency_id, quote_currency_id, start, horizon,
+                    settings.RATE_COMPACTION_BATCH_SIZE
+                )
+                if batch is None:
+                    break
+                await db.commit()
+            start, candles, deleted = batch
+            stats["candles"] += candles
+            stats["rows_deleted"] += deleted
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Rate compaction folded ticks before {horizon.date()} of {stats['pairs']} pairs into "
+        f"{stats['candles']} daily candles and reclaimed {stats['rows_deleted']} rows "
+        f"in {stats['seconds']} seconds"
+    )
+    return stats
@@ -0,0 +1,117 @@
+"""
+Multi-provider consensus rates.
+This module combines rate tables from several providers into one consensus table,
+rejecting provider values that deviate from the others.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Scale factor that makes the MAD a consistent estimator of the standard deviation
+MAD_SCALE = 1.4826
+
+# Fewest provider values a currency needs for MAD rejection; with two, both sit
+# exactly one MAD from their median and neither can ever be rejected
+MIN_CONSENSUS_VALUES = 3
+
+
+def row_nanmedian(values: np.ndarray) -> np.ndarray:
+    """
+    Median of each row ignoring NaN, computed with a single sort.
+
+    np.nanmedian falls back to a per-row loop, which dominates the cost for the
+    small currencies x providers matrices used here.
+
+    Args:
+        values: 2D float64 array
+
+    Returns:
+        Median per row, NaN for rows without any value
+    """
+    ordered = np.sort(values, axis=1)  # NaN sorts to the end of each row
+    counts = (~np.isnan(values)).sum(axis=1)
+    low = np.maximum((counts - 1) // 2, 0)
+    high = np.maximum(counts // 2, 0)
+    rows = np.arange(values.shape[0])
+    median = (ordered[rows, low] + ordered[rows, high]) / 2
+    median[counts == 0] = np.nan
+    return median
+
+
+def build_rate_matrix(rate_sets: List[Dict[str, float]], codes: List[str]) -> np.ndarray:
+    """
+    Line up provider rate dictionaries into a currencies x providers matrix.
+
+    Args:
+        rate_sets: Rate dictionaries, one per provider, all against the same base
+        codes: Currency codes defining the matrix rows
+
+    Returns:
+        float64 matrix of shape (len(codes), len(rate_sets)) with NaN where a
+        provider has no usable rate
+    """
+    matrix = np.empty((len(codes), len(rate_sets)), dtype=np.float64)
+    for column, rates in enumerate(rate_sets):
+        matrix[:, column] = np.fromiter(
+            (rates.get(code, np.nan) for code in codes), dtype=np.float64, count=len(codes)
+        )
+
+    # Zero, negative or non-finite rates are never valid
+    matrix[~(matrix > 0) | ~np.isfinite(matrix)] = np.nan
+    return matrix
+
+
+def consensus_rates(
+    matrix: np.ndarray,
+    method: str = "median",
+    mad_tolerance: float = 3.0,
+    min_relative_tolerance: float = 0.005
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute a consensus rate per currency with MAD-based outlier rejection.
+
+    A provider value is rejected when it is further from the row median than
+    mad_tolerance scaled MADs, or min_relative_tolerance of the median when the
+    providers agree so closely that the MAD is (near) zero. Currencies with fewer
+    than MIN_CONSENSUS_VALUES values cannot be checked this way and take the value
+    of the first provider that has one.
+
+    Args:
+        matrix: currencies x providers rate matrix from build_rate_matrix, with
+            the providers in priority order
+        method: "median" or "trimmed_mean" (mean of the values that were kept)
+        mad_tolerance: Number of scaled MADs a value may deviate from the median
+        min_relative_tolerance: Minimum tolerance as a fraction of the median
+
+    Returns:
+        Tuple of (consensus, accepted) where consensus holds one rate per currency
+        (NaN where no provider had a rate) and accepted is a boolean matrix marking
+        the provider values that were used
+    """
+    valid = ~np.isnan(matrix)
+
+    median = row_nanmedian(matrix)
+    deviation = np.abs(matrix - median[:, None])
+    mad = row_nanmedian(deviation)
+
+    tolerance = np.maximum(mad_tolerance * MAD_SCALE * mad, min_relative_tolerance * median)
+    with np.errstate(invalid="ignore"):
+        accepted = valid & (deviation <= tolerance[:, None])
+
+    # Too few values to tell an outlier apart: fall back to the primary provider
+    too_few = valid.sum(axis=1) < MIN_CONSENSUS_VALUES
+    primary = np.zeros_like(valid)
+    rows = np.arange(matrix.shape[0])
+    first = valid.argmax(axis=1)
+    primary[rows, first] = valid[rows, first]
+    accepted[too_few] = primary[too_few]
+
+    kept = np.where(accepted, matrix, np.nan)
+    if method == "trimmed_mean":
+        counts = accepted.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            consensus = np.where(accepted, matrix, 0.0).sum(axis=1) / counts
+    else:
+        consensus = row_nanmedian(kept)
+
+    return consensus, accepted
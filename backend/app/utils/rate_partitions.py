@@ -0,0 +1,327 @@
+"""
+Exchange rate partition maintenance.
+On PostgreSQL exchange_rates is range partitioned by month on timestamp (see
+migration 006). This module creates partitions ahead of the data and applies the
+retention policy by detaching or dropping partitions past the horizon.
+"""
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.currency import ExchangeRate
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = ExchangeRate.__tablename__
+PARTITION_NAME_PATTERN = re.compile(rf"^{PARENT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+# Months known to have a committed partition, so the ingest path only checks the catalog once per month
+known_months: Set[datetime] = set()
+
+# Session.info key of the months whose partition the session's open transaction created
+PENDING_MONTHS_KEY = "pending_partition_months"
+
+
+def month_start(value: datetime) -> datetime:
+    """
+    Truncate a timestamp to the first instant of its month.
+
+    Args:
+        value: Timestamp
+
+    Returns:
+        First instant of the month
+    """
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """
+    Move a month start forwards or backwards by a number of months.
+
+    Args:
+        month: First instant of a month
+        months: Number of months to move (may be negative)
+
+    Returns:
+        First instant of the resulting month
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    """
+    Get the partition table name for a month.
+
+    Args:
+        month: First instant of the month
+
+    Returns:
+        Table name such as exchange_rates_y2025m03
+    """
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def archive_name(month: datetime, detached_at: datetime) -> str:
+    """
+    Get the name a detached partition is archived under.
+
+    Args:
+        month: First instant of the partition's month
+        detached_at: Time the partition was detached
+
+    Returns:
+        Table name such as exchange_rates_y2025m03_archived_20260115
+    """
+    return f"{partition_name(month)}_archived_{detached_at:%Y%m%d}"
+
+
+def _on_commit(session: Session) -> None:
+    """Remember the months whose partition a committed transaction created."""
+    known_months.update(session.info.get(PENDING_MONTHS_KEY, ()))
+
+
+def _on_transaction_end(session: Session, transaction: SessionTransaction) -> None:
+    """Forget the pending months once the outermost transaction ends, committed or not."""
+    if transaction.parent is None:
+        session.info.get(PENDING_MONTHS_KEY, set()).clear()
+
+
+def pending_months(db: AsyncSession) -> Set[datetime]:
+    """
+    Get the months whose partition the session created in its open transaction.
+
+    They only become known months once the transaction commits; a rollback takes
+    the partitions with it, so caching them earlier would make every later insert
+    for those months fail.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Mutable set of month starts
+    """
+    if PENDING_MONTHS_KEY not in db.info:
+        db.info[PENDING_MONTHS_KEY] = set()
+        event.listen(db.sync_session, "after_commit", _on_commit)
+        event.listen(db.sync_session, "after_transaction_end", _on_transaction_end)
+    return db.info[PENDING_MONTHS_KEY]
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    """
+    Check whether exchange_rates is a partitioned table.
+
+    Args:
+        db: Database session
+
+    Returns:
+        True on PostgreSQL once migration 006 has run
+    """
+    connection = await db.connection()
+    if connection.dialect.name != "postgresql":
+        return False
+    result = await db.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table AND c.relnamespace = to_regnamespace(current_schema())"
+        ),
+        {"table": PARENT_TABLE}
+    )
+    return result.scalar() is not None
+
+
+async def list_partitions(db: AsyncSession) -> Dict[datetime, str]:
+    """
+    List the monthly partitions attached to exchange_rates.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Dictionary of month start to partition table name
+    """
+    result = await db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = :table AND parent.relnamespace = to_regnamespace(current_schema())"
+        ),
+        {"table": PARENT_TABLE}
+    )
+    partitions = {}
+    for (name,) in result.all():
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+async def create_partition(db: AsyncSession, month: datetime) -> str:
+    """
+    Create the partition for a month if it does not exist.
+    The month is only cached as known once the caller commits.
+
+    Args:
+        db: Database session
+        month: First instant of the month
+
+    Returns:
+        Partition table name
+
+    Raises:
+        RuntimeError: If a table that is not attached already has the partition's name,
+            e.g. a partition detached before detached partitions were renamed
+    """
+    name = partition_name(month)
+    is_partition = await db.scalar(
+        text("SELECT relispartition FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+    )
+    if is_partition is False:
+        # CREATE TABLE IF NOT EXISTS would silently keep it, and every insert for the month would fail
+        raise RuntimeError(
+            f"{name} exists but is not attached to {PARENT_TABLE}; rename it or reattach it "
+            f"before writing rates for {month:%Y-%m}"
+        )
+    await db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+    pending_months(db).add(month)
+    return name
+
+
+async def ensure_partitions(db: AsyncSession, start: datetime, end: datetime) -> List[str]:
+    """
+    Make sure every month between two timestamps has a partition.
+
+    Called on the ingest path so backfills of old history and clock skew past the
+    premade months never fail on a missing partition. Does nothing unless
+    exchange_rates is partitioned.
+
+    Args:
+        db: Database session
+        start: Earliest timestamp to be written
+        end: Latest timestamp to be written
+
+    Returns:
+        Names of partitions that were created
+    """
+    month = month_start(start)
+    last = month_start(end)
+    missing = []
+    while month <= last:
+        if month not in known_months:
+            missing.append(month)
+        month = add_months(month, 1)
+    if not missing or not await is_partitioned(db):
+        return []
+
+    existing = await list_partitions(db)
+    known_months.update(set(existing) - pending_months(db))
+    created = []
+    for month in missing:
+        if month not in existing:
+            created.append(await create_partition(db, month))
+    if created:
+        logger.info(f"Created exchange rate partitions {', '.join(created)}")
+    return created
+
+
+async def create_future_partitions(db: AsyncSession, months_ahead: int) -> List[str]:
+    """
+    Create partitions from the current month up to months_ahead months ahead.
+
+    Args:
+        db: Database session
+        months_ahead: Number of months after the current one to cover
+
+    Returns:
+        Names of partitions that were created
+    """
+    existing = await list_partitions(db)
+    known_months.update(set(existing) - pending_months(db))
+    current = month_start(datetime.utcnow())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(await create_partition(db, month))
+    return created
+
+
+async def apply_retention(db: AsyncSession, retention_months: int, mode: str = "detach") -> List[str]:
+    """
+    Detach or drop partitions whose whole month is older than the retention horizon.
+
+    Detached partitions stay in the database as standalone tables for archiving,
+    renamed with the detach date (exchange_rates_y2025m03_archived_20260115) so the
+    month's partition name is free again: a later backfill of that month creates a
+    fresh partition instead of finding a standalone table under its name.
+
+    Args:
+        db: Database session
+        retention_months: Number of months of history to keep
+        mode: "detach" or "drop"
+
+    Returns:
+        Names of partitions that were removed
+    """
+    today = datetime.utcnow()
+    cutoff = add_months(month_start(today), -retention_months)
+    removed = []
+    for month, name in sorted((await list_partitions(db)).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        if mode == "drop":
+            await db.execute(text(f"DROP TABLE {name}"))
+        else:
+            await db.execute(text(f"ALTER TABLE {name} RENAME TO {archive_name(month, today)}"))
+        known_months.discard(month)
+        removed.append(name)
+    return removed
+
+
+async def maintain_partitions() -> bool:
+    """
+    Create upcoming partitions and apply the retention policy.
+    This function is designed to be called periodically.
+
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            if not await is_partitioned(db):
+                logger.info("exchange_rates is not partitioned, skipping partition maintenance")
+                return True
+
+            created = await create_future_partitions(db, settings.PARTITION_PREMAKE_MONTHS)
+            removed = []
+            if settings.RATE_RETENTION_MONTHS > 0:
+                removed = await apply_retention(
+                    db, settings.RATE_RETENTION_MONTHS, settings.RATE_RETENTION_MODE
+                )
+            await db.commit()
+
+        action = "dropped" if settings.RATE_RETENTION_MODE == "drop" else "detached"
+        logger.info(
+            f"Partition maintenance created {len(created)} partitions "
+            f"({', '.join(created) or 'none'}) and {action} {len(removed)} "
+            f"({', '.join(removed) or 'none'})"
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error maintaining exchange rate partitions: {e}")
+        return False
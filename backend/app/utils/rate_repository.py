@@ -0,0 +1,477 @@
+"""
+Rate history repository.
+This module is the single read path for exchange rate history. Every reader (the
+prediction job, trend analysis, the historical endpoints) goes through the
+process-wide RateRepository, which keeps a read-through cache of per-pair series
+and only queries the database for the time ranges it does not hold yet.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.currency import ExchangeRate, RateCandle
+from app.utils.rate_cache import latest_rates
+from app.utils.rate_candles import CANDLE_RESOLUTIONS, bucket_start
+from app.utils.rate_compaction import COMPACTED_RESOLUTION, compacted_rate_query, compaction_horizon, split_at_horizon
+from app.utils.rate_segments import open_segment
+from app.utils.rate_series import PairSeries
+from app.utils.rate_window import RateWindow, from_epoch, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# "raw" holds every stored tick, the others hold candle closes
+SERIES_RESOLUTIONS = ("raw", *CANDLE_RESOLUTIONS)
+
+SeriesKey = Tuple[int, int, str]
+
+
+class RateRepository:
+    """
+    Read-through cache of pair histories keyed by (base_currency_id, quote_currency_id, resolution).
+
+    Each series remembers the time ranges it has fetched and merges overlapping ones,
+    so a request inside what was already read (e.g. the last 30 days after the last 90)
+    is served from memory, and a partly covered one only queries its gaps. New ticks
+    announced through the latest-rate cache mark series stale; the next read then
+    appends only the rows after the last stored timestamp. Raw series are mapped from
+    the pair's segment file when one covers the request, and use daily candle closes
+    before the compaction horizon, whatever a segment or a series read earlier still
+    holds; raw series are rebuilt when the horizon moves on. Series are kept in least recently used order and
+    evicted once they hold more than RATE_SERIES_MAX_BYTES, since live raw series
+    otherwise keep every tick they have read.
+    """
+
+    def __init__(self) -> None:
+        self._series: Dict[SeriesKey, PairSeries] = {}
+        self._locks: Dict[SeriesKey, asyncio.Lock] = {}
+        # Raw series reloaded after a backfill, whose segment may not be merged yet
+        self._unmapped: Set[SeriesKey] = set()
+        self.hits = 0
+        self.misses = 0
+        self.catch_ups = 0
+        self.queries = 0
+        self.evictions = 0
+
+    def mark_stale(self, since: Optional[datetime] = None) -> None:
+        """
+        Note that new rows were written.
+
+        Series whose stored range already reaches past since are dropped and reloaded
+        on next use (e.g. after a backfill); the others are caught up incrementally.
+
+        Args:
+            since: Timestamp of the oldest tick written, or None if unknown
+        """
+        for key, series in list(self._series.items()):
+            resolution = key[2]
+            if since is not None and series.length:
+                first_changed = since if resolution == "raw" else bucket_start(since, resolution)
+                if to_epoch([first_changed])[0] < series.last_timestamp:
+                    del self._series[key]
+                    if series.mapped:
+                        self._unmapped.add(key)
+                    continue
+            series.stale = True
+
+    async def _query(
+        self,
+        db: AsyncSession,
+        key: SeriesKey,
+        start: int,
+        end: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read a pair's points in [start, end) from the database.
+
+        Raw reads that reach before the compaction horizon get daily candle closes for
+        that part, since its ticks have been folded into the candles.
+
+        Args:
+            db: Database session
+            key: Series key
+            start: Range start in epoch seconds
+            end: Optional range end in epoch seconds (exclusive)
+
+        Returns:
+            Tuple of (epoch seconds, rates) arrays, oldest first
+        """
+        base_currency_id, quote_currency_id, resolution = key
+        horizon = compaction_horizon()
+        if resolution == "raw" and horizon is not None:
+            split = int(to_epoch([horizon])[0])
+            if start < split:
+                compacted = await self._query(
+                    db, (base_currency_id, quote_currency_id, COMPACTED_RESOLUTION), start,
+                    split if end is None else min(end, split)
+                )
+                if end is not None and end <= split:
+                    return compacted
+                recent = await self._query_rows(db, key, split, end)
+                return np.concatenate([compacted[0], recent[0]]), np.concatenate([compacted[1], recent[1]])
+        return await self._query_rows(db, key, start, end)
+
+    async def _query_rows(
+        self,
+        db: AsyncSession,
+        key: SeriesKey,
+        start: int,
+        end: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read a pair's stored ticks or candle closes in [start, end).
+
+        Args:
+            db: Database session
+            key: Series key
+            start: Range start in epoch seconds
+            end: Optional range end in epoch seconds (exclusive)
+
+        Returns:
+            Tuple of (epoch seconds, rates) arrays, oldest first
+        """
+        self.queries += 1
+        base_currency_id, quote_currency_id, resolution = key
+        if resolution == "raw":
+            time_column = ExchangeRate.timestamp
+            query = select(ExchangeRate.timestamp, ExchangeRate.rate).where(
+                ExchangeRate.base_currency_id == base_currency_id,
+                ExchangeRate.quote_currency_id == quote_currency_id
+            )
+        else:
+            time_column = RateCandle.bucket_start
+            query = select(RateCandle.bucket_start, RateCandle.close).where(
+                RateCandle.base_currency_id == base_currency_id,
+                RateCandle.quote_currency_id == quote_currency_id,
+                RateCandle.resolution == resolution
+            )
+
+        query = query.where(time_column >= from_epoch(start))
+        if end is not None:
+            query = query.where(time_column < from_epoch(end))
+
+        result = await db.execute(query.order_by(time_column))
+        rows = result.all()
+        timestamps = to_epoch([row[0] for row in rows])
+        rates = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        return timestamps, rates
+
+    def _map_segment(self, key: SeriesKey, series: PairSeries, start: int) -> bool:
+        """
+        Back a raw series with its pair's segment file if the segment covers start.
+
+        Only the part from the compaction horizon on is mapped: the segment may still
+        hold ticks that compaction has since folded into daily candles, and raw reads
+        serve those days as candle closes.
+
+        Args:
+            key: Series key
+            series: Series to map
+            start: Earliest epoch the series has to hold
+
+        Returns:
+            True if the series was mapped
+        """
+        if key[2] != "raw" or key in self._unmapped:
+            return False
+        segment = open_segment(key[0], key[1])
+        if segment is None:
+            return False
+        covered_from = segment.covered_from if series.horizon is None else max(segment.covered_from, series.horizon)
+        if covered_from > start:
+            return False
+        series.map_segment(segment, covered_from)
+        return True
+
+    def _horizon(self, key: SeriesKey) -> Optional[int]:
+        """
+        Get the compaction horizon a series' points depend on.
+
+        Args:
+            key: Series key
+
+        Returns:
+            Epoch of the compaction horizon for raw series, None for candle series or without compaction
+        """
+        horizon = compaction_horizon()
+        if key[2] != "raw" or horizon is None:
+            return None
+        return int(to_epoch([horizon])[0])
+
+    async def _append_after_last(self, db: AsyncSession, key: SeriesKey, series: PairSeries) -> None:
+        """
+        Append the rows stored after the series' last timestamp, e.g. those committed
+        by another process after the segment was last extended.
+
+        Args:
+            db: Database session
+            key: Series key
+            series: Live series to extend
+        """
+        last = series.last_timestamp
+        if last is None:
+            series.append(*await self._query(db, key, series.ranges[-1][0]))
+            return
+
+        # Epochs are whole seconds, so re-read the last one: a tick committed later in
+        # that same second would be skipped by starting after it
+        timestamps, rates = await self._query(db, key, last)
+        held = series.length - int(np.searchsorted(series.timestamps, last, side="left"))
+        if int(np.searchsorted(timestamps, last, side="right")) != held:
+            series.truncate_from(last)
+            held = 0
+        series.append(timestamps[held:], rates[held:])
+
+    async def _catch_up(self, db: AsyncSession, key: SeriesKey, series: PairSeries) -> None:
+        """
+        Bring a stale series up to the latest stored point.
+
+        Args:
+            db: Database session
+            key: Series key
+            series: Stale series
+        """
+        series.stale = False
+        if not series.is_live:
+            # Only closed historical ranges are held, which new ticks do not touch
+            return
+
+        self.catch_ups += 1
+        if series.mapped and self._map_segment(key, series, series.ranges[0][0]):
+            # Remap to pick up appended records, then read whatever the segment lacks
+            await self._append_after_last(db, key, series)
+            return
+
+        # Re-read from the last timestamp: the newest candle may have changed
+        last = series.last_timestamp
+        if last is None:
+            last = series.ranges[-1][0]
+        series.truncate_from(last)
+        series.append(*await self._query(db, key, last))
+
+    def _evict(self, keep: SeriesKey) -> None:
+        """
+        Drop least recently used series until the in-memory ones fit RATE_SERIES_MAX_BYTES.
+
+        Mapped series are left alone, as their points live in the page cache.
+
+        Args:
+            keep: Key of the series being served, which is never evicted
+        """
+        limit = settings.RATE_SERIES_MAX_BYTES
+        if limit <= 0:
+            return
+        total = sum(series.nbytes for series in self._series.values())
+        for key in list(self._series):
+            if total <= limit:
+                break
+            series = self._series[key]
+            if key == keep or not series.nbytes:
+                continue
+            del self._series[key]
+            total -= series.nbytes
+            self.evictions += 1
+
+    async def _get(self, db: AsyncSession, key: SeriesKey, start: int, end: Optional[int]) -> RateWindow:
+        """
+        Get [start, end) of a series, fetching only the ranges not held yet.
+
+        Args:
+            db: Database session
+            key: Series key
+            start: Range start in epoch seconds
+            end: Optional range end in epoch seconds (exclusive), None for up to the latest point
+
+        Returns:
+            Zero-copy window, oldest first
+        """
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Popped and reinserted to move it to the most recently used end
+            series = self._series.pop(key, None)
+            horizon = self._horizon(key)
+            if series is not None and series.horizon != horizon:
+                # Raw points before the moved horizon are served as candle closes now
+                series = None
+            if series is None:
+                series = PairSeries()
+                series.horizon = horizon
+                self._series[key] = series
+                if self._map_segment(key, series, start):
+                    await self._append_after_last(db, key, series)
+                else:
+                    self._unmapped.discard(key)
+            else:
+                self._series[key] = series
+                if series.stale:
+                    await self._catch_up(db, key, series)
+
+            gaps = series.missing(start, end)
+            if gaps:
+                self.misses += 1
+                for gap_start, gap_end in gaps:
+                    series.insert(gap_start, *await self._query(db, key, gap_start, gap_end))
+                    series.add_range(gap_start, gap_end)
+            else:
+                self.hits += 1
+
+            self._evict(key)
+            return series.window(start, end)
+
+    async def get_range(
+        self,
+        db: AsyncSession,
+        base_currency_id: int,
+        quote_currency_id: int,
+        resolution: str,
+        start: datetime,
+        end: Optional[datetime] = None
+    ) -> RateWindow:
+        """
+        Get a pair's history in [start, end).
+
+        Args:
+            db: Database session used for ranges that are not cached
+            base_currency_id: Base currency ID
+            quote_currency_id: Quote currency ID
+            resolution: "raw", "1h" or "1d"
+            start: Range start
+            end: Optional range end (exclusive), None for up to the latest point
+
+        Returns:
+            Zero-copy window, oldest first
+        """
+        if resolution != "raw":
+            start = bucket_start(start, resolution)
+        key = (base_currency_id, quote_currency_id, resolution)
+        start_epoch = int(to_epoch([start])[0])
+        end_epoch = None if end is None else int(to_epoch([end])[0])
+        return await self._get(db, key, start_epoch, end_epoch)
+
+    async def get_window(
+        self,
+        db: AsyncSession,
+        base_currency_id: int,
+        quote_currency_id: int,
+        resolution: str,
+        days: int
+    ) -> RateWindow:
+        """
+        Get the last days of a pair's history.
+
+        Args:
+            db: Database session used for ranges that are not cached
+            base_currency_id: Base currency ID
+            quote_currency_id: Quote currency ID
+            resolution: "raw", "1h" or "1d"
+            days: Window length in days
+
+        Returns:
+            Zero-copy window, oldest first
+        """
+        start = datetime.utcnow() - timedelta(days=days)
+        return await self.get_range(db, base_currency_id, quote_currency_id, resolution, start)
+
+    async def get_records(
+        self,
+        db: AsyncSession,
+        base_currency_id: int,
+        quote_currency_id: int,
+        days: int,
+        resolution: str = "raw"
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the last days of a pair's history as {"rate", "timestamp"} records, newest first.
+
+        Args:
+            db: Database session used for ranges that are not cached
+            base_currency_id: Base currency ID
+            quote_currency_id: Quote currency ID
+            days: Window length in days
+            resolution: "raw", "1h" or "1d"
+
+        Returns:
+            List of records
+        """
+        window = await self.get_window(db, base_currency_id, quote_currency_id, resolution, days)
+        return window.to_records(newest_first=True)
+
+    async def get_ticks(
+        self,
+        db: AsyncSession,
+        base_currency_id: int,
+        quote_currency_id: int,
+        days: int
+    ) -> List[Tuple[Optional[int], float, str, datetime]]:
+        """
+        Get the last days of a pair's stored ticks with their ids and sources, oldest first.
+
+        Series only hold epoch seconds and rates, so responses that identify single
+        ticks read the rows instead, bypassing the cache. Days before the compaction
+        horizon come back as daily candle closes without an id.
+
+        Args:
+            db: Database session
+            base_currency_id: Base currency ID
+            quote_currency_id: Quote currency ID
+            days: Window length in days
+
+        Returns:
+            List of (id, rate, source, timestamp) tuples
+        """
+        compacted, recent = split_at_horizon(datetime.utcnow() - timedelta(days=days), None)
+        ticks: List[Tuple[Optional[int], float, str, datetime]] = []
+        if compacted is not None:
+            self.queries += 1
+            result = await db.execute(
+                compacted_rate_query(base_currency_id, quote_currency_id, *compacted).order_by(RateCandle.bucket_start)
+            )
+            ticks.extend((None, float(rate), source, timestamp) for timestamp, rate, source in result.all())
+
+        self.queries += 1
+        result = await db.execute(
+            select(ExchangeRate.id, ExchangeRate.rate, ExchangeRate.source, ExchangeRate.timestamp).where(
+                ExchangeRate.base_currency_id == base_currency_id,
+                ExchangeRate.quote_currency_id == quote_currency_id,
+                ExchangeRate.timestamp >= recent[0]
+            ).order_by(ExchangeRate.timestamp, ExchangeRate.id)
+        )
+        ticks.extend((rate_id, float(rate), source, timestamp) for rate_id, rate, source, timestamp in result.all())
+        return ticks
+
+    def clear(self) -> None:
+        """Drop every cached series."""
+        self._series.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get repository statistics.
+
+        Returns:
+            Series count, cached ranges, points and bytes, and hit/miss/catch-up/query/eviction counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "series": len(self._series),
+            "mapped_series": sum(1 for series in self._series.values() if series.mapped),
+            "ranges": sum(len(series.ranges) for series in self._series.values()),
+            "points": sum(series.length for series in self._series.values()),
+            "bytes": sum(series.nbytes for series in self._series.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "catch_ups": self.catch_ups,
+            "queries": self.queries,
+            "evictions": self.evictions,
+            "max_bytes": settings.RATE_SERIES_MAX_BYTES,
+        }
+
+
+# Process-wide rate repository, kept current through latest-rate cache invalidations
+rate_repository = RateRepository()
+latest_rates.subscribe(rate_repository.mark_stale)
@@ -0,0 +1,339 @@
+"""
+On-disk rate history segments.
+This module keeps an append-only binary file per currency pair holding fixed-width
+(int64 epoch seconds, float64 rate) records in timestamp order. The files are
+opened with numpy.memmap, so a freshly started process can serve raw history
+windows from the OS page cache instead of re-reading exchange_rates.
+
+Segments are created by the rebuild command (python -m app.cli.rebuild_segments)
+and extended with the rows of every committed ingest afterwards. Ingest never
+creates a segment, since it cannot know whether older history is missing from it.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.currency import CurrentRate, ExchangeRate
+from app.utils.rate_compaction import compaction_horizon
+from app.utils.rate_window import to_epoch
+
+logger = logging.getLogger(__name__)
+
+RECORD_DTYPE = np.dtype([("timestamp", "<i8"), ("rate", "<f8")])
+
+# Header is one record wide: 8 magic bytes and the int64 epoch the segment is complete from
+SEGMENT_MAGIC = b"RATESEG1"
+HEADER_SIZE = RECORD_DTYPE.itemsize
+
+# Session.info key holding inserted rows until the caller has committed and flushes them
+PENDING_ROWS_KEY = "rate_segment_rows"
+
+
+def segment_path(base_currency_id: int, quote_currency_id: int) -> str:
+    """
+    Get the segment file path of a pair.
+
+    Args:
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+
+    Returns:
+        Segment file path
+    """
+    return os.path.join(settings.RATE_SEGMENT_DIR, f"{base_currency_id}_{quote_currency_id}.seg")
+
+
+def encode_header(covered_from: int) -> bytes:
+    """
+    Build a segment header.
+
+    Args:
+        covered_from: Epoch from which the segment holds every stored tick
+
+    Returns:
+        Header bytes
+    """
+    return SEGMENT_MAGIC + int(covered_from).to_bytes(8, "little", signed=True)
+
+
+class RateSegment:
+    """
+    A pair's segment file mapped read-only into memory.
+    """
+    __slots__ = ("path", "covered_from", "records")
+
+    def __init__(self, path: str, covered_from: int, records: np.ndarray) -> None:
+        self.path = path
+        self.covered_from = covered_from
+        self.records = records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.records["timestamp"]
+
+    @property
+    def rates(self) -> np.ndarray:
+        return self.records["rate"]
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.records["timestamp"][-1]) if len(self.records) else None
+
+
+def open_segment(base_currency_id: int, quote_currency_id: int) -> Optional[RateSegment]:
+    """
+    Map a pair's segment file.
+
+    Args:
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+
+    Returns:
+        The mapped segment, or None if segments are disabled or the pair has no valid segment
+    """
+    if not settings.RATE_SEGMENTS_ENABLED:
+        return None
+
+    path = segment_path(base_currency_id, quote_currency_id)
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+            size = os.fstat(f.fileno()).st_size
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Cannot open rate segment {path}: {e}")
+        return None
+
+    if len(header) < HEADER_SIZE or not header.startswith(SEGMENT_MAGIC):
+        logger.warning(f"Ignoring rate segment {path} with an invalid header")
+        return None
+
+    covered_from = int.from_bytes(header[len(SEGMENT_MAGIC):], "little", signed=True)
+    # A torn trailing record from an interrupted append is ignored
+    count = (size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count:
+        records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+    else:
+        records = np.empty(0, dtype=RECORD_DTYPE)
+    return RateSegment(path, covered_from, records)
+
+
+def append_segment_records(base_currency_id: int, quote_currency_id: int, records: np.ndarray) -> bool:
+    """
+    Add records to an existing segment.
+
+    Records newer than the last stored one are appended in place; older records
+    (a backfill) are merged by rewriting the file, which readers pick up on their
+    next mapping.
+
+    Args:
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+        records: Records of RECORD_DTYPE
+
+    Returns:
+        True if the pair has a segment and it was extended
+    """
+    path = segment_path(base_currency_id, quote_currency_id)
+    if not os.path.exists(path):
+        return False
+
+    records = records[np.argsort(records["timestamp"], kind="stable")]
+    with open(path, "r+b") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+            # Replaced by a merge or rebuild while waiting for the lock
+            return append_segment_records(base_currency_id, quote_currency_id, records)
+        segment = open_segment(base_currency_id, quote_currency_id)
+        if segment is None:
+            return False
+
+        last = segment.last_timestamp
+        if last is None or records["timestamp"][0] >= last:
+            # Overwrite any torn trailing record, then append
+            f.seek(HEADER_SIZE + len(segment) * RECORD_DTYPE.itemsize)
+            f.write(records.tobytes())
+            f.truncate()
+            return True
+
+        merged = np.concatenate([np.asarray(segment.records), records])
+        merged = merged[np.argsort(merged["timestamp"], kind="stable")]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as tmp:
+            tmp.write(encode_header(segment.covered_from))
+            tmp.write(merged.tobytes())
+            # Durable before it replaces the segment, so a crash never leaves a truncated file
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, path)
+        return True
+
+
+def append_segment_rows(rows: List[Dict[str, Any]]) -> int:
+    """
+    Extend the segments of the pairs in a batch of stored exchange rate rows.
+
+    Segments are a copy of the database, so a failure is logged rather than raised;
+    the rebuild command brings a segment back in step.
+
+    Args:
+        rows: Inserted rows with base_currency_id, quote_currency_id, rate and timestamp
+
+    Returns:
+        Number of segments extended
+    """
+    pairs: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        pairs[(row["base_currency_id"], row["quote_currency_id"])].append(row)
+
+    extended = 0
+    for (base_currency_id, quote_currency_id), pair_rows in pairs.items():
+        records = np.empty(len(pair_rows), dtype=RECORD_DTYPE)
+        records["timestamp"] = to_epoch([row["timestamp"] for row in pair_rows])
+        records["rate"] = [float(row["rate"]) for row in pair_rows]
+        try:
+            if append_segment_records(base_currency_id, quote_currency_id, records):
+                extended += 1
+        except OSError as e:
+            logger.warning(f"Failed to extend rate segment of pair {base_currency_id}/{quote_currency_id}: {e}")
+    return extended
+
+
+def _discard_pending_rows(session: Session) -> None:
+    """Drop the rows queued by a transaction that rolled back."""
+    session.info.pop(PENDING_ROWS_KEY, None)
+
+
+def queue_segment_rows(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    """
+    Hold inserted rows on the session until the caller commits and calls flush_segment_rows.
+
+    Writing after the commit keeps rolled back rows out of the segments; a rollback
+    drops the queued rows.
+
+    Args:
+        db: Database session holding the ingest transaction
+        rows: Inserted rows with base_currency_id, quote_currency_id, rate and timestamp
+    """
+    if not settings.RATE_SEGMENTS_ENABLED or not rows:
+        return
+    if not event.contains(db.sync_session, "after_rollback", _discard_pending_rows):
+        event.listen(db.sync_session, "after_rollback", _discard_pending_rows)
+    db.info.setdefault(PENDING_ROWS_KEY, []).extend(rows)
+
+
+async def flush_segment_rows(db: AsyncSession) -> int:
+    """
+    Write the rows queued on a session to the segments in a worker thread.
+    Call once the session's transaction has committed.
+
+    Args:
+        db: Database session the rows were inserted with
+
+    Returns:
+        Number of segments extended
+    """
+    rows = db.info.pop(PENDING_ROWS_KEY, None)
+    if not rows:
+        return 0
+    return await asyncio.to_thread(append_segment_rows, rows)
+
+
+async def rebuild_segment(
+    db: AsyncSession,
+    base_currency_id: int,
+    quote_currency_id: int,
+    chunk_size: int = 50000
+) -> int:
+    """
+    Regenerate a pair's segment from the database.
+
+    Rows are streamed into a temporary file that replaces the segment once complete,
+    so readers never see a partial file.
+
+    Args:
+        db: Database session
+        base_currency_id: Base currency ID
+        quote_currency_id: Quote currency ID
+        chunk_size: Rows fetched per round trip
+
+    Returns:
+        Number of records written
+    """
+    path = segment_path(base_currency_id, quote_currency_id)
+    tmp_path = f"{path}.rebuild"
+    written = 0
+
+    # Compacted history only exists as candles, so the segment starts at the horizon
+    horizon = compaction_horizon()
+    covered_from = 0 if horizon is None else int(to_epoch([horizon])[0])
+
+    query = select(ExchangeRate.timestamp, ExchangeRate.rate).where(
+        ExchangeRate.base_currency_id == base_currency_id,
+        ExchangeRate.quote_currency_id == quote_currency_id
+    )
+    if horizon is not None:
+        query = query.where(ExchangeRate.timestamp >= horizon)
+    result = await db.stream(
+        query.order_by(ExchangeRate.timestamp).execution_options(yield_per=chunk_size)
+    )
+    with open(tmp_path, "wb") as f:
+        f.write(encode_header(covered_from))
+        async for rows in result.partitions(chunk_size):
+            records = np.empty(len(rows), dtype=RECORD_DTYPE)
+            records["timestamp"] = to_epoch([row[0] for row in rows])
+            records["rate"] = [float(row[1]) for row in rows]
+            f.write(records.tobytes())
+            written += len(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return written
+
+
+async def rebuild_segments(
+    db: AsyncSession,
+    pairs: Optional[List[Tuple[int, int]]] = None,
+    chunk_size: int = 50000
+) -> Dict[str, Any]:
+    """
+    Regenerate the segments of every pair with stored rates, or of the given pairs.
+
+    Args:
+        db: Database session
+        pairs: Optional (base_currency_id, quote_currency_id) pairs to rebuild
+        chunk_size: Rows fetched per round trip
+
+    Returns:
+        Number of pairs and records written, file bytes and elapsed seconds
+    """
+    os.makedirs(settings.RATE_SEGMENT_DIR, exist_ok=True)
+    if pairs is None:
+        result = await db.execute(select(CurrentRate.base_currency_id, CurrentRate.quote_currency_id))
+        pairs = [tuple(row) for row in result.all()]
+
+    started = time.perf_counter()
+    records = 0
+    for base_currency_id, quote_currency_id in pairs:
+        records += await rebuild_segment(db, base_currency_id, quote_currency_id, chunk_size)
+
+    return {
+        "pairs": len(pairs),
+        "records": records,
+        "bytes": records * RECORD_DTYPE.itemsize + len(pairs) * HEADER_SIZE,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
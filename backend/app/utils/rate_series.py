@@ -0,0 +1,200 @@
+"""
+In-memory rate time series.
+This module holds the history of a currency pair as contiguous NumPy arrays
+(int64 epoch seconds and float64 rates), so analytics can slice windows with a
+binary search and work on zero-copy views. The series are filled and kept
+current by app.utils.rate_repository.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.rate_segments import RateSegment
+from app.utils.rate_window import RateWindow
+
+# Time range [start, end) in epoch seconds; an end of None reaches up to the latest stored point
+TimeRange = Tuple[int, Optional[int]]
+
+
+class PairSeries:
+    """
+    Append-optimised history of one pair at one resolution.
+
+    The series records which time ranges it holds completely, as sorted disjoint
+    ranges that are merged as they grow, so any later request inside them needs no
+    query and a partly covered one only needs its gaps.
+
+    Arrays are over-allocated and grown by doubling, so appending new ticks is
+    amortised O(1) and never copies the existing history. A series may instead be
+    backed by a read-only segment mapping; it is copied into memory the first time
+    it has to grow.
+    """
+
+    def __init__(self) -> None:
+        self._timestamps = np.empty(0, dtype=np.int64)
+        self._rates = np.empty(0, dtype=np.float64)
+        self.length = 0
+        self.ranges: List[TimeRange] = []  # Ranges held completely, sorted and disjoint
+        self.stale = False  # New rows may exist after the last timestamp
+        self.mapped = False  # Arrays are views of a segment file
+        self.horizon: Optional[int] = None  # Compaction horizon the points were read under
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[:self.length]
+
+    @property
+    def rates(self) -> np.ndarray:
+        return self._rates[:self.length]
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self._timestamps[self.length - 1]) if self.length else None
+
+    @property
+    def is_live(self) -> bool:
+        """True if the series holds everything up to the latest stored point."""
+        return bool(self.ranges) and self.ranges[-1][1] is None
+
+    def missing(self, start: int, end: Optional[int] = None) -> List[TimeRange]:
+        """
+        Get the parts of [start, end) the series does not hold.
+
+        Args:
+            start: Range start in epoch seconds
+            end: Optional range end in epoch seconds, None for up to the latest point
+
+        Returns:
+            Gaps in ascending order
+        """
+        gaps: List[TimeRange] = []
+        cursor = start
+        for range_start, range_end in self.ranges:
+            if end is not None and range_start >= end:
+                break
+            if range_end is not None and range_end <= cursor:
+                continue
+            if range_start > cursor:
+                gaps.append((cursor, range_start))
+            if range_end is None:
+                return gaps
+            cursor = range_end
+        if end is None or cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def add_range(self, start: int, end: Optional[int] = None) -> None:
+        """
+        Record that [start, end) is held completely, merging overlapping ranges.
+
+        Args:
+            start: Range start in epoch seconds
+            end: Optional range end in epoch seconds, None for up to the latest point
+        """
+        merged: List[TimeRange] = []
+        for range_start, range_end in sorted(self.ranges + [(start, end)], key=lambda r: r[0]):
+            if merged and (merged[-1][1] is None or range_start <= merged[-1][1]):
+                previous_end = merged[-1][1]
+                if previous_end is None or range_end is None:
+                    merged[-1] = (merged[-1][0], None)
+                else:
+                    merged[-1] = (merged[-1][0], max(previous_end, range_end))
+            else:
+                merged.append((range_start, range_end))
+        self.ranges = merged
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in process memory (mapped segments live in the page cache)."""
+        return 0 if self.mapped else self._timestamps.nbytes + self._rates.nbytes
+
+    def _reserve(self, extra: int) -> None:
+        needed = self.length + extra
+        if needed <= len(self._timestamps) and not self.mapped:
+            return
+        capacity = max(needed, 2 * len(self._timestamps), 64)
+        timestamps = np.empty(capacity, dtype=np.int64)
+        rates = np.empty(capacity, dtype=np.float64)
+        timestamps[:self.length] = self.timestamps
+        rates[:self.length] = self.rates
+        self._timestamps, self._rates = timestamps, rates
+        self.mapped = False
+
+    def map_segment(self, segment: RateSegment, covered_from: int) -> None:
+        """
+        Replace the stored points with views of a segment file from covered_from on.
+
+        Args:
+            segment: Mapped segment covering at least the stored range
+            covered_from: Epoch from which to hold the segment's points, not before its own
+        """
+        first = int(np.searchsorted(segment.timestamps, covered_from, side="left"))
+        self._timestamps = segment.timestamps[first:]
+        self._rates = segment.rates[first:]
+        self.length = len(segment) - first
+        self.ranges = [(covered_from, None)]
+        self.mapped = True
+
+    def append(self, timestamps: np.ndarray, rates: np.ndarray) -> None:
+        """
+        Append points that are not older than the last stored one.
+
+        Args:
+            timestamps: Ascending epoch seconds
+            rates: Rates for the timestamps
+        """
+        count = len(timestamps)
+        if not count:
+            return
+        self._reserve(count)
+        self._timestamps[self.length:self.length + count] = timestamps
+        self._rates[self.length:self.length + count] = rates
+        self.length += count
+
+    def insert(self, start: int, timestamps: np.ndarray, rates: np.ndarray) -> None:
+        """
+        Add the points of a gap that starts at start.
+
+        Points after the last stored one are appended; anything else is spliced in,
+        which copies the arrays.
+
+        Args:
+            start: Gap start in epoch seconds
+            timestamps: Ascending epoch seconds, all inside the gap
+            rates: Rates for the timestamps
+        """
+        position = int(np.searchsorted(self.timestamps, start, side="left"))
+        if position == self.length:
+            self.append(timestamps, rates)
+            return
+        if not len(timestamps):
+            return
+        self._timestamps = np.concatenate([self.timestamps[:position], timestamps, self.timestamps[position:]])
+        self._rates = np.concatenate([self.rates[:position], rates, self.rates[position:]])
+        self.length = len(self._timestamps)
+        self.mapped = False
+
+    def truncate_from(self, epoch: int) -> None:
+        """
+        Drop the points at or after a timestamp, so they can be re-read.
+
+        Args:
+            epoch: Epoch seconds
+        """
+        self.length = int(np.searchsorted(self.timestamps, epoch, side="left"))
+
+    def window(self, start: int, end: Optional[int] = None) -> RateWindow:
+        """
+        Slice the points in [start, end) with a binary search.
+
+        Args:
+            start: Window start in epoch seconds
+            end: Optional window end in epoch seconds (exclusive)
+
+        Returns:
+            Zero-copy window over the stored arrays
+        """
+        timestamps = self.timestamps
+        i = int(np.searchsorted(timestamps, start, side="left"))
+        j = self.length if end is None else int(np.searchsorted(timestamps, end, side="left"))
+        return RateWindow(timestamps[i:j], self.rates[i:j])
@@ -0,0 +1,258 @@
+"""
+Exchange rate storage utilities.
+This module provides the bulk write path for the exchange_rates table and keeps
+the current_rates snapshot and candle rollups in step with it.
+"""
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.currency import EXCHANGE_RATE_TICK_KEY, CurrentRate, ExchangeRate
+from app.utils.rate_cache import notify_rates_changed
+from app.utils.rate_candles import upsert_candles
+from app.utils.rate_partitions import ensure_partitions
+from app.utils.rate_segments import queue_segment_rows
+
+logger = logging.getLogger(__name__)
+
+# Column order used for COPY records
+EXCHANGE_RATE_COLUMNS = [
+    "base_currency_id",
+    "quote_currency_id",
+    "rate",
+    "source",
+    "timestamp",
+    "created_at",
+]
+
+# Columns returned for inserted rows, enough to maintain the candle rollups
+INSERTED_COLUMNS = ["base_currency_id", "quote_currency_id", "rate", "timestamp"]
+
+# Session-local staging table that COPY writes into before rows are merged
+STAGING_TABLE = "exchange_rates_staging"
+
+
+async def copy_exchange_rates(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Write exchange rate rows with the PostgreSQL COPY protocol via asyncpg.
+
+    COPY cannot skip conflicting rows, so records are copied into a temporary
+    staging table and merged with INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    Runs on the session's connection, so the rows are part of the current transaction.
+
+    Args:
+        db: Database session bound to a postgresql+asyncpg engine
+        rows: Exchange rate rows keyed by column name
+
+    Returns:
+        The rows that were inserted (ticks that were already stored are left out)
+    """
+    columns = ", ".join(f'"{column}"' for column in EXCHANGE_RATE_COLUMNS)
+    key = ", ".join(f'"{column}"' for column in EXCHANGE_RATE_TICK_KEY)
+
+    await db.execute(text(
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} ("
+        "base_currency_id integer, quote_currency_id integer, rate numeric(18, 6), "
+        'source varchar, "timestamp" timestamp, created_at timestamp'
+        ") ON COMMIT DELETE ROWS"
+    ))
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    records = [
+        (
+            row["base_currency_id"],
+            row["quote_currency_id"],
+            Decimal(str(row["rate"])),
+            row["source"],
+            row["timestamp"],
+            row["created_at"],
+        )
+        for row in rows
+    ]
+    await raw_connection.driver_connection.copy_records_to_table(
+        STAGING_TABLE, records=records, columns=EXCHANGE_RATE_COLUMNS
+    )
+
+    result = await db.execute(text(
+        f"INSERT INTO {ExchangeRate.__tablename__} ({columns}) "
+        f"SELECT {columns} FROM {STAGING_TABLE} "
+        f"ON CONFLICT ({key}) DO NOTHING "
+        f"RETURNING {', '.join(INSERTED_COLUMNS)}"
+    ))
+    inserted = [dict(row) for row in result.mappings().all()]
+    await db.execute(text(f"TRUNCATE {STAGING_TABLE}"))
+    return inserted
+
+
+def get_insert_factory(dialect_name: str) -> Optional[Callable[..., Any]]:
+    """
+    Get the dialect-specific INSERT construct that supports ON CONFLICT.
+
+    Args:
+        dialect_name: SQLAlchemy dialect name
+
+    Returns:
+        insert() of the dialect, or None if the dialect has no ON CONFLICT support
+    """
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    return None
+
+
+async def upsert_current_rates(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """
+    Update the current_rates snapshot from a batch of exchange rate rows.
+
+    Only the newest row of each pair is applied, and a pair is only overwritten when
+    the row is at least as new as the stored snapshot, so backfilling old history
+    never replaces a fresher rate. The caller is responsible for committing.
+
+    Args:
+        db: Database session
+        rows: Exchange rate rows keyed by column name
+
+    Returns:
+        Number of pairs in the batch
+    """
+    latest: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for row in rows:
+        pair = (row["base_currency_id"], row["quote_currency_id"])
+        current = latest.get(pair)
+        if current is None or row["timestamp"] >= current["timestamp"]:
+            latest[pair] = row
+    if not latest:
+        return 0
+
+    now = datetime.utcnow()
+    snapshot = [
+        {
+            "base_currency_id": base_currency_id,
+            "quote_currency_id": quote_currency_id,
+            "rate": row["rate"],
+            "source": row["source"],
+            "timestamp": row["timestamp"],
+            "updated_at": now,
+        }
+        for (base_currency_id, quote_currency_id), row in latest.items()
+    ]
+
+    connection = await db.connection()
+    insert_factory = get_insert_factory(connection.dialect.name)
+    if insert_factory is None:
+        for values in snapshot:
+            await db.merge(CurrentRate(**values))
+        return len(snapshot)
+
+    batch_size = settings.RATE_INSERT_BATCH_SIZE
+    for start in range(0, len(snapshot), batch_size):
+        statement = insert_factory(CurrentRate).values(snapshot[start:start + batch_size])
+        statement = statement.on_conflict_do_update(
+            index_elements=["base_currency_id", "quote_currency_id"],
+            set_={
+                "rate": statement.excluded.rate,
+                "source": statement.excluded.source,
+                "timestamp": statement.excluded.timestamp,
+                "updated_at": statement.excluded.updated_at,
+            },
+            where=CurrentRate.timestamp <= statement.excluded.timestamp
+        )
+        await db.execute(statement)
+
+    # Delivered on commit, so other processes reload the snapshot only once it is visible
+    await notify_rates_changed(
+        db,
+        min(row["timestamp"] for row in rows),
+        max(values["timestamp"] for values in snapshot),
+        len(snapshot)
+    )
+    return len(snapshot)
+
+
+async def bulk_insert_exchange_rates(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insert exchange rate rows in bulk without building ORM objects.
+
+    Uses COPY when running on PostgreSQL with asyncpg and the batch is at least
+    RATE_COPY_THRESHOLD rows; otherwise writes multi-row INSERT statements of up to
+    RATE_INSERT_BATCH_SIZE rows each. Rows whose (base_currency_id, quote_currency_id,
+    timestamp, source) tick is already stored are skipped. The current_rates snapshot
+    and the candle rollups are updated on the same session, so everything changes in
+    one transaction. The caller is responsible for committing, and then for calling
+    flush_segment_rows to extend the on-disk rate segments.
+
+    Args:
+        db: Database session
+        rows: Exchange rate rows keyed by column name
+
+    Returns:
+        Number of rows inserted
+    """
+    if not rows:
+        return 0
+
+    # Partitioned tables reject rows for months without a partition
+    timestamps = [row["timestamp"] for row in rows]
+    await ensure_partitions(db, min(timestamps), max(timestamps))
+
+    connection = await db.connection()
+    dialect = connection.dialect
+    if (
+        dialect.name == "postgresql"
+        and dialect.driver == "asyncpg"
+        and len(rows) >= settings.RATE_COPY_THRESHOLD
+    ):
+        inserted = await copy_exchange_rates(db, rows)
+    else:
+        inserted = await insert_exchange_rates(db, rows, get_insert_factory(dialect.name))
+
+    skipped = len(rows) - len(inserted)
+    if skipped:
+        logger.info(f"Skipped {skipped} of {len(rows)} exchange rates whose tick is already stored")
+
+    await upsert_current_rates(db, rows)
+    await upsert_candles(db, inserted)
+    queue_segment_rows(db, inserted)
+    return len(inserted)
+
+
+async def insert_exchange_rates(
+    db: AsyncSession,
+    rows: List[Dict[str, Any]],
+    insert_factory: Optional[Callable[..., Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Write exchange rate rows as multi-row INSERT statements.
+
+    Args:
+        db: Database session
+        rows: Exchange rate rows keyed by column name
+        insert_factory: Dialect insert() supporting ON CONFLICT, None for plain INSERT
+
+    Returns:
+        The rows that were inserted (ticks that were already stored are left out)
+    """
+    returned_columns = [getattr(ExchangeRate, column) for column in INSERTED_COLUMNS]
+    inserted = []
+    batch_size = settings.RATE_INSERT_BATCH_SIZE
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if insert_factory is None:
+            await db.execute(insert(ExchangeRate).values(batch))
+            inserted.extend(batch)
+            continue
+
+        statement = insert_factory(ExchangeRate).values(batch).on_conflict_do_nothing(
+            index_elements=EXCHANGE_RATE_TICK_KEY
+        ).returning(*returned_columns)
+        result = await db.execute(statement)
+        inserted.extend(dict(row) for row in result.mappings().all())
+    return inserted
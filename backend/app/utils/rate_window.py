@@ -0,0 +1,85 @@
+"""
+Rate history windows.
+This module holds the epoch conversions and the RateWindow view shared by the rate
+history readers and the prediction models. It only depends on NumPy, so worker
+processes can use it without importing the database layer.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def to_epoch(timestamps: Sequence[datetime]) -> np.ndarray:
+    """
+    Convert naive UTC datetimes to int64 epoch seconds.
+
+    Args:
+        timestamps: Datetimes
+
+    Returns:
+        int64 array of epoch seconds
+    """
+    return np.array(timestamps, dtype="datetime64[s]").astype(np.int64)
+
+
+def from_epoch(epoch: int) -> datetime:
+    """
+    Convert epoch seconds to a naive UTC datetime.
+
+    Args:
+        epoch: Epoch seconds
+
+    Returns:
+        Naive UTC datetime
+    """
+    return datetime.utcfromtimestamp(int(epoch))
+
+
+class RateWindow:
+    """
+    A window of one pair's history as views into the series arrays, oldest first.
+
+    The arrays are views, not copies: read them before the next await rather than
+    keeping them around, as the newest values may be rewritten by a catch-up.
+    """
+    __slots__ = ("timestamps", "rates")
+
+    def __init__(self, timestamps: np.ndarray, rates: np.ndarray) -> None:
+        self.timestamps = timestamps
+        self.rates = rates
+
+    def __len__(self) -> int:
+        return len(self.rates)
+
+    @property
+    def latest(self) -> Optional[float]:
+        """Most recent rate in the window."""
+        return float(self.rates[-1]) if len(self.rates) else None
+
+    @property
+    def days(self) -> np.ndarray:
+        """Time of every point in days since the first point of the window."""
+        return (self.timestamps - self.timestamps[0]) / 86400.0
+
+    def copy(self) -> "RateWindow":
+        """Copy the window out of the series arrays, so it can be kept across awaits."""
+        return RateWindow(self.timestamps.copy(), self.rates.copy())
+
+    def to_records(self, newest_first: bool = False) -> List[Dict[str, Any]]:
+        """
+        Build {"rate", "timestamp"} records of the window.
+
+        Args:
+            newest_first: Order records newest first instead of oldest first
+
+        Returns:
+            List of records
+        """
+        records = [
+            {"rate": float(rate), "timestamp": from_epoch(timestamp)}
+            for timestamp, rate in zip(self.timestamps.tolist(), self.rates.tolist())
+        ]
+        if newest_first:
+            records.reverse()
+        return records
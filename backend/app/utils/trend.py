@@ -0,0 +1,107 @@
+"""
+Batched linear trend fitting.
+This module fits y = intercept + slope * x by ordinary least squares to many series
+at once. Series of unequal length are stacked into one masked 2D array and every
+fit comes from closed-form per-row sums, so N trends cost one vectorized pass
+instead of N model constructions.
+"""
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+def stack_series(series: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack arrays of unequal length into one zero-padded matrix with a validity mask.
+
+    Args:
+        series: One array per series
+
+    Returns:
+        Tuple of (series x length) float values and the matching boolean mask
+    """
+    length = max((len(values) for values in series), default=0)
+    values = np.zeros((len(series), length))
+    mask = np.zeros((len(series), length), dtype=bool)
+    for row, data in enumerate(series):
+        values[row, :len(data)] = data
+        mask[row, :len(data)] = True
+    return values, mask
+
+
+class LinearTrends:
+    """
+    Least squares lines fitted to a batch of series, one entry per series.
+
+    A series with fewer than two distinct x values gets slope 0 and its mean as intercept.
+    """
+
+    def __init__(
+        self,
+        slope: np.ndarray,
+        intercept: np.ndarray,
+        residual_variance: np.ndarray,
+        count: np.ndarray
+    ) -> None:
+        self.slope = slope
+        self.intercept = intercept
+        self.residual_variance = residual_variance
+        self.count = count
+
+    def __len__(self) -> int:
+        return len(self.slope)
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the fitted lines.
+
+        Args:
+            x: (series x points) x values, or one row of x values shared by all series
+
+        Returns:
+            (series x points) fitted values
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if x.ndim == 1:
+            x = x[None, :]
+        return self.intercept[:, None] + self.slope[:, None] * x
+
+
+def fit_linear_trends(xs: Sequence[np.ndarray], ys: Sequence[np.ndarray]) -> LinearTrends:
+    """
+    Fit a least squares line to every (x, y) series.
+
+    The sums are taken around each row's mean x and y, which keeps the fit accurate
+    for large x values such as epoch days.
+
+    Args:
+        xs: x values per series
+        ys: y values per series, the same lengths as xs
+
+    Returns:
+        Fitted trends in the order of the series
+    """
+    x, mask = stack_series(xs)
+    y, _ = stack_series(ys)
+
+    count = mask.sum(axis=1)
+    safe_count = np.maximum(count, 1)
+    mean_x = x.sum(axis=1) / safe_count
+    mean_y = y.sum(axis=1) / safe_count
+
+    dx = np.where(mask, x - mean_x[:, None], 0.0)
+    dy = np.where(mask, y - mean_y[:, None], 0.0)
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * dy).sum(axis=1)
+    syy = (dy * dy).sum(axis=1)
+
+    fitted = sxx > 0
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=fitted)
+    intercept = mean_y - slope * mean_x
+
+    # Unbiased residual variance; SSR = Syy - slope * Sxy
+    residual = np.maximum(syy - slope * sxy, 0.0)
+    residual_variance = np.divide(
+        residual, count - 2, out=np.full_like(residual, np.nan), where=count > 2
+    )
+    return LinearTrends(slope, intercept, residual_variance, count)
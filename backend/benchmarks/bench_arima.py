@@ -0,0 +1,94 @@
+"""
+ARIMA forecaster benchmark.
+This script fits ARIMA(1,1,0) to a batch of synthetic daily rate series with the
+native batched forecaster and with the statsmodels reference backend, and reports
+the time each takes and how far their forecasts and prediction intervals differ.
+
+It needs statsmodels installed but no database.
+
+Usage:
+    python -m benchmarks.bench_arima --pairs 200 --length 30 --steps 7
+"""
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from app.utils.arima import forecast_arima_110, forecast_arima_110_statsmodels
+
+
+def synthetic_series(pairs: int, length: int, seed: int) -> List[np.ndarray]:
+    """
+    Generate rate series whose daily changes follow AR(1) processes.
+
+    Args:
+        pairs: Number of series
+        length: Points per series
+        seed: Random seed
+
+    Returns:
+        One rate array per series, oldest first
+    """
+    rng = np.random.default_rng(seed)
+    series = []
+    for _ in range(pairs):
+        phi = rng.uniform(-0.8, 0.8)
+        scale = rng.uniform(0.1, 5.0)
+        changes = np.empty(length - 1)
+        previous = 0.0
+        for t in range(length - 1):
+            previous = phi * previous + rng.normal(scale=scale)
+            changes[t] = previous
+        series.append(rng.uniform(1, 2000) + np.concatenate([[0.0], np.cumsum(changes)]))
+    return series
+
+
+def run(args: argparse.Namespace) -> None:
+    """
+    Time both backends and compare their output.
+
+    Args:
+        args: Parsed arguments
+    """
+    series = synthetic_series(args.pairs, args.length, args.seed)
+
+    started = time.perf_counter()
+    native = forecast_arima_110(series, args.steps)
+    native_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reference = forecast_arima_110_statsmodels(series, args.steps)
+    reference_seconds = time.perf_counter() - started
+
+    print(f"{'native':>12}: {native_seconds * 1000:9.1f} ms for {args.pairs} pairs")
+    print(f"{'statsmodels':>12}: {reference_seconds * 1000:9.1f} ms for {args.pairs} pairs")
+    print(f"{'speedup':>12}: {reference_seconds / native_seconds:9.1f}x")
+
+    # Differences relative to the reference interval half-width, i.e. in forecast standard errors
+    half_width = (reference[2] - reference[1]) / 2
+    for name, index in (("forecast", 0), ("lower", 1), ("upper", 2)):
+        relative = np.abs(native[index] - reference[index]) / half_width
+        print(
+            f"{name:>12}: median {np.nanmedian(relative):.4f}, "
+            f"max {np.nanmax(relative):.4f} interval half-widths from statsmodels"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Benchmark batched ARIMA(1,1,0) against statsmodels")
+    parser.add_argument("--pairs", type=int, default=200, help="Number of series")
+    parser.add_argument("--length", type=int, default=30, help="Points per series")
+    parser.add_argument("--steps", type=int, default=7, help="Forecast horizon")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,168 @@
+"""
+Latest-rate lookup benchmark.
+This script measures the latest-rate query used by get_current_rate and alert
+evaluation against a large synthetic exchange_rates table, comparing the original
+single-column indexes with the composite and covering pair/time indexes.
+
+It works in a scratch "bench" schema of the configured PostgreSQL database and
+never touches application tables.
+
+Usage:
+    python -m benchmarks.bench_latest_rate --rows 10000000 --pairs 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import List
+
+import asyncpg
+
+from app.core.config import settings
+
+LATEST_RATE_QUERY = """
+    SELECT rate FROM bench.exchange_rates
+    WHERE base_currency_id = $1 AND quote_currency_id = $2
+    ORDER BY timestamp DESC
+    LIMIT 1
+"""
+
+INDEX_VARIANTS = {
+    "single-column": [
+        "CREATE INDEX ON bench.exchange_rates (base_currency_id)",
+        "CREATE INDEX ON bench.exchange_rates (quote_currency_id)",
+    ],
+    "composite": [
+        "CREATE INDEX ON bench.exchange_rates (base_currency_id, quote_currency_id, timestamp DESC)",
+    ],
+    "composite covering": [
+        "CREATE INDEX ON bench.exchange_rates (base_currency_id, quote_currency_id, timestamp DESC) INCLUDE (rate)",
+    ],
+}
+
+
+async def seed(conn: asyncpg.Connection, rows: int, pairs: int) -> None:
+    """
+    Create and fill the scratch table with hourly ticks spread over the pairs.
+
+    Args:
+        conn: Database connection
+        rows: Total number of rows to generate
+        pairs: Number of currency pairs
+    """
+    await conn.execute("DROP SCHEMA IF EXISTS bench CASCADE")
+    await conn.execute("CREATE SCHEMA bench")
+    await conn.execute(
+        """
+        CREATE TABLE bench.exchange_rates (
+            id bigserial PRIMARY KEY,
+            base_currency_id integer NOT NULL,
+            quote_currency_id integer NOT NULL,
+            rate numeric(18, 6) NOT NULL,
+            source varchar NOT NULL,
+            timestamp timestamp NOT NULL,
+            created_at timestamp NOT NULL
+        )
+        """
+    )
+    started = time.perf_counter()
+    await conn.execute(
+        """
+        INSERT INTO bench.exchange_rates
+            (base_currency_id, quote_currency_id, rate, source, timestamp, created_at)
+        SELECT
+            1,
+            2 + (n % $2),
+            random() * 1000,
+            'bench',
+            now() - ((n / $2) * interval '1 hour'),
+            now()
+        FROM generate_series(0, $1 - 1) AS n
+        """,
+        rows, pairs
+    )
+    print(f"Seeded {rows} rows in {time.perf_counter() - started:.1f} seconds")
+
+
+async def measure(conn: asyncpg.Connection, pairs: int, iterations: int) -> List[float]:
+    """
+    Time latest-rate lookups for random pairs.
+
+    Args:
+        conn: Database connection
+        pairs: Number of currency pairs
+        iterations: Number of lookups
+
+    Returns:
+        Lookup latencies in milliseconds
+    """
+    statement = await conn.prepare(LATEST_RATE_QUERY)
+    latencies = []
+    for _ in range(iterations):
+        quote_id = 2 + random.randrange(pairs)
+        started = time.perf_counter()
+        await statement.fetchval(1, quote_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    Seed the scratch table and benchmark each index variant.
+
+    Args:
+        args: Parsed arguments
+    """
+    dsn = str(settings.DATABASE_URI).replace("postgresql+asyncpg://", "postgresql://")
+    conn = await asyncpg.connect(dsn)
+    try:
+        await seed(conn, args.rows, args.pairs)
+
+        for variant, statements in INDEX_VARIANTS.items():
+            for (drop,) in await conn.fetch(
+                "SELECT 'DROP INDEX bench.' || quote_ident(indexname) FROM pg_indexes "
+                "WHERE schemaname = 'bench' AND indexname NOT LIKE '%pkey'"
+            ):
+                await conn.execute(drop)
+            for statement in statements:
+                await conn.execute(statement)
+            # Refresh statistics and the visibility map so index-only scans are possible
+            await conn.execute("VACUUM ANALYZE bench.exchange_rates")
+
+            plan = json.loads(await conn.fetchval(f"EXPLAIN (FORMAT JSON) {LATEST_RATE_QUERY}", 1, 2))
+            node = plan[0]["Plan"]
+            while node.get("Plans") and node["Node Type"] == "Limit":
+                node = node["Plans"][0]
+
+            await measure(conn, args.pairs, min(args.iterations, 50))  # Warm the cache
+            latencies = sorted(await measure(conn, args.pairs, args.iterations))
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(
+                f"{variant:>20}: {node['Node Type']:<20} "
+                f"p50={statistics.median(latencies):.3f} ms  p95={p95:.3f} ms"
+            )
+    finally:
+        if not args.keep:
+            await conn.execute("DROP SCHEMA IF EXISTS bench CASCADE")
+        await conn.close()
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Benchmark latest-rate lookups")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows to generate")
+    parser.add_argument("--pairs", type=int, default=200, help="Currency pairs to spread rows over")
+    parser.add_argument("--iterations", type=int, default=1000, help="Lookups per index variant")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench schema afterwards")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
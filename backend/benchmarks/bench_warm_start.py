@@ -0,0 +1,88 @@
+"""
+Warm start benchmark.
+This script measures how long a fresh process takes to serve the first raw history
+window of every stored pair: once loading the series from exchange_rates, as after
+a restart without segments, and once mapping them from rate segment files.
+
+It only reads application tables and writes the segments into a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_warm_start --days 90
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import List, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.currency import CurrentRate
+from app.utils.rate_segments import rebuild_segments
+from app.utils.rate_repository import RateRepository
+
+
+async def first_windows(pairs: List[Tuple[int, int]], days: int) -> Tuple[float, int]:
+    """
+    Time the first window of every pair on an empty rate repository.
+
+    Args:
+        pairs: (base_currency_id, quote_currency_id) pairs
+        days: Window length in days
+
+    Returns:
+        Tuple of (elapsed seconds, points served)
+    """
+    repository = RateRepository()
+    points = 0
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for base_currency_id, quote_currency_id in pairs:
+            window = await repository.get_window(db, base_currency_id, quote_currency_id, "raw", days)
+            window.rates.sum()  # Touch every value so mapped pages are actually read
+            points += len(window)
+    return time.perf_counter() - started, points
+
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    Measure first-window latency from the database and from segments.
+
+    Args:
+        args: Parsed arguments
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(CurrentRate.base_currency_id, CurrentRate.quote_currency_id))
+        pairs = [tuple(row) for row in result.all()]
+
+    settings.RATE_SEGMENTS_ENABLED = False
+    elapsed, points = await first_windows(pairs, args.days)
+    print(f"{'database':>10}: {elapsed * 1000:9.1f} ms for {len(pairs)} pairs, {points} points")
+
+    with tempfile.TemporaryDirectory() as segment_dir:
+        settings.RATE_SEGMENT_DIR = segment_dir
+        settings.RATE_SEGMENTS_ENABLED = True
+        async with AsyncSessionLocal() as db:
+            stats = await rebuild_segments(db)
+        print(f"{'rebuild':>10}: {stats['seconds'] * 1000:9.1f} ms, {stats['bytes']} bytes")
+
+        elapsed, points = await first_windows(pairs, args.days)
+        print(f"{'segments':>10}: {elapsed * 1000:9.1f} ms for {len(pairs)} pairs, {points} points")
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Benchmark warm start of raw rate history")
+    parser.add_argument("--days", type=int, default=90, help="Window length in days")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,98 @@
+"""
+Tests for the batched ARIMA(1,1,0) forecaster against its closed forms.
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from app.utils.arima import (
+    MAX_AR_COEFFICIENT,
+    MIN_ARIMA_POINTS,
+    fit_arima_110,
+    forecast_ar1_differences,
+    forecast_arima_110,
+    pad_series,
+)
+
+
+def simulate_levels(phi: float, length: int, seed: int) -> np.ndarray:
+    """Levels whose first differences follow d[t] = phi * d[t-1] + e[t]."""
+    rng = np.random.default_rng(seed)
+    diffs = np.zeros(length - 1)
+    for i in range(1, len(diffs)):
+        diffs[i] = phi * diffs[i - 1] + rng.normal()
+    return 1500.0 + np.concatenate([[0.0], np.cumsum(diffs)])
+
+
+def conditional_least_squares(levels: np.ndarray):
+    """Reference fit of one series, one difference pair at a time."""
+    diffs = np.diff(levels)
+    pairs = list(zip(diffs[1:], diffs[:-1]))
+    phi = sum(d * previous for d, previous in pairs) / sum(previous * previous for _, previous in pairs)
+    sigma2 = sum((d - phi * previous) ** 2 for d, previous in pairs) / len(pairs)
+    return phi, sigma2, len(pairs)
+
+
+def test_fit_matches_conditional_least_squares():
+    series = [simulate_levels(0.6, 60, seed=1), simulate_levels(-0.3, 45, seed=2)]
+    phi, sigma2, nobs = fit_arima_110(pad_series(series))
+
+    for row, levels in enumerate(series):
+        expected_phi, expected_sigma2, expected_nobs = conditional_least_squares(levels)
+        assert phi[row] == pytest.approx(expected_phi, rel=1e-12)
+        assert sigma2[row] == pytest.approx(expected_sigma2, rel=1e-12)
+        assert nobs[row] == expected_nobs
+
+
+def test_fit_ignores_padding():
+    short = simulate_levels(0.4, 20, seed=3)
+    padded = fit_arima_110(pad_series([simulate_levels(0.1, 80, seed=4), short]))
+    alone = fit_arima_110(pad_series([short]))
+
+    for batched, single in zip(padded, alone):
+        assert batched[1] == pytest.approx(single[0], rel=1e-12)
+
+
+def test_fit_degenerate_series():
+    constant = np.full(20, 1500.0)
+    explosive = 1500.0 + np.cumsum(2.0 ** np.arange(19.0))
+    phi, _, _ = fit_arima_110(pad_series([constant, np.concatenate([[1500.0], explosive])]))
+
+    assert phi[0] == 0.0
+    assert phi[1] == MAX_AR_COEFFICIENT
+
+
+def test_forecast_matches_recursion():
+    phi = np.array([0.5, -0.8, 0.0])
+    sigma2 = np.array([4.0, 1.0, 2.5])
+    last_level = np.array([1500.0, 800.0, 10.0])
+    last_diff = np.array([2.0, -1.0, 3.0])
+    steps = 6
+    forecasts, lower, upper = forecast_ar1_differences(phi, sigma2, last_level, last_diff, steps, alpha=0.1)
+
+    z = NormalDist().inv_cdf(0.95)
+    for row in range(len(phi)):
+        level, diff = last_level[row], last_diff[row]
+        # psi weights of the levels: psi[j] = 1 + phi + ... + phi^j
+        psi = [sum(phi[row] ** i for i in range(j + 1)) for j in range(steps)]
+        for step in range(steps):
+            diff = phi[row] * diff
+            level += diff
+            variance = sigma2[row] * sum(weight * weight for weight in psi[:step + 1])
+            assert forecasts[row, step] == pytest.approx(level, rel=1e-12)
+            assert lower[row, step] == pytest.approx(level - z * np.sqrt(variance), rel=1e-12)
+            assert upper[row, step] == pytest.approx(level + z * np.sqrt(variance), rel=1e-12)
+
+
+def test_forecast_arima_110_leaves_short_series_out():
+    long_series = simulate_levels(0.3, 40, seed=5)
+    forecasts, lower, upper = forecast_arima_110([long_series, long_series[:MIN_ARIMA_POINTS - 1]], steps=3)
+
+    phi, sigma2, _ = fit_arima_110(pad_series([long_series]))
+    expected, _, _ = forecast_ar1_differences(
+        phi, sigma2, long_series[-1:], long_series[-1:] - long_series[-2:-1], 3
+    )
+    np.testing.assert_allclose(forecasts[0], expected[0], rtol=1e-12)
+    assert np.isnan(forecasts[1]).all()
+    assert np.isnan(lower[1]).all() and np.isnan(upper[1]).all()
@@ -0,0 +1,58 @@
+"""
+Tests for the cross-rate matrix.
+"""
+from datetime import datetime
+
+import pytest
+
+from app.utils.cross_rates import CrossRateMatrix, cross_rates
+from app.utils.rate_cache import latest_rates
+
+USD_RATES = {"NGN": 1500.0, "EUR": 0.92, "GBP": 0.79}
+CODES = ["USD", "NGN", "EUR", "GBP"]
+
+
+def test_cross_rates_divide_usd_rates():
+    matrix = CrossRateMatrix()
+    assert matrix.update("USD", USD_RATES, CODES, "exchangerate-api", datetime(2026, 1, 1)) == 4
+
+    usd = dict(USD_RATES, USD=1.0)
+    for base in CODES:
+        for quote in CODES:
+            assert matrix.get_rate(base, quote) == pytest.approx(usd[quote] / usd[base], rel=1e-12)
+    assert matrix.get_row("EUR") == {
+        code: pytest.approx(usd[code] / usd["EUR"]) for code in CODES if code != "EUR"
+    }
+
+
+def test_currencies_without_rate_are_left_out():
+    matrix = CrossRateMatrix()
+    codes = ["USD", "NGN", "EUR", "JPY"]
+    assert matrix.update("USD", {"NGN": 1500.0, "EUR": 0.0}, codes, "fixer", datetime(2026, 1, 1)) == 2
+
+    assert matrix.codes == ["USD", "NGN"]
+    assert matrix.get_rate("EUR", "NGN") is None
+    assert matrix.get_row("JPY") == {}
+
+
+def test_update_after_invalidation_rebuilds_matrix():
+    matrix = CrossRateMatrix()
+    matrix.update("USD", USD_RATES, CODES, "exchangerate-api", datetime(2026, 1, 1))
+    assert matrix.is_fresh
+
+    matrix.invalidate(datetime(2026, 1, 2))
+    assert matrix.is_loaded and not matrix.is_fresh
+
+    matrix.update("USD", dict(USD_RATES, NGN=1600.0), CODES, "fixer", datetime(2026, 1, 2))
+    assert matrix.is_fresh
+    assert matrix.get_rate("EUR", "NGN") == pytest.approx(1600.0 / 0.92)
+    assert (matrix.source, matrix.updated_at) == ("fixer", datetime(2026, 1, 2))
+
+
+def test_latest_rate_invalidation_marks_matrix_stale():
+    cross_rates.update("USD", USD_RATES, CODES, "exchangerate-api", datetime(2026, 1, 1))
+    generation = cross_rates.generation
+
+    latest_rates.invalidate()
+    assert not cross_rates.is_fresh
+    assert cross_rates.generation == generation + 1
@@ -0,0 +1,78 @@
+"""
+Tests for LTTB downsampling against a per-bucket reference.
+"""
+import math
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from app.utils.downsampling import lttb_indices
+
+
+def reference_lttb(x, y, max_points):
+    """Straightforward LTTB, one bucket and one point at a time."""
+    n = len(x)
+    buckets = max_points - 2
+    # floor(i * (n - 2) / buckets) + 1 in exact arithmetic; with a float bucket
+    # width i * width can round just below an integer
+    edges = [math.floor(Fraction(i * (n - 2), buckets)) + 1 for i in range(buckets + 1)]
+    selected = [0]
+    a = 0
+    for i in range(buckets):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 1 < buckets else (n - 1, n)
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+
+        best, best_area = start, -1.0
+        for b in range(start, end):
+            area = abs((x[a] - avg_x) * (y[b] - y[a]) - (x[a] - x[b]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = b, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def random_walk(n, seed):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.integers(1, 60, n)).astype(np.float64)
+    return x, 1500.0 + np.cumsum(rng.normal(0.0, 2.0, n))
+
+
+def test_matches_reference():
+    rng = np.random.default_rng(0)
+    for seed in range(300):
+        n = int(rng.integers(4, 400))
+        max_points = int(rng.integers(3, n))
+        x, y = random_walk(n, seed)
+
+        assert lttb_indices(x, y, max_points).tolist() == reference_lttb(list(x), list(y), max_points), (n, max_points)
+
+
+@pytest.mark.parametrize("n, max_points", [(1000, 3), (1000, 999), (1001, 101), (7, 4), (10_000, 500)])
+def test_bucket_edges(n, max_points):
+    x, y = random_walk(n, seed=n + max_points)
+    indices = lttb_indices(x, y, max_points)
+
+    assert len(indices) == max_points
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert (np.diff(indices) > 0).all()
+    assert indices.tolist() == reference_lttb(list(x), list(y), max_points)
+
+
+def test_keeps_peak():
+    x = np.arange(200, dtype=np.float64)
+    y = np.zeros(200)
+    y[137] = 50.0
+
+    assert 137 in lttb_indices(x, y, 10)
+
+
+@pytest.mark.parametrize("max_points", [0, 2, 50, 60])
+def test_short_series_or_too_few_points_keep_everything(max_points):
+    x, y = random_walk(50, seed=1)
+
+    np.testing.assert_array_equal(lttb_indices(x, y, max_points), np.arange(50))
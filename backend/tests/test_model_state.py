@@ -0,0 +1,98 @@
+"""
+Tests for the incremental prediction model state against full refits.
+"""
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.utils.arima import fit_arima_110, pad_series
+from app.utils.model_state import PairModelState
+
+DAY = 86400
+WINDOW = 30
+NOW = datetime(2026, 1, 1)
+
+
+def daily_closes(length: int, seed: int = 1):
+    """Epoch seconds and random walk closes of consecutive days."""
+    rng = np.random.default_rng(seed)
+    timestamps = 1_700_000_000 + DAY * np.arange(length, dtype=np.int64)
+    return timestamps, 1500.0 + np.cumsum(rng.normal(0.0, 2.0, length))
+
+
+def assert_same_fit(state: PairModelState, fresh: PairModelState):
+    assert state.count == fresh.count
+    assert state.window_start == fresh.window_start
+    assert state.last_timestamp == fresh.last_timestamp
+    assert state.latest == fresh.latest
+    assert state.last_diff == pytest.approx(fresh.last_diff, rel=1e-9)
+    assert state.mean == pytest.approx(fresh.mean, rel=1e-12)
+    assert state.variance(ddof=1) == pytest.approx(fresh.variance(ddof=1), rel=1e-8)
+    assert state.slope_per_day == pytest.approx(fresh.slope_per_day, rel=1e-8)
+    np.testing.assert_allclose(state.predict_index(7), fresh.predict_index(7), rtol=1e-10)
+    assert state.ar_coefficient == pytest.approx(fresh.ar_coefficient, rel=1e-8)
+    assert state.residual_variance == pytest.approx(fresh.residual_variance, rel=1e-8)
+
+
+def test_fit_matches_direct_statistics():
+    timestamps, rates = daily_closes(WINDOW)
+    state = PairModelState.fit(timestamps, rates, NOW)
+    phi, sigma2, _ = fit_arima_110(pad_series([rates]))
+
+    assert state.mean == pytest.approx(rates.mean(), rel=1e-12)
+    assert state.variance(ddof=1) == pytest.approx(rates.var(ddof=1), rel=1e-9)
+    assert state.slope_per_day == pytest.approx(np.polyfit((timestamps - timestamps[0]) / DAY, rates, 1)[0], rel=1e-9)
+    assert state.ar_coefficient == pytest.approx(phi[0], rel=1e-9)
+    assert state.residual_variance == pytest.approx(sigma2[0], rel=1e-9)
+
+
+def test_update_matches_fit_over_slides_and_revised_closes():
+    timestamps, rates = daily_closes(WINDOW + 40)
+    state = PairModelState.fit(timestamps[:WINDOW], rates[:WINDOW], NOW)
+
+    for end in range(WINDOW + 1, len(rates) + 1):
+        # The newest close is still moving: the run sees it revised, the next one final
+        seen = rates[:end].copy()
+        seen[-1] += 0.5
+        first = int(np.searchsorted(timestamps, state.window_start))
+        window_start = int(timestamps[end - WINDOW])
+
+        assert state.update(timestamps[first:end], seen[first:], window_start, drift_threshold=10.0) is None
+        assert_same_fit(state, PairModelState.fit(timestamps[end - WINDOW:end], seen[end - WINDOW:], NOW))
+
+
+def test_update_takes_several_new_closes():
+    timestamps, rates = daily_closes(WINDOW + 5)
+    state = PairModelState.fit(timestamps[:WINDOW], rates[:WINDOW], NOW)
+
+    assert state.update(timestamps, rates, int(timestamps[5]), drift_threshold=10.0) is None
+    assert_same_fit(state, PairModelState.fit(timestamps[5:], rates[5:], NOW))
+
+
+def test_update_asks_for_refit():
+    timestamps, rates = daily_closes(WINDOW + 1)
+
+    state = PairModelState.fit(timestamps[:WINDOW], rates[:WINDOW], NOW)
+    jumped = rates.copy()
+    jumped[-1] += 500.0
+    assert state.update(timestamps, jumped, int(timestamps[0]), drift_threshold=4.0) == "drift"
+
+    state = PairModelState.fit(timestamps[:WINDOW], rates[:WINDOW], NOW)
+    backfilled = rates.copy()
+    backfilled[WINDOW - 2] += 1.0
+    assert state.update(timestamps, backfilled, int(timestamps[0]), drift_threshold=4.0) == "history changed"
+
+    state = PairModelState.fit(timestamps[:WINDOW], rates[:WINDOW], NOW)
+    assert state.update(timestamps[1:], rates[1:], int(timestamps[1]), drift_threshold=4.0) == "history changed"
+
+
+def test_dict_roundtrip():
+    timestamps, rates = daily_closes(WINDOW + 3)
+    state = PairModelState.fit(timestamps[:WINDOW], rates[:WINDOW], NOW)
+    state.update(timestamps, rates, int(timestamps[3]), drift_threshold=10.0)
+
+    restored = PairModelState.from_dict(json.loads(json.dumps(state.to_dict())), NOW)
+    assert restored.to_dict() == state.to_dict()
+    assert_same_fit(restored, state)
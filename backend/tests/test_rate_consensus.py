@@ -0,0 +1,73 @@
+"""
+Tests for the multi-provider consensus rates.
+"""
+import numpy as np
+import pytest
+
+from app.utils.rate_consensus import MIN_CONSENSUS_VALUES, build_rate_matrix, consensus_rates, row_nanmedian
+
+
+def test_row_nanmedian_matches_numpy():
+    rng = np.random.default_rng(1)
+    values = rng.normal(1500.0, 20.0, (200, 5))
+    values[rng.random(values.shape) < 0.3] = np.nan
+    values[0] = np.nan
+
+    expected = np.array([np.nan if np.isnan(row).all() else np.nanmedian(row) for row in values])
+    np.testing.assert_allclose(row_nanmedian(values), expected, rtol=1e-12)
+    assert np.isnan(row_nanmedian(values)[0])
+
+
+def test_build_rate_matrix_drops_invalid_rates():
+    matrix = build_rate_matrix(
+        [{"USD": 1500.0, "EUR": 0.0}, {"USD": float("inf"), "EUR": -1.0, "GBP": 1900.0}],
+        ["USD", "EUR", "GBP"]
+    )
+
+    assert matrix[0, 0] == 1500.0 and matrix[2, 1] == 1900.0
+    assert np.isnan(matrix[[0, 1, 1, 2], [1, 0, 1, 0]]).all()
+
+
+@pytest.mark.parametrize("method", ["median", "trimmed_mean"])
+def test_outlier_is_rejected(method):
+    matrix = np.array([[1500.0, 1502.0, 1498.0, 1501.0, 2500.0]])
+    consensus, accepted = consensus_rates(matrix, method=method)
+
+    assert accepted.tolist() == [[True, True, True, True, False]]
+    expected = np.median(matrix[0, :4]) if method == "median" else matrix[0, :4].mean()
+    assert consensus[0] == pytest.approx(expected)
+
+
+def test_agreeing_providers_use_relative_tolerance():
+    # Identical values give a zero MAD; the relative tolerance still keeps close ones
+    matrix = np.array([[1500.0, 1500.0, 1500.0, 1503.0, 1530.0]])
+    _, accepted = consensus_rates(matrix, min_relative_tolerance=0.005)
+
+    assert accepted.tolist() == [[True, True, True, True, False]]
+
+
+def test_too_few_values_fall_back_to_primary_provider():
+    matrix = np.array([
+        [np.nan, 1500.0, 2500.0],
+        [1500.0, 2500.0, np.nan],
+        [np.nan, np.nan, 1700.0],
+    ])
+    assert (~np.isnan(matrix)).sum(axis=1).max() < MIN_CONSENSUS_VALUES
+    consensus, accepted = consensus_rates(matrix)
+
+    np.testing.assert_array_equal(consensus, [1500.0, 1500.0, 1700.0])
+    assert accepted.tolist() == [
+        [False, True, False],
+        [True, False, False],
+        [False, False, True],
+    ]
+
+
+def test_all_nan_row():
+    matrix = np.array([[np.nan, np.nan, np.nan], [1500.0, 1501.0, 1499.0]])
+
+    for method in ("median", "trimmed_mean"):
+        consensus, accepted = consensus_rates(matrix, method=method)
+        assert np.isnan(consensus[0])
+        assert not accepted[0].any()
+        assert consensus[1] == pytest.approx(1500.0)
@@ -0,0 +1,128 @@
+"""
+Tests for exchange rate partition retention and re-creation.
+"""
+import re
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.utils import rate_partitions
+from app.utils.rate_partitions import (
+    add_months,
+    apply_retention,
+    archive_name,
+    ensure_partitions,
+    month_start,
+    partition_name,
+)
+
+
+class Result:
+    def __init__(self, rows) -> None:
+        self.rows = rows
+
+    def scalar(self) -> Any:
+        return self.rows[0][0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class CatalogSession:
+    """
+    Stand-in for a PostgreSQL session that only models the catalog.
+
+    tables maps a table name to True while it is attached to exchange_rates and to
+    False while it is a standalone table.
+    """
+
+    def __init__(self, tables: Dict[str, bool]) -> None:
+        self.tables = tables
+        self.info: Dict[str, Any] = {}
+        self.sync_session = Session()
+
+    async def connection(self):
+        return SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+    async def scalar(self, statement, params: Optional[Dict[str, Any]] = None) -> Any:
+        return (await self.execute(statement, params)).scalar()
+
+    async def execute(self, statement, params: Optional[Dict[str, Any]] = None) -> Result:
+        sql = str(statement)
+        if "pg_partitioned_table" in sql:
+            return Result([(1,)])
+        if "pg_inherits" in sql:
+            return Result([(name,) for name, attached in self.tables.items() if attached])
+        if "relispartition" in sql:
+            name = params["name"]
+            return Result([(self.tables[name],)] if name in self.tables else [])
+
+        match = re.match(r"CREATE TABLE IF NOT EXISTS (\w+) PARTITION OF", sql)
+        if match:
+            self.tables.setdefault(match.group(1), True)
+            return Result([])
+        match = re.match(r"ALTER TABLE \w+ DETACH PARTITION (\w+)", sql)
+        if match:
+            self.tables[match.group(1)] = False
+            return Result([])
+        match = re.match(r"ALTER TABLE (\w+) RENAME TO (\w+)", sql)
+        if match:
+            self.tables[match.group(2)] = self.tables.pop(match.group(1))
+            return Result([])
+        match = re.match(r"DROP TABLE (\w+)", sql)
+        if match:
+            del self.tables[match.group(1)]
+            return Result([])
+        raise AssertionError(f"Unexpected statement {sql}")
+
+    def accepts(self, timestamp: datetime) -> bool:
+        """Whether an insert at timestamp finds a partition."""
+        return self.tables.get(partition_name(month_start(timestamp))) is True
+
+
+@pytest.fixture(autouse=True)
+def reset_known_months():
+    rate_partitions.known_months.clear()
+    yield
+    rate_partitions.known_months.clear()
+
+
+def months_back(count: int) -> datetime:
+    return add_months(month_start(datetime.utcnow()), -count)
+
+
+async def test_detached_month_can_be_ensured_again():
+    old, recent = months_back(6), months_back(1)
+    db = CatalogSession({partition_name(old): True, partition_name(recent): True})
+
+    assert await apply_retention(db, 3) == [partition_name(old)]
+    assert db.tables[archive_name(old, datetime.utcnow())] is False
+    assert not db.accepts(old)
+
+    # e.g. a backfill of the retired month
+    assert await ensure_partitions(db, old, old.replace(day=20)) == [partition_name(old)]
+    assert db.accepts(old)
+    assert db.accepts(recent)
+
+
+async def test_dropped_month_can_be_ensured_again():
+    old = months_back(6)
+    db = CatalogSession({partition_name(old): True})
+
+    assert await apply_retention(db, 3, mode="drop") == [partition_name(old)]
+    assert db.tables == {}
+
+    await ensure_partitions(db, old, old)
+    assert db.accepts(old)
+
+
+async def test_standalone_table_under_partition_name_raises():
+    old = months_back(6)
+    # Left behind by a detach that did not rename the partition
+    db = CatalogSession({partition_name(old): False})
+
+    with pytest.raises(RuntimeError, match="not attached"):
+        await ensure_partitions(db, old, old)
@@ -0,0 +1,74 @@
+"""
+Tests for the batched linear trend fit against per-series least squares.
+"""
+import numpy as np
+import pytest
+
+from app.utils.trend import fit_linear_trends, stack_series
+
+
+def epoch_day_series(length: int, seed: int):
+    """Random x values near today's epoch day and noisy linear y values."""
+    rng = np.random.default_rng(seed)
+    x = 20_000.0 + np.sort(rng.uniform(0.0, 90.0, length))
+    return x, 1500.0 + 2.5 * (x - x[0]) + rng.normal(0.0, 3.0, length)
+
+
+def test_fit_matches_polyfit_per_series():
+    # Unequal lengths, so every series but the longest is padded and masked
+    series = [epoch_day_series(length, seed) for seed, length in enumerate([60, 3, 25, 90, 7])]
+    trends = fit_linear_trends([x for x, _ in series], [y for _, y in series])
+
+    assert len(trends) == len(series)
+    for row, (x, y) in enumerate(series):
+        slope, intercept = np.polyfit(x, y, 1)
+        residuals = y - (intercept + slope * x)
+        assert trends.count[row] == len(x)
+        assert trends.slope[row] == pytest.approx(slope, rel=1e-9)
+        assert trends.intercept[row] == pytest.approx(intercept, rel=1e-9)
+        assert trends.residual_variance[row] == pytest.approx(residuals @ residuals / (len(x) - 2), rel=1e-6)
+        np.testing.assert_allclose(trends.predict(x)[row], np.polyval([slope, intercept], x), rtol=1e-9)
+
+
+def test_padding_does_not_change_fit():
+    long_x, long_y = epoch_day_series(80, seed=1)
+    short_x, short_y = epoch_day_series(12, seed=2)
+    batched = fit_linear_trends([long_x, short_x], [long_y, short_y])
+    alone = fit_linear_trends([short_x], [short_y])
+
+    assert batched.slope[1] == pytest.approx(alone.slope[0], rel=1e-12)
+    assert batched.intercept[1] == pytest.approx(alone.intercept[0], rel=1e-12)
+    assert batched.residual_variance[1] == pytest.approx(alone.residual_variance[0], rel=1e-12)
+
+
+def test_degenerate_series():
+    x, y = epoch_day_series(30, seed=3)
+    trends = fit_linear_trends(
+        [x, np.array([]), np.array([20_000.0]), np.array([20_000.0, 20_000.0]), x[:2]],
+        [y, np.array([]), np.array([1510.0]), np.array([1500.0, 1520.0]), y[:2]]
+    )
+
+    np.testing.assert_array_equal(trends.count, [30, 0, 1, 2, 2])
+    # Empty, one point and one distinct x: flat line through the mean
+    np.testing.assert_array_equal(trends.slope[1:4], [0.0, 0.0, 0.0])
+    np.testing.assert_array_equal(trends.intercept[1:4], [0.0, 1510.0, 1510.0])
+    # Two points fit exactly, but leave no degrees of freedom for the variance
+    slope, intercept = np.polyfit(x[:2], y[:2], 1)
+    assert trends.slope[4] == pytest.approx(slope, rel=1e-9)
+    assert trends.intercept[4] == pytest.approx(intercept, rel=1e-9)
+    assert np.isnan(trends.residual_variance[1:]).all()
+    assert not np.isnan(trends.residual_variance[0])
+
+
+def test_no_series():
+    trends = fit_linear_trends([], [])
+
+    assert len(trends) == 0
+    assert trends.predict(np.arange(3.0)).shape == (0, 3)
+
+
+def test_stack_series_masks_padding():
+    values, mask = stack_series([np.array([1.0, 2.0, 3.0]), np.array([]), np.array([4.0])])
+
+    np.testing.assert_array_equal(values, [[1.0, 2.0, 3.0], [0.0, 0.0, 0.0], [4.0, 0.0, 0.0]])
+    np.testing.assert_array_equal(mask, [[True, True, True], [False, False, False], [True, False, False]])